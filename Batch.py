@@ -0,0 +1,391 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  Procedural building generator
+#  Copyright (C) 2019 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import os
+import sys
+import json
+import time
+import tempfile
+import traceback
+from . import Generator
+from . import Fingerprint
+from . import UsdExport
+from . import Workers
+
+# suffix of the results manifest, next to the input manifest, if no results path is given
+BATCH_RESULTS_SUFFIX = ".results.jsonl"
+# number of times a building is started before it is given up, whether it failed or crashed its worker
+BATCH_MAX_ATTEMPTS = 2
+# seconds between checks of the worker processes
+BATCH_POLL_INTERVAL = 0.5
+# statuses of finished buildings, these are skipped on restart, failed buildings are retried
+BATCH_FINISHED = ("ok", "given_up", "crashed")
+
+
+class ParamsBatch:
+    # TODO: docstring
+
+    def __init__(self, manifest: str, results: str, output: str, worker_count: int):
+        self.manifest = manifest
+        self.results = results
+        self.output = output
+        self.worker_count = worker_count
+    # end __init__
+
+    @staticmethod
+    def from_ui():
+        properties = bpy.context.scene.PBGPropertyGroup
+        manifest = bpy.path.abspath(properties.batch_manifest)
+        results = bpy.path.abspath(properties.batch_results)
+        if results == "":
+            results = os.path.splitext(manifest)[0] + BATCH_RESULTS_SUFFIX
+        # end if
+        output = bpy.path.abspath(properties.batch_output)
+        if output == "":
+            output = os.path.dirname(manifest)
+        # end if
+        params = ParamsBatch(
+            manifest=manifest,
+            results=results,
+            output=output,
+            worker_count=properties.batch_worker_count
+        )
+        return params
+    # end from_ui
+# end ParamsBatch
+
+
+def read_manifest(path: str) -> list:
+    """
+        Reads the building records of a batch
+    Args:
+        path: path of a json lines file, one building per line, a dict with keys name (optional, line number if
+            missing) and properties, values of the properties which differ from their defaults
+    Returns:
+        list(dict) - records with keys name and properties, as used by Fingerprint.apply_configuration, and file,
+            the name turned into a unique file name
+    """
+    records = list()
+    names = set()
+    files = set()
+    with open(path, "r") as f:
+        for number, line in enumerate(f, 1):
+            if line.strip() == "":
+                continue
+            # end if
+            record = json.loads(line)
+            name = str(record.get("name", "building" + str(number)))
+            if name in names:
+                raise ValueError(path + ", line " + str(number) + ": duplicate name " + name)
+            # end if
+            names.add(name)
+            records.append({
+                "name": name,
+                "file": UsdExport.prim_name(name, files),
+                "properties": record.get("properties", dict())
+            })
+        # end for
+    # end with
+    return records
+# end read_manifest
+
+
+def read_results(path: str) -> list:
+    """
+        Reads the results manifest, skipping a partially written last line
+    Args:
+        path: path of the results manifest, it does not have to exist
+    Returns:
+        list(dict) - result lines, see append_result
+    """
+    results = list()
+    if not os.path.isfile(path):
+        return results
+    # end if
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except ValueError:
+                # the line of a process killed while writing it
+                pass
+            # end try
+        # end for
+    # end with
+    return results
+# end read_results
+
+
+def append_result(path: str, result: dict):
+    """
+        Appends a line to the results manifest, with a single write, so lines of concurrent workers do not mix
+    Args:
+        path: path of the results manifest
+        result: dict with keys name, status (started, ok, failed, given_up or crashed) and worker, time, output,
+            objects and faces of generated buildings, error of failed and given up buildings
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+    try:
+        os.write(fd, (json.dumps(result, sort_keys=True) + "\n").encode())
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    # end try
+# end append_result
+
+
+def finished_names(results: list) -> set:
+    """
+        Finds the buildings which do not need to be generated again
+    Args:
+        results: result of read_results
+    Returns:
+        set(str) - names of the finished buildings
+    """
+    return set(result["name"] for result in results if result.get("status") in BATCH_FINISHED)
+# end finished_names
+
+
+def gen_record(context: bpy.types.Context, record: dict, output: str) -> dict:
+    """
+        Generates a building from the given record, exports it and deletes it
+    Args:
+        context: bpy.types.Context
+        record: dict with keys name, file and properties
+        output: directory where to write the building
+    Returns:
+        dict with keys time, output, objects and faces, see append_result
+    """
+    properties = context.scene.PBGPropertyGroup
+    values = Generator.snapshot_properties(properties)
+    Fingerprint.apply_configuration(properties, record)
+
+    group = Generator.new_building()
+    try:
+        time_start = time.time()
+        Generator.gen_building(context, group, group.name + ".")
+        elapsed = time.time() - time_start
+        path = os.path.join(output, record["file"] + ".usda")
+        UsdExport.export_buildings(path, [group])
+        objects = [obj for obj in group.objects if not obj.hide]
+        result = {
+            "time": elapsed,
+            "output": path,
+            "objects": len(objects),
+            "faces": sum(len(obj.data.polygons) for obj in objects if obj.type == "MESH")
+        }
+    finally:
+        Generator.UndoStack.discard(list(group.objects))
+        bpy.data.groups.remove(group)
+        Generator.restore_properties(properties, values)
+    # end try
+    return result
+# end gen_record
+
+
+def run_records(context: bpy.types.Context, records: list, results_path: str, output: str, worker: int) -> int:
+    """
+        Generates the given records one after another, in this process, skipping the finished ones
+    Note:
+        Each attempt is recorded as started before the building is generated, a failed building is retried. A
+        building started BATCH_MAX_ATTEMPTS times without being generated is recorded as given up, or as crashed
+        if its last attempt did not finish, and skipped.
+    Args:
+        context: bpy.types.Context
+        records: list(dict) - records with keys name, file and properties
+        results_path: path of the results manifest
+        output: directory where to write the buildings
+        worker: index of the worker process, recorded in the results manifest
+    Returns:
+        number of buildings attempted
+    """
+    results = read_results(results_path)
+    finished = finished_names(results)
+    attempts = dict()
+    last_results = dict()
+    for result in results:
+        if result.get("status") == "started":
+            attempts[result["name"]] = attempts.get(result["name"], 0) + 1
+        # end if
+        last_results[result["name"]] = result
+    # end for
+    count = 0
+    for record in records:
+        name = record["name"]
+        if name in finished:
+            continue
+        # end if
+        result = last_results.get(name, dict())
+        if attempts.get(name, 0) < BATCH_MAX_ATTEMPTS:
+            count += 1
+        # end if
+        while attempts.get(name, 0) < BATCH_MAX_ATTEMPTS and result.get("status") != "ok":
+            attempts[name] = attempts.get(name, 0) + 1
+            print("batch: generating " + name + ", attempt " + str(attempts[name]))
+            append_result(results_path, {"name": name, "status": "started", "worker": worker})
+            try:
+                result = gen_record(context, record, output)
+                result["status"] = "ok"
+            except Exception:
+                traceback.print_exc()
+                error = traceback.format_exception_only(*sys.exc_info()[:2])[-1].strip()
+                result = {"status": "failed", "error": error}
+            # end try
+            result["name"] = name
+            result["worker"] = worker
+            append_result(results_path, result)
+        # end while
+        if result.get("status") != "ok":
+            status = "given_up" if result.get("status") == "failed" else "crashed"
+            print("batch: " + name + " " + status + " after " + str(attempts[name]) + " attempts, skipping it")
+            append_result(results_path, {"name": name, "status": status, "worker": worker,
+                                         "error": result.get("error", "")})
+        # end if
+    # end for
+    return count
+# end run_records
+
+
+def worker_main():
+    """
+        Entry point of a worker process, a background blender instance started by run_workers.
+        The worker argument is the path of the job json, with keys manifest, results, output, worker,
+        worker_count and properties (the user properties of the process which started the batch).
+    """
+    job_path = Workers.worker_args()[0]
+    with open(job_path, "r") as f:
+        job = json.load(f)
+    # end with
+    Generator.restore_properties(bpy.context.scene.PBGPropertyGroup, job["properties"])
+    records = Workers.shard(read_manifest(job["manifest"]), job["worker"], job["worker_count"])
+    run_records(bpy.context, records, job["results"], job["output"], job["worker"])
+# end worker_main
+
+
+def run_workers(context: bpy.types.Context, params_batch: ParamsBatch):
+    """
+        Generates the batch in background blender processes, running in parallel. A worker which exits before
+        finishing its records is restarted as long as it makes progress, the building it crashed on is retried
+        and given up after BATCH_MAX_ATTEMPTS attempts
+    Note:
+        Each worker enables this addon in a fresh blender instance, so the addon has to be installed.
+    Args:
+        context: bpy.types.Context
+        params_batch: ParamsBatch instance
+    """
+    directory = tempfile.mkdtemp(prefix="pbg_batch_")
+    values = Generator.snapshot_properties(context.scene.PBGPropertyGroup)
+    workers = dict()
+    for i in range(0, params_batch.worker_count):
+        job_path = os.path.join(directory, "job" + str(i) + ".json")
+        with open(job_path, "w") as f:
+            json.dump({
+                "manifest": params_batch.manifest,
+                "results": params_batch.results,
+                "output": params_batch.output,
+                "worker": i,
+                "worker_count": params_batch.worker_count,
+                "properties": dict((name, value) for name, value in values.items()
+                                   if not Generator.is_generation_property(name))
+            }, f)
+        # end with
+        log_path = os.path.join(directory, "worker" + str(i) + ".log")
+        workers[i] = (Workers.start_worker("Batch", [job_path], log_path) +
+                      (job_path, log_path, len(read_results(params_batch.results))))
+    # end for
+
+    while len(workers) > 0:
+        time.sleep(BATCH_POLL_INTERVAL)
+        for i, (process, log, job_path, log_path, result_count) in list(workers.items()):
+            if process.poll() is None:
+                continue
+            # end if
+            log.close()
+            del workers[i]
+            if process.returncode == 0:
+                continue
+            # end if
+            results = read_results(params_batch.results)
+            if not any(result.get("worker") == i for result in results[result_count:]):
+                print("batch: worker " + str(i) + " failed without progress, see " + log_path)
+                continue
+            # end if
+            print("batch: worker " + str(i) + " exited with " + str(process.returncode) + ", restarting it")
+            workers[i] = Workers.start_worker("Batch", [job_path], log_path) + (job_path, log_path, len(results))
+        # end for
+    # end while
+# end run_workers
+
+
+def summarize(records: list, results: list) -> dict:
+    """
+        Counts the buildings of the batch by their last status
+    Args:
+        records: result of read_manifest
+        results: result of read_results
+    Returns:
+        dict, status to number of buildings, buildings without results are counted as pending
+    """
+    status = dict()
+    for result in results:
+        status[result["name"]] = result.get("status")
+    # end for
+    counts = dict()
+    for record in records:
+        name = status.get(record["name"])
+        name = name if name in BATCH_FINISHED else "pending"
+        counts[name] = counts.get(name, 0) + 1
+    # end for
+    return counts
+# end summarize
+
+
+class RunBatch(bpy.types.Operator):
+    # TODO: docstring
+
+    bl_idname = "pbg.run_batch"
+    bl_label = "Run Batch"
+    bl_options = {"REGISTER"}
+
+    def invoke(self, context, event):
+        params_batch = ParamsBatch.from_ui()
+        if not os.path.isfile(params_batch.manifest):
+            self.report({"ERROR"}, "Manifest not found: " + params_batch.manifest)
+            return {"CANCELLED"}
+        # end if
+        records = read_manifest(params_batch.manifest)
+        os.makedirs(params_batch.output, exist_ok=True)
+        if params_batch.worker_count > 0:
+            run_workers(context, params_batch)
+        else:
+            run_records(context, records, params_batch.results, params_batch.output, 0)
+        # end if
+        counts = summarize(records, read_results(params_batch.results))
+        msg = ", ".join(str(counts[status]) + " " + status for status in sorted(counts.keys()))
+        print("batch: " + msg)
+        if counts.get("ok", 0) < len(records):
+            self.report({"WARNING"}, msg + ", see " + params_batch.results)
+        else:
+            self.report({"INFO"}, msg)
+        # end if
+        return {"FINISHED"}
+    # end invoke
+# end RunBatch
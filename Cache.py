@@ -0,0 +1,307 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  Procedural building generator
+#  Copyright (C) 2019 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import os
+import mmap
+import struct
+import numpy
+import hashlib
+import tempfile
+import contextlib
+from . import Constants
+from . import Utils
+
+# file layout: header, followed by the raw arrays in the order given by ARRAY_LAYOUT.
+# every array item is 4 bytes wide and stored in native (little endian on all supported platforms) byte order.
+FILE_MAGIC = b"PBGC"
+FILE_EXTENSION = ".pbgc"
+HEADER_FORMAT = "<4sI7I"
+ARRAY_LAYOUT = (
+    ("co", "f"),
+    ("edges", "i"),
+    ("loop_starts", "i"),
+    ("loop_totals", "i"),
+    ("loop_verts", "i"),
+    ("material_indices", "i"),
+    ("uvs", "f")
+)
+# the directory is scanned for entries written by other blender instances after this many stores
+EVICT_SCAN_INTERVAL = 256
+
+# estimated total size of the entries of each cache directory, and the number of stores since it was last scanned
+directory_sizes = dict()
+
+
+class ParamsCache:
+    """
+    Settings of the geometry cache.
+
+    Attributes:
+        enabled (bool): if False, components are always generated
+        directory (str): directory holding the cache files, a directory in the system temp directory by default
+        max_size (int): max total size of all entries, in bytes
+    """
+    def __init__(self, enabled: bool, directory: str, max_size: int):
+        self.enabled = enabled
+        self.directory = directory
+        self.max_size = max_size
+    # end __init__
+
+    @staticmethod
+    def from_ui():
+        properties = bpy.context.scene.PBGPropertyGroup
+        directory = bpy.path.abspath(properties.cache_directory)
+        if not directory:
+            directory = os.path.join(tempfile.gettempdir(), "pbg_cache")
+        # end if
+        params = ParamsCache(
+            enabled=properties.cache_enable,
+            directory=directory,
+            max_size=properties.cache_size * 1024 * 1024
+        )
+        return params
+    # end from_ui
+# end ParamsCache
+
+
+def params_key(*args) -> str:
+    """
+    Creates a cache key from the given values
+    Args:
+        *args: Params instances (any object holding its values in attributes) or plain values, such as the seed or
+            the component name
+    Returns:
+        hex digest, identifying the given combination of values
+    """
+    h = hashlib.sha1()
+    h.update(repr(Constants.CACHE_FORMAT_VERSION).encode())
+    h.update(repr(Constants.PROFILE_CIRCLE_PRECISION).encode())
+    for arg in args:
+        if hasattr(arg, "__dict__"):
+            h.update(type(arg).__name__.encode())
+            h.update(repr(sorted(vars(arg).items())).encode())
+        else:
+            h.update(repr(arg).encode())
+        # end if
+    # end for
+    return h.hexdigest()
+# end params_key
+
+
+class GeometryCache:
+    """
+    On-disk cache of generated component geometry.
+
+    Note:
+        Each entry is a single file, named after its key, holding the arrays of a MeshArrays instance. Loaded
+        entries are memory mapped, so the arrays are passed to foreach_set without being copied first.
+        Entries are written to a temporary file and renamed, so the cache directory can be shared between multiple
+        blender instances. Once the total size of all entries grows over max_size, the least recently used entries
+        are removed.
+
+    Attributes:
+        directory (str): directory holding the cache files
+        max_size (int): max total size of all entries, in bytes
+    """
+    def __init__(self, directory: str, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+    # end __init__
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + FILE_EXTENSION)
+    # end path
+
+    @contextlib.contextmanager
+    def load(self, key: str):
+        """
+            Loads the entry with the given key
+            The arrays are only valid inside the with block.
+        Args:
+            key: entry key, result of params_key
+        Yields:
+            MeshArrays instance, or None if the entry does not exist or is not valid
+        """
+        path = self.path(key)
+        entry = map_entry(path)
+        if entry is None:
+            yield None
+            return
+        # end if
+        mm, view, arrays = entry
+        try:
+            yield Utils.MeshArrays(**arrays)
+        finally:
+            for item in arrays.values():
+                item.release()
+            # end for
+            view.release()
+            mm.close()
+        # end try
+        # refresh the access time, used for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        # end try
+    # end load
+
+    def store(self, key: str, arrays: Utils.MeshArrays):
+        """
+            Stores the given arrays under the given key, evicts old entries if needed
+        Args:
+            key: entry key, result of params_key
+            arrays: MeshArrays instance to store
+        """
+        items = [getattr(arrays, name) for name, typecode in ARRAY_LAYOUT]
+        header = struct.pack(HEADER_FORMAT, FILE_MAGIC, Constants.CACHE_FORMAT_VERSION, *[len(i) for i in items])
+        path = self.path(key)
+        path_tmp = path + "." + str(os.getpid()) + ".tmp"
+        with open(path_tmp, "wb") as f:
+            f.write(header)
+            for item in items:
+                f.write(memoryview(item).cast("B"))
+            # end for
+        # end with
+        os.replace(path_tmp, path)
+
+        # scanning the directory after every store would be quadratic in the number of entries, only scan once the
+        # estimated size is over max_size, or every EVICT_SCAN_INTERVAL stores to see the entries of other instances
+        if self.directory not in directory_sizes:
+            directory_sizes[self.directory] = [self.evict(), 0]
+        else:
+            estimate = directory_sizes[self.directory]
+            estimate[0] += len(header) + sum(4 * len(item) for item in items)
+            estimate[1] += 1
+            if estimate[0] > self.max_size or estimate[1] >= EVICT_SCAN_INTERVAL:
+                directory_sizes[self.directory] = [self.evict(), 0]
+            # end if
+        # end if
+    # end store
+
+    def evict(self) -> int:
+        """
+            Removes the least recently used entries until the total size of the cache is below max_size
+        Returns:
+            total size of the remaining entries, in bytes
+        """
+        entries = list()
+        total_size = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(FILE_EXTENSION):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+            # end if
+        # end for
+        entries.sort()
+        for mtime, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            # end if
+            remove_entry(path)
+            total_size -= size
+        # end for
+        return total_size
+    # end evict
+# end GeometryCache
+
+
+def map_entry(path: str):
+    """
+        Memory maps the cache file and checks that its arrays are complete and consistent. Missing, foreign, stale or
+        damaged files are treated as a cache miss, and the invalid ones are deleted
+    Args:
+        path: path of the cache file
+    Returns:
+        tuple(mmap.mmap, memoryview, dict) - the mapping, a view of it, and the arrays by MeshArrays attribute
+        name, views into the mapping. None if the entry can not be used
+    """
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # end with
+    except (OSError, ValueError):
+        # missing file, or empty file, which can not be mapped
+        if os.path.isfile(path):
+            remove_entry(path)
+        # end if
+        return None
+    # end try
+    view = memoryview(mm)
+    arrays = dict()
+    try:
+        header_size = struct.calcsize(HEADER_FORMAT)
+        if len(mm) < header_size:
+            raise ValueError("truncated header")
+        # end if
+        header = struct.unpack_from(HEADER_FORMAT, mm, 0)
+        if header[0] != FILE_MAGIC or header[1] != Constants.CACHE_FORMAT_VERSION:
+            raise ValueError("foreign or stale file")
+        # end if
+        counts = dict((name, count) for (name, typecode), count in zip(ARRAY_LAYOUT, header[2:]))
+        if len(mm) != header_size + 4 * sum(counts.values()):
+            raise ValueError("size does not match the header")
+        # end if
+        poly_count = counts["loop_starts"]
+        if (counts["co"] % 3 != 0 or counts["edges"] % 2 != 0 or counts["loop_totals"] != poly_count or
+                counts["material_indices"] != poly_count or counts["uvs"] not in (0, 2 * counts["loop_verts"])):
+            raise ValueError("inconsistent array lengths")
+        # end if
+        offset = header_size
+        for name, typecode in ARRAY_LAYOUT:
+            arrays[name] = view[offset:offset + 4 * counts[name]].cast(typecode)
+            offset += 4 * counts[name]
+        # end for
+        vert_count = counts["co"] // 3
+        loop_count = counts["loop_verts"]
+        for name in ("loop_verts", "edges"):
+            indices = numpy.frombuffer(arrays[name], dtype=numpy.int32)
+            if len(indices) > 0 and (indices.min() < 0 or indices.max() >= vert_count):
+                raise ValueError("vertex indices out of range")
+            # end if
+        # end for
+        if int(numpy.frombuffer(arrays["loop_totals"], dtype=numpy.int32).sum()) != loop_count:
+            raise ValueError("loop counts do not match")
+        # end if
+    except (ValueError, TypeError, struct.error) as e:
+        print("geometry cache: ignoring " + path + ", " + str(e))
+        for item in arrays.values():
+            item.release()
+        # end for
+        view.release()
+        mm.close()
+        remove_entry(path)
+        return None
+    # end try
+    return mm, view, arrays
+# end map_entry
+
+
+def remove_entry(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        # removed by another instance sharing the directory
+        pass
+    # end try
+# end remove_entry
@@ -19,3 +19,5 @@
 # ##### END GPL LICENSE BLOCK #####
 
 PROFILE_CIRCLE_PRECISION = 5
+
+CACHE_FORMAT_VERSION = 1
@@ -0,0 +1,304 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  Procedural building generator
+#  Copyright (C) 2019 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import numpy
+from . import Generator
+from . import Utils
+
+# vertex positions and placement matrices are rounded to this step before hashing
+FINGERPRINT_PRECISION = 1e-4
+# golden fingerprints of representative configurations, next to this file
+GOLDEN_FILE = "golden_fingerprints.json"
+# timing changes below this ratio are not reported
+TIMING_TOLERANCE = 0.1
+# numeric suffix blender appends to duplicate object names
+NAME_SUFFIX = re.compile(r"\.\d+$")
+
+
+def fingerprint_arrays(arrays: Utils.MeshArrays) -> dict:
+    """
+        Hashes the quantized vertex positions, faces and material indices of the mesh
+    Note:
+        Each face is hashed as the positions of its corners, starting from the smallest one, and the faces are
+        sorted, so the fingerprint does not depend on the order of vertices and faces, or on the first corner of
+        each face. Reordering (like the output stage does) keeps the fingerprint, flipping a face changes it.
+    Args:
+        arrays: Utils.MeshArrays instance
+    Returns:
+        dict with keys hash, verts, faces
+    """
+    co = numpy.asarray(arrays.co, dtype=numpy.float64).reshape((-1, 3))
+    quantized = numpy.round(co / FINGERPRINT_PRECISION).astype(numpy.int64)
+    corners = quantized[numpy.asarray(arrays.loop_verts, dtype=numpy.int64)].tolist()
+    faces = list()
+    for start, total, material in zip(arrays.loop_starts, arrays.loop_totals, arrays.material_indices):
+        face = [tuple(corner) for corner in corners[start:start + total]]
+        first = face.index(min(face))
+        faces.append((int(material), tuple(face[first:] + face[:first])))
+    # end for
+    faces.sort()
+    h = hashlib.sha1()
+    h.update(repr(faces).encode())
+    return {"hash": h.hexdigest(), "verts": len(co), "faces": len(faces)}
+# end fingerprint_arrays
+
+
+def fingerprint_placements(objects: list) -> str:
+    """
+        Hashes the quantized transforms of the given objects, in any order
+    Args:
+        objects: list(bpy.types.Object)
+    Returns:
+        hex digest
+    """
+    placements = list()
+    for obj in objects:
+        placements.append(tuple(int(round(value / FINGERPRINT_PRECISION))
+                                for row in obj.matrix_basis for value in row))
+    # end for
+    placements.sort()
+    h = hashlib.sha1()
+    h.update(repr(placements).encode())
+    return h.hexdigest()
+# end fingerprint_placements
+
+
+def fingerprint_building(group) -> dict:
+    """
+        Fingerprints each component of the building
+    Args:
+        group: group of the building
+    Returns:
+        dict, component name (object name without the building prefix) to dict with keys hash, verts, faces,
+        count (number of placed objects) and placements
+    """
+    components = dict()
+    prefix = group.name + "."
+    for obj in group.objects:
+        name = NAME_SUFFIX.sub("", obj.name[len(prefix):] if obj.name.startswith(prefix) else obj.name)
+        components.setdefault(name, list()).append(obj)
+    # end for
+    fingerprints = dict()
+    for name, objects in components.items():
+        if objects[0].data is None:
+            fingerprint = {"hash": None, "verts": 0, "faces": 0}
+        else:
+            fingerprint = fingerprint_arrays(Utils.mesh_to_arrays(objects[0].data))
+        # end if
+        fingerprint["count"] = len(objects)
+        fingerprint["placements"] = fingerprint_placements(objects)
+        fingerprints[name] = fingerprint
+    # end for
+    return fingerprints
+# end fingerprint_building
+
+
+def apply_configuration(properties, configuration: dict):
+    """
+        Resets all generation properties to their defaults, and sets the values given by the configuration. Tool
+        settings, like the cache settings, are kept
+    Args:
+        properties: PBGPropertyGroup instance
+        configuration: dict with key properties, values of the properties which differ from their defaults
+    """
+    for name in properties.bl_rna.properties.keys():
+        if name != "rna_type" and Generator.is_generation_property(name):
+            properties.property_unset(name)
+        # end if
+    # end for
+    Generator.restore_properties(properties, dict((name, value) for name, value in configuration["properties"].items()
+                                                  if Generator.is_generation_property(name)))
+# end apply_configuration
+
+
+def gen_configuration(context: bpy.types.Context, configuration: dict) -> tuple:
+    """
+        Generates a building from the given configuration, fingerprints it and deletes it
+    Args:
+        context: bpy.types.Context
+        configuration: dict with key properties, values of the properties which differ from their defaults
+    Returns:
+        tuple(dict, float) - fingerprints of the components, generation time in seconds
+    """
+    properties = context.scene.PBGPropertyGroup
+    apply_configuration(properties, configuration)
+    # measure the generator itself, not the geometry cache
+    properties.cache_enable = False
+
+    group = Generator.new_building()
+    time_start = time.time()
+    Generator.gen_building(context, group, group.name + ".")
+    elapsed = time.time() - time_start
+    fingerprints = fingerprint_building(group)
+    Generator.UndoStack.discard(list(group.objects))
+    bpy.data.groups.remove(group)
+    return fingerprints, elapsed
+# end gen_configuration
+
+
+def compare_configuration(name: str, golden: dict, fingerprints: dict) -> list:
+    """
+        Compares the fingerprints of a configuration against its golden values
+    Args:
+        name: name of the configuration
+        golden: dict with keys components and time, as stored in the golden file, empty if nothing was recorded
+        fingerprints: result of fingerprint_building
+    Returns:
+        list(str) - one line per difference, empty if the geometry matches
+    """
+    golden_components = golden.get("components", dict())
+    lines = list()
+    for component in sorted(set(golden_components) | set(fingerprints)):
+        old = golden_components.get(component)
+        new = fingerprints.get(component)
+        if old is None:
+            lines.append(name + ": " + component + ": new component")
+        elif new is None:
+            lines.append(name + ": " + component + ": missing component")
+        else:
+            if old["hash"] != new["hash"]:
+                lines.append(name + ": " + component + ": geometry changed, verts " + str(old["verts"]) + " -> " +
+                             str(new["verts"]) + ", faces " + str(old["faces"]) + " -> " + str(new["faces"]))
+            # end if
+            if old["count"] != new["count"] or old["placements"] != new["placements"]:
+                lines.append(name + ": " + component + ": placements changed, count " + str(old["count"]) + " -> " +
+                             str(new["count"]))
+            # end if
+        # end if
+    # end for
+    return lines
+# end compare_configuration
+
+
+def golden_path() -> str:
+    return os.path.join(os.path.dirname(os.path.realpath(__file__)), GOLDEN_FILE)
+# end golden_path
+
+
+def run_golden(context: bpy.types.Context, record: bool=False) -> tuple:
+    """
+        Generates every configuration of the golden file, and compares it against the stored fingerprints and timing
+    Args:
+        context: bpy.types.Context
+        record: if True, the results are stored as the new golden fingerprints and timing
+    Returns:
+        tuple(list(str), int) - report lines, number of configurations whose geometry differs
+    """
+    with open(golden_path(), "r") as f:
+        golden = json.load(f)
+    # end with
+    properties = context.scene.PBGPropertyGroup
+    values = Generator.snapshot_properties(properties)
+    lines = list()
+    mismatches = 0
+    try:
+        for configuration in golden["configurations"]:
+            fingerprints, elapsed = gen_configuration(context, configuration)
+            if len(configuration.get("components", dict())) == 0:
+                # nothing to compare against is a failure, not a pass
+                lines.append(configuration["name"] + ": no golden fingerprints, record them first")
+                mismatches += 1
+            else:
+                diff = compare_configuration(configuration["name"], configuration, fingerprints)
+                if len(diff) > 0:
+                    mismatches += 1
+                # end if
+                lines.extend(diff)
+            # end if
+            line = configuration["name"] + ": " + str(round(elapsed, 3)) + " s"
+            if configuration.get("time"):
+                ratio = elapsed / configuration["time"]
+                if abs(ratio - 1.0) > TIMING_TOLERANCE:
+                    line += ", " + str(round((ratio - 1.0) * 100.0, 1)) + "% against the baseline"
+                # end if
+            # end if
+            lines.append(line)
+            if record:
+                configuration["components"] = fingerprints
+                configuration["time"] = elapsed
+            # end if
+        # end for
+    finally:
+        Generator.restore_properties(properties, values)
+    # end try
+    if record:
+        with open(golden_path(), "w") as f:
+            json.dump(golden, f, indent=1, sort_keys=True)
+        # end with
+    # end if
+    return lines, mismatches
+# end run_golden
+
+
+def golden_main():
+    """
+        Entry point of a headless check, run in a background blender instance with this addon enabled.
+        Arguments after "--": "record" stores the results as the new golden fingerprints, otherwise the process
+        exits with status 1 if any configuration differs from the golden fingerprints.
+    """
+    arguments = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else list()
+    record = "record" in arguments
+    lines, mismatches = run_golden(bpy.context, record)
+    for line in lines:
+        print(line)
+    # end for
+    if mismatches > 0 and not record:
+        print(str(mismatches) + " configurations changed")
+        sys.exit(1)
+    # end if
+# end golden_main
+
+
+class CheckFingerprints(bpy.types.Operator):
+    # TODO: docstring
+
+    bl_idname = "pbg.check_fingerprints"
+    bl_label = "Check Fingerprints"
+    bl_options = {"REGISTER"}
+
+    record = bpy.props.BoolProperty(
+        name="Record",
+        description="Store the results as the new golden fingerprints and timing baseline",
+        default=False,
+        options={"SKIP_SAVE"}
+    )
+
+    def invoke(self, context, event):
+        lines, mismatches = run_golden(context, self.record)
+        for line in lines:
+            print(line)
+        # end for
+        if self.record:
+            self.report({"INFO"}, "Golden fingerprints recorded")
+        elif mismatches > 0:
+            self.report({"WARNING"}, str(mismatches) + " configurations changed or not recorded, see the console")
+        else:
+            self.report({"INFO"}, "All configurations match")
+        # end if
+        return {"FINISHED"}
+    # end invoke
+# end CheckFingerprints
@@ -20,16 +20,29 @@
 
 import bpy
 import math
+import bisect
+import functools
 import mathutils
 from . import Utils
 
+# max distance of a door from the footprint edge it is placed on
+DOOR_SNAP_DISTANCE = 0.01
+# edge lengths are rounded to this many decimals before looking up their window/pillar pattern
+EDGE_LENGTH_PRECISION = 6
+# max number of memoized edge patterns
+EDGE_PATTERN_CACHE_SIZE = 4096
+# max distance between a vert and the mirrored position of its pair, for the building to be treated as symmetric
+MIRROR_DISTANCE = 0.0001
+
 
 class ParamsGeneral:
     # TODO: docstring
     def __init__(self, floor_count: int, floor_height: float, floor_offset: float, generate_separator: bool,
                  separator_height: float, separator_width: float, window_width: float, window_height: float,
                  window_offset: float, distance_window_window: float, generate_pillar: bool,
-                 distance_window_pillar: float, door_width: float, door_height: float):
+                 distance_window_pillar: float, door_width: float, door_height: float, door_count: int,
+                 door_count_back: int, door_count_left: int, door_count_right: int, distance_door_door: float,
+                 use_symmetry: bool):
         self.floor_count = floor_count
         self.floor_height = floor_height
         self.floor_offset = floor_offset
@@ -44,6 +57,12 @@ class ParamsGeneral:
         self.distance_window_pillar = distance_window_pillar
         self.door_width = door_width
         self.door_height = door_height
+        self.door_count = door_count
+        self.door_count_back = door_count_back
+        self.door_count_left = door_count_left
+        self.door_count_right = door_count_right
+        self.distance_door_door = distance_door_door
+        self.use_symmetry = use_symmetry
     # end __init__
 
     @staticmethod
@@ -63,7 +82,13 @@ class ParamsGeneral:
             generate_pillar=properties.generate_pillar,
             distance_window_pillar=properties.distance_window_pillar,
             door_width=properties.door_width,
-            door_height=properties.door_height
+            door_height=properties.door_height,
+            door_count=properties.door_count,
+            door_count_back=properties.door_count_back,
+            door_count_left=properties.door_count_left,
+            door_count_right=properties.door_count_right,
+            distance_door_door=properties.distance_door_door,
+            use_symmetry=properties.use_symmetry
         )
         return params
     # end from_ui
@@ -154,250 +179,593 @@ def gen_footprint(params_footprint: ParamsFootprint) -> list:
 # end gen_footprint
 
 
-def gen_layout(params_general: ParamsGeneral, footprint: list, door_position: tuple) -> dict:
+def gen_edge_doors(params_general: ParamsGeneral, door_count: int, length: float, center: tuple, direction: tuple,
+                   edge_name: str, warnings: list) -> list:
+    """
+        Generates the positions of doors centered on a footprint edge. Doors are moved closer together if they do
+        not fit on the edge at distance_door_door, and never closer than door_width, doors which still do not fit
+        are dropped
+    Args:
+        params_general: Instance of ParamsGeneral class
+        door_count: number of doors on the edge
+        length: length of the edge
+        center: tuple(x,y) - middle of the edge
+        direction: tuple(x,y) - unit vector along the edge
+        edge_name: name of the edge, used in the warnings
+        warnings: list(str) - a warning is appended for each dropped door
+    Returns:
+        list(tuple(tuple(x,y,z), rot)) - door positions and rotations
+    """
+    door_positions = list()
+    if door_count == 0:
+        return door_positions
+    # end if
+    # door centers have to stay within this distance from each other
+    span = length - params_general.door_width
+    if span < -DOOR_SNAP_DISTANCE:
+        warnings.append("door width " + str(params_general.door_width) + " does not fit on the " + edge_name +
+                        " edge, length " + str(round(length, 3)) + ", no doors placed")
+        return door_positions
+    # end if
+    if door_count > 1 and params_general.door_width > 0:
+        fit_count = int(max(span, 0.0) / params_general.door_width + DOOR_SNAP_DISTANCE) + 1
+        if door_count > fit_count:
+            warnings.append(str(door_count - fit_count) + " of " + str(door_count) + " doors do not fit on the " +
+                            edge_name + " edge, length " + str(round(length, 3)) + ", they are dropped")
+            door_count = fit_count
+        # end if
+    # end if
+    distance = params_general.distance_door_door
+    if door_count > 1:
+        distance = min(max(distance, params_general.door_width), max(span, 0.0) / (door_count - 1))
+    # end if
+
+    for i in range(0, door_count):
+        offset = (i - 0.5 * (door_count - 1)) * distance
+        door_positions.append(((center[0] + offset * direction[0], center[1] + offset * direction[1],
+                                params_general.floor_offset), 0))
+    # end for
+    return door_positions
+# end gen_edge_doors
+
+
+def gen_door_positions(params_general: ParamsGeneral, params_footprint: ParamsFootprint) -> dict:
     """
-    Generates the layout of windows, pillars and walls
+        Generates the door positions, door_count doors are centered on the front edge of the building (the wedge if
+        there is one), door_count_back on the back edge, door_count_left and door_count_right on the side edges
+    Args:
+        params_general: Instance of ParamsGeneral class
+        params_footprint: Instance of ParamsFootprint class
+    Returns:
+        a dictionary with the following keys
+            "positions" - list(tuple(tuple(x,y,z), rot)) - door positions and rotations
+            "warnings" - list(str) - doors which do not fit on their edge and are dropped
+    """
+    width = params_footprint.building_width
+    depth = params_footprint.building_depth
+    chamfer = params_footprint.building_chamfer
+    if params_footprint.building_wedge_depth > 0 and params_footprint.building_wedge_width > 0:
+        front = (params_footprint.building_wedge_width, 0.5 * depth + params_footprint.building_wedge_depth)
+    else:
+        front = (width - 2 * chamfer, 0.5 * depth)
+    # end if
+    edges = (
+        (params_general.door_count, front[0], (0.0, front[1]), (1.0, 0.0), "front"),
+        (params_general.door_count_back, width - 2 * chamfer, (0.0, -0.5 * depth), (1.0, 0.0), "back"),
+        (params_general.door_count_left, depth - 2 * chamfer, (-0.5 * width, 0.0), (0.0, 1.0), "left"),
+        (params_general.door_count_right, depth - 2 * chamfer, (0.5 * width, 0.0), (0.0, 1.0), "right")
+    )
+    result = {"positions": list(), "warnings": list()}
+    for door_count, length, center, direction, edge_name in edges:
+        result["positions"].extend(gen_edge_doors(params_general, door_count, length, center, direction, edge_name,
+                                                  result["warnings"]))
+    # end for
+    return result
+# end gen_door_positions
+
+
+def merge_intervals(intervals: list) -> list:
+    """
+        Merges overlapping intervals
+    Args:
+        intervals: list(tuple(start, end))
+    Returns:
+        list(tuple(start, end)) - sorted, non overlapping intervals
+    """
+    merged = list()
+    for interval in sorted(intervals):
+        if len(merged) > 0 and interval[0] <= merged[-1][1]:
+            if interval[1] > merged[-1][1]:
+                merged[-1] = (merged[-1][0], interval[1])
+            # end if
+        else:
+            merged.append(interval)
+        # end if
+    # end for
+    return merged
+# end merge_intervals
+
+
+def subtract_intervals(perimeter_length: float, openings: list) -> list:
+    """
+        Subtracts the openings from the closed interval [0, perimeter_length), which wraps around
+    Args:
+        perimeter_length: length of the whole interval
+        openings: list(tuple(start, end)) - intervals to subtract
+    Returns:
+        list(tuple(start, end)) - remaining intervals, the last one can end after perimeter_length, in which case it
+            wraps around to the start. If there are no openings, the whole interval is returned.
+    """
+    merged = merge_intervals(openings)
+    if len(merged) == 0:
+        return [(0.0, perimeter_length)]
+    # end if
+    solids = list()
+    for i in range(0, len(merged) - 1):
+        solids.append((merged[i][1], merged[i + 1][0]))
+    # end for
+    solids.append((merged[-1][1], merged[0][0] + perimeter_length))
+    return [solid for solid in solids if solid[1] - solid[0] > 1e-6]
+# end subtract_intervals
+
+
+def subtract_intervals_open(start: float, end: float, openings: list) -> list:
+    """
+        Subtracts the openings from the interval [start, end]
+    Args:
+        start: start of the interval
+        end: end of the interval
+        openings: list(tuple(start, end)) - intervals to subtract
+    Returns:
+        list(tuple(start, end)) - remaining intervals
+    """
+    solids = list()
+    current = start
+    for opening in merge_intervals(openings):
+        if opening[0] >= end:
+            break
+        # end if
+        if opening[0] > current:
+            solids.append((current, opening[0]))
+        # end if
+        current = max(current, opening[1])
+    # end for
+    if end > current:
+        solids.append((current, end))
+    # end if
+    return [solid for solid in solids if solid[1] - solid[0] > 1e-6]
+# end subtract_intervals_open
+
+
+def perimeter_point(footprint: list, edge_starts: list, perimeter_length: float, s: float, z: float) -> tuple:
+    """
+        Returns the point on the footprint at the given distance along the perimeter
+    Args:
+        footprint: list(tuple(x,y,z)) - building footprint
+        edge_starts: list(float) - distance along the perimeter where each edge starts
+        perimeter_length: total length of the perimeter
+        s: distance along the perimeter
+        z: z coordinate of the point
+    Returns:
+        tuple(x,y,z)
+    """
+    s = s % perimeter_length
+    i = max(bisect.bisect_right(edge_starts, s) - 1, 0)
+    vert_start = footprint[i]
+    vert_end = footprint[(i + 1) % len(footprint)]
+    edge_length = math.hypot(vert_end[0] - vert_start[0], vert_end[1] - vert_start[1])
+    f = (s - edge_starts[i]) / edge_length
+    return (vert_start[0] + f * (vert_end[0] - vert_start[0]), vert_start[1] + f * (vert_end[1] - vert_start[1]), z)
+# end perimeter_point
+
+
+def perimeter_polyline(footprint: list, edge_starts: list, perimeter_length: float, solid: tuple, z: float) -> list:
+    """
+        Returns the verts of the given interval of the perimeter, including all footprint corners inside it
+    Args:
+        footprint: list(tuple(x,y,z)) - building footprint
+        edge_starts: list(float) - distance along the perimeter where each edge starts
+        perimeter_length: total length of the perimeter
+        solid: tuple(start, end) - interval of the perimeter, end can be greater than perimeter_length
+        z: z coordinate of the verts
+    Returns:
+        list(tuple(x,y,z))
+    """
+    verts = [perimeter_point(footprint, edge_starts, perimeter_length, solid[0], z)]
+    for offset in (0.0, perimeter_length):
+        i = bisect.bisect_right(edge_starts, solid[0] - offset)
+        while i < len(edge_starts) and edge_starts[i] + offset < solid[1]:
+            verts.append((footprint[i][0], footprint[i][1], z))
+            i += 1
+        # end while
+    # end for
+    verts.append(perimeter_point(footprint, edge_starts, perimeter_length, solid[1], z))
+    return verts
+# end perimeter_polyline
+
+
+def find_mirror_edges(footprint: list):
+    """
+        Checks whether the footprint is mirror symmetric on the X axis (x=0 plane), and finds the two edges crossing
+        the mirror plane. Both crossing edges must be perpendicular to the mirror plane, so the footprint can be cut
+        in their middle without any mitering.
+    Args:
+        footprint: list(tuple(x,y,z)) - building footprint
+    Returns:
+        tuple(i_start, i_end) - indices of the crossing edges, edge i_start goes from +x to -x side. None if the
+            footprint is not symmetric
+    """
+    vert_count = len(footprint)
+    for vert in footprint:
+        if not any(math.isclose(vert[0], -other[0], abs_tol=MIRROR_DISTANCE) and
+                   math.isclose(vert[1], other[1], abs_tol=MIRROR_DISTANCE) for other in footprint):
+            return None
+        # end if
+    # end for
+    i_start = None
+    i_end = None
+    for i in range(0, vert_count):
+        vert_start = footprint[i]
+        vert_end = footprint[(i + 1) % vert_count]
+        if abs(vert_start[0]) <= MIRROR_DISTANCE or abs(vert_end[0]) <= MIRROR_DISTANCE:
+            # mirror plane goes through a corner
+            return None
+        # end if
+        if (vert_start[0] < 0) != (vert_end[0] < 0):
+            if not math.isclose(vert_start[1], vert_end[1], abs_tol=MIRROR_DISTANCE):
+                return None
+            # end if
+            if vert_end[0] < 0 and i_start is None:
+                i_start = i
+            elif vert_end[0] > 0 and i_end is None:
+                i_end = i
+            else:
+                return None
+            # end if
+        # end if
+    # end for
+    if i_start is None or i_end is None:
+        return None
+    # end if
+    return i_start, i_end
+# end find_mirror_edges
+
+
+def is_mirror_symmetric(positions: list) -> bool:
+    """
+        Checks whether the given positions are mirror symmetric on the X axis (x=0 plane)
+    Args:
+        positions: list(tuple(tuple(x,y,z), rot))
+    Returns:
+        bool
+    """
+    for position in positions:
+        if not any(math.isclose(position[0][0], -other[0][0], abs_tol=MIRROR_DISTANCE) and
+                   math.isclose(position[0][1], other[0][1], abs_tol=MIRROR_DISTANCE) for other in positions):
+            return False
+        # end if
+    # end for
+    return True
+# end is_mirror_symmetric
+
+
+def gen_footprint_half(footprint: list, mirror_edges: tuple) -> list:
+    """
+        Returns the -x half of a mirror symmetric footprint, as an open polyline
+    Args:
+        footprint: list(tuple(x,y,z)) - building footprint
+        mirror_edges: tuple(i_start, i_end) - result of find_mirror_edges
+    Returns:
+        list(tuple(x,y,z)) - verts going from the middle of edge i_start to the middle of edge i_end, both of which
+            are on the mirror plane
+    """
+    vert_count = len(footprint)
+    half = list()
+    half.append((0.0, footprint[mirror_edges[0]][1], footprint[mirror_edges[0]][2]))
+    i = (mirror_edges[0] + 1) % vert_count
+    while True:
+        half.append(footprint[i])
+        if i == mirror_edges[1]:
+            break
+        # end if
+        i = (i + 1) % vert_count
+    # end while
+    half.append((0.0, footprint[mirror_edges[1]][1], footprint[mirror_edges[1]][2]))
+    return half
+# end gen_footprint_half
+
+
+@functools.lru_cache(maxsize=EDGE_PATTERN_CACHE_SIZE)
+def gen_edge_pattern(length: float, window_width: float, distance_window_window: float, generate_pillar: bool,
+                     distance_window_pillar: float) -> tuple:
+    """
+        Calculates window and pillar positions along a single footprint edge
+        The pattern only depends on the edge length and spacing, so it is memoized and shared by all edges with the
+        same length, in all generated buildings.
+    Args:
+        length: length of the edge, rounded to EDGE_LENGTH_PRECISION decimals
+        window_width: width of the window
+        distance_window_window: distance between two window centers
+        generate_pillar: whether pillars are generated
+        distance_window_pillar: distance between window center and pillar center
+    Returns:
+        tuple(tuple(float), tuple(float)) - window positions and pillar positions, as signed distance from the middle of
+            the edge
+    """
+    window_positions = list()
+    pillar_positions = list()
+
+    # calculate number of windows for this edge
+    if generate_pillar:
+        window_count = math.floor((length - 2 * distance_window_pillar) / distance_window_window) + 1
+    else:
+        window_count = math.floor((length - window_width) / distance_window_window) + 1
+    # end if
+
+    # sanity check here
+    if window_count < 0:
+        window_count = 0
+    # end if
+
+    # check whether to generate one or two pillars between windows
+    if 2 * distance_window_pillar >= distance_window_window:
+        has_single_pillar = True
+    else:
+        has_single_pillar = False
+    # end if
+
+    for j in range(0, window_count):
+        t_window = (j - 0.5 * (window_count - 1)) * distance_window_window
+        window_positions.append(t_window)
+        if j == 0 or has_single_pillar is False:
+            pillar_positions.append(t_window - distance_window_pillar)
+        # end if
+        pillar_positions.append(t_window + distance_window_pillar)
+    # end for
+    return tuple(window_positions), tuple(pillar_positions)
+# end gen_edge_pattern
+
+
+def gen_layout(params_general: ParamsGeneral, footprint: list, door_positions: list) -> dict:
+    """
+    Generates the layout of windows, pillars, doors and walls
+    Each footprint edge is treated as an interval of the building perimeter. Windows (and doors on the ground floor)
+    are openings in that interval, walls are what remains after subtracting all openings.
+    If params_general.use_symmetry is set and both the footprint and the doors are mirror symmetric on the X axis,
+    only the -x half of the perimeter is processed. Positions are mirrored, wall loops are only generated for the
+    -x half and have to be mirrored by the mesh generating function.
     Args:
         params_general: Instance of ParamsGeneral class
         footprint: list(tuple(x,y,z)) - list of tuples where each tuple is an xyz coordinate of the footprint
-        door_position: tuple(tuple(x,y,z), rot) - tuple, where first element is the xyz coordinate of the door position,
-            and second element is the door rotation on Z axis.
+        door_positions: list(tuple(tuple(x,y,z), rot)) - list of door positions, any number of doors is supported.
+            Each door is placed on the footprint edge closest to it, doors further than DOOR_SNAP_DISTANCE from
+            any edge are dropped. Rotation is taken from the edge.
     Returns:
         a dictionary with the following keys
             "window_positions" - list(tuple(tuple(x,y,z), rot)) list of tuples, where each item contains the x,y,z
                 position of the window and it's rotation on the z axis.
             "pillar_positions" - list(tuple(tuple(x,y,z), rot)) list of tuples, where each item contains the x,y,z
                 position of the pillar and it's rotation on the z axis.
-            wall_loops - list(list(tuple(x,y,z)) - list, containing a list of verts, ie loops to be used for extruding
-                walls
+            "door_positions" - list(tuple(tuple(x,y,z), rot)) list of tuples, where each item contains the x,y,z
+                position of the door and it's rotation on the z axis.
+            "wall_loops_ground" - list(list(tuple(x,y,z)) - list, containing a list of verts, ie loops to be used for
+                extruding ground floor walls
+            "wall_loops_upper" - list(list(tuple(x,y,z)) - loops to be used for extruding the walls of the first
+                upper floor. All upper floors are the same, and are created by translating this one.
+            "is_mirrored" - bool, True if the wall loops only cover the -x half of the building
+            "warnings" - list(str) - doors which are dropped, because they are off the footprint or overlap
+                another door
     """
     window_positions = list()
     pillar_positions = list()
-    wall_loops = list()
-    wall_verts = list()
-    wall_verts_initial = list()
-    is_first_loop = True
+    layout_door_positions = list()
+    wall_loops_ground = list()
+    wall_loops_upper = list()
+    window_openings = list()
+    door_openings = list()
+    warnings = list()
+    vert_count = len(footprint)
+
+    # check for symmetry, start the perimeter on the edge crossing the mirror plane
+    mirror_edges = None
+    if params_general.use_symmetry and is_mirror_symmetric(door_positions):
+        mirror_edges = find_mirror_edges(footprint)
+    # end if
+    if mirror_edges is not None:
+        footprint = footprint[mirror_edges[0]:] + footprint[:mirror_edges[0]]
+        edge_range = range(0, (mirror_edges[1] - mirror_edges[0]) % vert_count + 1)
+    else:
+        edge_range = range(0, vert_count)
+    # end if
 
-    for i in range(0, len(footprint)):
-        # assign start and end vertex
+    # distance along the perimeter where each edge starts
+    edge_starts = list()
+    perimeter_length = 0.0
+    for i in range(0, vert_count):
         vert_start = footprint[i]
-        if i == len(footprint) - 1:
-            vert_end = footprint[0]
-        else:
-            vert_end = footprint[i+1]
+        vert_end = footprint[(i + 1) % vert_count]
+        edge_starts.append(perimeter_length)
+        perimeter_length += math.hypot(vert_end[0] - vert_start[0], vert_end[1] - vert_start[1])
+    # end for
+
+    # the processed part of the perimeter, from the middle of the first to the middle of the last crossing edge
+    if mirror_edges is not None:
+        s_start = 0.5 * edge_starts[1]
+        s_end = 0.5 * (edge_starts[edge_range[-1]] + edge_starts[(edge_range[-1] + 1) % vert_count])
+    else:
+        s_start = 0.0
+        s_end = perimeter_length
+    # end if
+
+    def push_position(positions: list, pos: tuple, rot: float):
+        # push the position, and it's mirrored copy if it is not on the mirror plane
+        positions.append((pos, rot))
+        if mirror_edges is not None and pos[0] < -MIRROR_DISTANCE:
+            positions.append(((-pos[0], pos[1], pos[2]), -rot))
         # end if
+    # end push_position
+
+    # snap doors to the closest edge, convert to intervals
+    for door_position in door_positions:
+        best = None
+        for i in range(0, vert_count):
+            vert_start = footprint[i]
+            vert_end = footprint[(i + 1) % vert_count]
+            length_x = vert_end[0] - vert_start[0]
+            length_y = vert_end[1] - vert_start[1]
+            length = math.hypot(length_x, length_y)
+            if length < 1e-6:
+                continue
+            # end if
+            t = ((door_position[0][0] - vert_start[0]) * length_x +
+                 (door_position[0][1] - vert_start[1]) * length_y) / length
+            t = min(max(t, 0.0), length)
+            dist = math.hypot(vert_start[0] + t * length_x / length - door_position[0][0],
+                              vert_start[1] + t * length_y / length - door_position[0][1])
+            if best is None or dist < best[0]:
+                best = (dist, i, t)
+            # end if
+        # end for
+        if best is None or best[0] > DOOR_SNAP_DISTANCE:
+            warnings.append("door at " + str(tuple(round(value, 3) for value in door_position[0])) +
+                            " is not on the footprint edge, it is dropped")
+            continue
+        # end if
+        s = edge_starts[best[1]] + best[2]
+        opening = (s - 0.5 * params_general.door_width, s + 0.5 * params_general.door_width)
+        if any(opening[0] < other[1] - DOOR_SNAP_DISTANCE and other[0] < opening[1] - DOOR_SNAP_DISTANCE
+               for other in door_openings):
+            warnings.append("door at " + str(tuple(round(value, 3) for value in door_position[0])) +
+                            " overlaps another door, it is dropped")
+            continue
+        # end if
+        door_openings.append(opening)
+        layout_door_positions.append((perimeter_point(footprint, edge_starts, perimeter_length, s,
+                                                      params_general.floor_offset), edge_rotation(footprint, best[1])))
+    # end for
+    door_openings = merge_intervals(door_openings)
+    door_starts = [door[0] for door in door_openings]
 
-        # push the first vert into the array
-        if is_first_loop:
-            wall_verts_initial.append((vert_start[0], vert_start[1], params_general.floor_offset))
-        else:
-            wall_verts.append((vert_start[0], vert_start[1], params_general.floor_offset))
-        # end if;
+    def is_in_door(start: float, end: float) -> bool:
+        # check whether the given interval overlaps any door, doors are sorted and do not overlap
+        j = bisect.bisect_right(door_starts, end)
+        return j > 0 and door_openings[j - 1][1] >= start
+    # end is_in_door
+
+    def is_in_range(s: float) -> bool:
+        # check whether the given position is on the processed part of the perimeter
+        return s_start - MIRROR_DISTANCE <= s <= s_end + MIRROR_DISTANCE
+    # end is_in_range
+
+    for i in edge_range:
+        # assign start and end vertex
+        vert_start = footprint[i]
+        vert_end = footprint[(i + 1) % vert_count]
 
         # calculate length of edge
-        length_x = vert_end[0] - vert_start[0]
-        length_y = vert_end[1] - vert_start[1]
-        length = math.sqrt(length_x * length_x + length_y * length_y)
-
-        # calculate number of windows for this edge
-        if params_general.generate_pillar:
-            window_count = math.floor((length - 2 * params_general.distance_window_pillar) /
-                                      params_general.distance_window_window) + 1
-        else:
-            window_count = math.floor((length - params_general.window_width) /
-                                      params_general.distance_window_window) + 1
-
-        # sanity check here
-        if window_count < 0:
-            window_count = 0
-
-        # calculate distance between windows on x and y axis
-        ww_dist_x = (params_general.distance_window_window / length) * length_x
-        ww_dist_y = (params_general.distance_window_window / length) * length_y
-        window_width_x = (params_general.window_width / length) * length_x
-        window_width_y = (params_general.window_width / length) * length_y
-
-        # calculate distance from window to pillar on x and y axis
-        wp_dist_x = (params_general.distance_window_pillar / length) * length_x
-        wp_dist_y = (params_general.distance_window_pillar / length) * length_y
-
-        # check whether to generate one or two pillars between windows
-        if 2 * params_general.distance_window_pillar >= params_general.distance_window_window:
-            has_single_pillar = True
-        else:
-            has_single_pillar = False
+        length = math.hypot(vert_end[0] - vert_start[0], vert_end[1] - vert_start[1])
+        if length < 1e-6:
+            continue
         # end if
 
+        # window and pillar positions along the edge, the same for all edges of this length
+        pattern = gen_edge_pattern(round(length, EDGE_LENGTH_PRECISION), params_general.window_width,
+                                   params_general.distance_window_window, params_general.generate_pillar,
+                                   params_general.distance_window_pillar)
+
         # calculate window and pillar rotation (it's always the same)
-        vec_edge = Utils.vec_from_verts(vert_end, vert_start)
-        vec_0 = mathutils.Vector((0.0, 1.0, 0.0))
-        rot = vec_edge.xy.angle_signed(vec_0.xy) - 0.5 * math.pi
-
-        # calculate door range for calculating intersects
-        door_size_x = math.cos(door_position[1])*params_general.door_width
-        door_size_y = math.sin(door_position[1])*params_general.door_width
-        door_start = (door_position[0][0]-0.5*door_size_x,
-                      door_position[0][1]-0.5*door_size_y,
-                      params_general.floor_offset)
-        door_end = (door_position[0][0]+0.5*door_size_x,
-                    door_position[0][1]+0.5*door_size_y,
-                    params_general.floor_offset)
-        for j in range(0, window_count):
-            # calculate window position
-            window_pos = ((vert_start[0] + ((length_x - (window_count - 1) * ww_dist_x) / 2) + j * ww_dist_x),
-                          (vert_start[1] + ((length_y - (window_count - 1) * ww_dist_y) / 2) + j * ww_dist_y),
-                          params_general.floor_offset
-                          )
-
-            # check whether the window intersects with the door, push first floor accordingly
-            vert_1 = (window_pos[0] - 0.5 * window_width_x, window_pos[1] - 0.5 * window_width_y, 0)
-            vert_2 = (window_pos[0] + 0.5 * window_width_x, window_pos[1] - 0.5 * window_width_y, 0)
-            if not (Utils.vert_check_intersect(vert_1, door_start, door_end) or
-                    Utils.vert_check_intersect(vert_2, door_start, door_end) or
-                    Utils.vert_check_intersect(window_pos, door_start, door_end)):
-                window_positions.append((window_pos, rot))
-            else:
-                # windows intersected with the door and was not pushed
-                if(Utils.vert_check_intersect(vert_1, door_start, door_end) and
-                        (not Utils.vert_check_intersect(vert_2, door_start, door_end))):
-                    window_loop = list()
-                    window_loop.append(door_end)
-                    window_loop.append((vert_2[0], vert_2[1], params_general.floor_offset))
-                    wall_loops.append(window_loop)
-                elif(Utils.vert_check_intersect(vert_2, door_start, door_end) and
-                     (not Utils.vert_check_intersect(vert_1, door_start, door_end))):
-                    window_loop = list()
-                    window_loop.append((vert_1[0], vert_1[1], params_general.floor_offset))
-                    window_loop.append(door_start)
-                    wall_loops.append(window_loop)
-                elif(Utils.vert_check_intersect(window_pos, door_start, door_end) and
-                     (not Utils.vert_check_intersect(vert_1, door_start, door_end)) and
-                     (not Utils.vert_check_intersect(vert_1, door_start, door_end))):
-                    window_loop = list()
-                    window_loop.append((vert_1[0], vert_1[1], params_general.floor_offset))
-                    window_loop.append(door_start)
-                    wall_loops.append(window_loop)
-                    window_loop = list()
-                    window_loop.append(door_end)
-                    window_loop.append((vert_2[0], vert_2[1], params_general.floor_offset))
-                    wall_loops.append(window_loop)
+        rot = edge_rotation(footprint, i)
+        dir_x = (vert_end[0] - vert_start[0]) / length
+        dir_y = (vert_end[1] - vert_start[1]) / length
+
+        for t_window in pattern[0]:
+            # window position, as distance along the edge and along the perimeter
+            t_window += 0.5 * length
+            s_window = edge_starts[i] + t_window
+            if not is_in_range(s_window):
+                continue
             # end if
-
-            # push all other floors
-            for floor in range(1, params_general.floor_count + 1):
+            window_opening = (s_window - 0.5 * params_general.window_width,
+                              s_window + 0.5 * params_general.window_width)
+            window_openings.append(window_opening)
+
+            # ground floor window is left out if it intersects with any door
+            window_pos = (vert_start[0] + t_window * dir_x, vert_start[1] + t_window * dir_y)
+            for floor in range(0, params_general.floor_count + 1):
+                if floor == 0 and is_in_door(window_opening[0], window_opening[1]):
+                    continue
+                # end if
                 pos = (window_pos[0], window_pos[1], params_general.floor_offset + floor * params_general.floor_height)
-                window_positions.append((pos, rot))
+                push_position(window_positions, pos, rot)
             # end for
+        # end for
 
-            # calculate pillar position
-            if j == 0 or has_single_pillar is False:
-                pillar_pos = (
-                    window_pos[0] - wp_dist_x,
-                    window_pos[1] - wp_dist_y,
-                    params_general.floor_offset
-                )
-
-                # check whether the pillar intersects with the door, push accordingly
-                if not Utils.vert_check_intersect(pillar_pos, door_start, door_end):
-                    pillar_positions.append((pillar_pos, rot))
-                # end if
-
-                # push all other floors
-                for floor in range(1, params_general.floor_count+1):
-                    pos = (pillar_pos[0], pillar_pos[1], params_general.floor_offset+floor*params_general.floor_height)
-                    pillar_positions.append((pos, rot))
-                # end for
-            # end if
-            pillar_pos = (
-                window_pos[0] + wp_dist_x,
-                window_pos[1] + wp_dist_y,
-                params_general.floor_offset
-            )
-
-            # check whether the pillar intersects with the door, push accordingly
-            if not Utils.vert_check_intersect(pillar_pos, door_start, door_end):
-                pillar_positions.append((pillar_pos, rot))
+        for t_pillar in pattern[1]:
+            t_pillar += 0.5 * length
+            s_pillar = edge_starts[i] + t_pillar
+            if not is_in_range(s_pillar):
+                continue
             # end if
-
-            # push all other floors
-            for floor in range(1, params_general.floor_count + 1):
+            pillar_pos = (vert_start[0] + t_pillar * dir_x, vert_start[1] + t_pillar * dir_y)
+            for floor in range(0, params_general.floor_count + 1):
+                if floor == 0 and is_in_door(s_pillar, s_pillar):
+                    continue
+                # end if
                 pos = (pillar_pos[0], pillar_pos[1], params_general.floor_offset + floor * params_general.floor_height)
-                pillar_positions.append((pos, rot))
+                push_position(pillar_positions, pos, rot)
             # end for
+        # end for
+    # end for
 
-            # calculate the last vert of this loop, because it is broken by the window
-            vert_wall = (window_pos[0] - 0.5 * window_width_x,
-                         window_pos[1] - 0.5 * window_width_y,
-                         params_general.floor_offset)
-            # push it into the loops array
-            if is_first_loop:
-                wall_verts_initial.append(vert_wall)
-                is_first_loop = False
-            else:
-                wall_verts.append(vert_wall)
-                # make a copy of wall verts, implement check and modification for first floor
-                loop = list()
-                for vert in wall_verts:
-                    if not Utils.vert_check_intersect(vert, door_start, door_end):
-                        loop.append(vert)
-                if len(wall_verts) == len(loop):
-                    wall_loops.append(loop)
-                elif Utils.vert_check_intersect(wall_verts[len(wall_verts)-1], door_start, door_end) and len(loop):
-                    loop.append(door_start)
-                    wall_loops.append(loop)
-                elif Utils.vert_check_intersect(wall_verts[0], door_start, door_end) and len(loop):
-                    loop.insert(0, door_end)
-                    wall_loops.append(loop)
-
-                # make a copy of wall_verts for each floor, push for each floor except ground
-                for floor in range(1, params_general.floor_count + 1):
-                    loop = list()
-                    for vert in wall_verts:
-                        loop.append((vert[0], vert[1], params_general.floor_offset + floor*params_general.floor_height))
-                    wall_loops.append(loop)
-                wall_verts.clear()
-            # end if
-
-            # calculate the first vert of the next loop and push it into the loops array
-            vert_wall = (window_pos[0] + 0.5 * window_width_x,
-                         window_pos[1] + 0.5 * window_width_y,
-                         params_general.floor_offset)
-            wall_verts.append(vert_wall)
-        # end while
-
-        # check if this is the last edge, append the layout_verts_initial to the current layout_verts
-        if i == len(footprint) - 1:
-            verts = wall_verts + wall_verts_initial
-
-            # make a copy of wall verts, implement check and modification for first floor
-            loop = list()
-            for vert in verts:
-                if not Utils.vert_check_intersect(vert, door_start, door_end):
-                    loop.append(vert)
-            if len(verts) == len(loop):
-                wall_loops.append(loop)
-            elif Utils.vert_check_intersect(verts[len(wall_verts) - 1], door_start, door_end) and len(loop):
-                loop.append(door_start)
-                wall_loops.append(loop)
-            elif Utils.vert_check_intersect(verts[0], door_start, door_end) and len(loop):
-                loop.insert(0, door_end)
-                wall_loops.append(loop)
-
-            # make a copy of wall_verts for each floor, push for each floor except ground
-            for floor in range(1, params_general.floor_count + 1):
-                loop = list()
-                for vert in verts:
-                    loop.append((vert[0], vert[1], params_general.floor_offset + floor * params_general.floor_height))
-                wall_loops.append(loop)
-            wall_verts.clear()
+    # ground floor openings are doors and all windows which do not intersect a door
+    ground_openings = list(door_openings)
+    for window_opening in window_openings:
+        if not is_in_door(window_opening[0], window_opening[1]):
+            ground_openings.append(window_opening)
         # end if
     # end for
+    if mirror_edges is not None:
+        ground_solids = subtract_intervals_open(s_start, s_end, ground_openings)
+        upper_solids = subtract_intervals_open(s_start, s_end, window_openings)
+    else:
+        ground_solids = subtract_intervals(perimeter_length, ground_openings)
+        upper_solids = subtract_intervals(perimeter_length, window_openings)
+    # end if
+    for solid in ground_solids:
+        wall_loops_ground.append(perimeter_polyline(footprint, edge_starts, perimeter_length, solid,
+                                                    params_general.floor_offset))
+    # end for
+
+    # all other floors only have windows, and are the same apart from z
+    z = params_general.floor_offset + params_general.floor_height
+    for solid in upper_solids:
+        wall_loops_upper.append(perimeter_polyline(footprint, edge_starts, perimeter_length, solid, z))
+    # end for
 
     # put all results in a dictionary and return it
     result = {
         "window_positions": window_positions,
         "pillar_positions": pillar_positions,
-        "wall_loops": wall_loops
+        "door_positions": layout_door_positions,
+        "wall_loops_ground": wall_loops_ground,
+        "wall_loops_upper": wall_loops_upper,
+        "is_mirrored": mirror_edges is not None,
+        "warnings": warnings
     }
     return result
 # end generate_vertical_layout
+
+
+def edge_rotation(footprint: list, i: int) -> float:
+    """
+        Calculates the rotation on the Z axis of objects placed on the given footprint edge
+    Args:
+        footprint: list(tuple(x,y,z)) - building footprint
+        i: index of the edge, edge goes from footprint[i] to footprint[i+1]
+    Returns:
+        rotation in radians
+    """
+    vec_edge = Utils.vec_from_verts(footprint[(i + 1) % len(footprint)], footprint[i])
+    vec_0 = mathutils.Vector((0.0, 1.0, 0.0))
+    return vec_edge.xy.angle_signed(vec_0.xy) - 0.5 * math.pi
+# end edge_rotation
@@ -22,9 +22,18 @@ import bmesh
 import bpy
 import mathutils
 import math
+import numpy
+import collections
 from . import Utils
+from . import Cache
 from . import GenUtils
 from . import GenLayout
+from . import StraightSkeleton
+
+# number of balusters kept by gen_baluster_arrays
+BALUSTER_CACHE_SIZE = 16
+# revolved balusters, by the key of their profile
+baluster_cache = collections.OrderedDict()
 
 
 class ParamsPillar:
@@ -229,7 +238,8 @@ class ParamsWindows:
 
 
 class ParamsRoof:
-    def __init__(self, offset_width: float, offset_wedge: float, height: float):
+    def __init__(self, roof_type: str, offset_width: float, offset_wedge: float, height: float):
+        self.type = roof_type
         self.offset_width = offset_width
         self.offset_wedge = offset_wedge
         self.height = height
@@ -239,6 +249,7 @@ class ParamsRoof:
     def from_ui():
         properties = bpy.context.scene.PBGPropertyGroup
         params = ParamsRoof(
+            properties.roof_type,
             properties.roof_offset_width,
             properties.roof_offset_wedge,
             properties.roof_height
@@ -284,8 +295,26 @@ class ParamsDoor:
 # end ParamsDoor
 
 
+class ParamsUV:
+    def __init__(self, projection: str, scale: float):
+        self.projection = projection
+        self.scale = scale
+    # end __init__
+
+    @staticmethod
+    def from_ui():
+        properties = bpy.context.scene.PBGPropertyGroup
+        params = ParamsUV(
+            properties.uv_projection,
+            properties.uv_scale
+        )
+        return params
+    # end from_ui
+# end ParamsUV
+
+
 def gen_mesh_floor_separator(context: bpy.types.Context, footprint: list,
-                             section_mesh: bpy.types.Mesh) -> bpy.types.Object:
+                             section_mesh: bpy.types.Mesh, is_mirrored: bool=False) -> bpy.types.Object:
     """
         Creates the floor separator object
         floor separator will be placed at the origin (0, 0, 0)
@@ -293,12 +322,18 @@ def gen_mesh_floor_separator(context: bpy.types.Context, footprint: list,
         context: bpy.types.Context
         footprint: list(tuple(x,y,z)) - building footprint
         section_mesh: cross section/side profile of the separator
+        is_mirrored: if True, footprint is one half of a mirror symmetric footprint, result of
+            GenLayout.gen_footprint_half
     Returns:
         bpy.types.Object - single separator object placed at origin
     """
 
     # extrude the section along the footprint to create the separator
-    m = Utils.extrude_along_edges(section_mesh, footprint, True)
+    if is_mirrored:
+        m = Utils.extrude_along_half(section_mesh, footprint)
+    else:
+        m = Utils.extrude_along_edges(section_mesh, footprint, True)
+    # end if
 
     # create a new object, link it to the scene and return it
     obj = bpy.data.objects.new("PBGFloorSeparator", m)
@@ -408,7 +443,7 @@ def gen_mesh_pillar(context: bpy.types.Context, params_pillar: ParamsPillar, par
     # end if
 
     # remove doubles before extruding
-    bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.0001)
+    Utils.weld_seam(bm, Utils.verts_open_ends(bm))
 
     # create the horizontal layout for extruding along
     layout = list()
@@ -435,44 +470,67 @@ def gen_mesh_pillar(context: bpy.types.Context, params_pillar: ParamsPillar, par
     m_pillar_extruded = Utils.extrude_along_edges(m, layout, False)
 
     # create object and link it to the scene, return the object
-    obj = bpy.data.objects.get("PBGPillar")
-    if obj is not None:
-        context.scene.objects.unlink(obj)
-        bpy.data.objects.remove(obj)
     obj = bpy.data.objects.new("PBGPillar", m_pillar_extruded)
     context.scene.objects.link(obj)
     return obj
 # end generate_pillars
 
 
-def gen_mesh_wall(context: bpy.types.Context, wall_loops: list, section_mesh: bpy.types.Mesh) -> bpy.types.Object:
+def gen_wall_floor_arrays(wall_loops: list, section_mesh: bpy.types.Mesh, is_mirrored: bool=False) -> Utils.MeshArrays:
     """
-    Creates the wall object
-    All walls will be generated, and there is no need to duplicate/move them
+    Extrudes the wall section along the wall loops of a single floor
     Args:
-        context: bpy.types.Context
-        wall_loops: list(list(tuple(x,y,z))) - list of wall loops, result of gen_layout.
+        wall_loops: list(list(tuple(x,y,z))) - wall loops of the floor, result of gen_layout.
         section_mesh: cross section/side profile of the wall
+        is_mirrored: if True, wall loops only cover the -x half of the building, and are mirrored
     Returns:
-        The wall object
+        MeshArrays instance holding the walls of the floor
     """
-
     bm = bmesh.new()
     for loop in wall_loops:
         mesh = Utils.extrude_along_edges(section_mesh.copy(), loop, False)
         bm.from_mesh(mesh)
+        bpy.data.meshes.remove(mesh)
     # end for
-
-    # check if the object for walls already exists
-    obj = bpy.data.objects.get("PBGWalls")
-    if obj is not None:
-        context.scene.objects.unlink(obj)
-        bpy.data.objects.remove(obj)
-    # end if
-
-    m = bpy.data.meshes.new("PBGWall")
+    m = bpy.data.meshes.new("PBGWallFloor")
     bm.to_mesh(m)
     bm.free()
+    arrays = Utils.mesh_to_arrays(m)
+    bpy.data.meshes.remove(m)
+    if is_mirrored:
+        arrays = Utils.mirror_join_arrays(arrays)
+    # end if
+    return arrays
+# end gen_wall_floor_arrays
+
+
+def gen_mesh_wall(context: bpy.types.Context, params_general: GenLayout.ParamsGeneral, wall_loops_ground: list,
+                  wall_loops_upper: list, section_mesh: bpy.types.Mesh, is_mirrored: bool=False) -> bpy.types.Object:
+    """
+    Creates the wall object
+    All walls will be generated, and there is no need to duplicate/move them
+    Only the ground floor and the first upper floor are extruded, other floors are copies of the first upper floor
+    translated on Z.
+    Args:
+        context: bpy.types.Context
+        params_general: instance of the GenLayout.ParamsGeneral class
+        wall_loops_ground: list(list(tuple(x,y,z))) - list of ground floor wall loops, result of gen_layout.
+        wall_loops_upper: list(list(tuple(x,y,z))) - list of first upper floor wall loops, result of gen_layout.
+        section_mesh: cross section/side profile of the wall
+        is_mirrored: if True, wall loops only cover the -x half of the building, and are mirrored
+    Returns:
+        The wall object
+    """
+    arrays_list = list()
+    for wall_loops in (wall_loops_ground, wall_loops_upper):
+        arrays_list.append(gen_wall_floor_arrays(wall_loops, section_mesh, is_mirrored))
+    # end for
+
+    # replicate the first upper floor for all upper floors
+    arrays_list[1] = Utils.replicate_arrays(arrays_list[1], params_general.floor_count,
+                                            (0.0, 0.0, params_general.floor_height))
+
+    m = Utils.mesh_from_arrays("PBGWall", Utils.join_arrays(arrays_list))
 
     # link the created object to the scene
     obj = bpy.data.objects.new("PBGWalls", m)
@@ -482,7 +540,7 @@ def gen_mesh_wall(context: bpy.types.Context, wall_loops: list, section_mesh: bp
 
 
 def gen_mesh_offset_wall(context: bpy.types.Context, footprint: list, params_general: GenLayout.ParamsGeneral,
-                         params_walls: ParamsWalls) -> bpy.types.Object:
+                         params_walls: ParamsWalls, is_mirrored: bool=False) -> bpy.types.Object:
     """
     Generate Floor offset wall object
     Args:
@@ -490,6 +548,8 @@ def gen_mesh_offset_wall(context: bpy.types.Context, footprint: list, params_gen
         footprint: list(tuple(x,y,z)) - building footprint
         params_general: instance of GenLayout.ParamsGeneral class
         params_walls: instance of paramsWalls class
+        is_mirrored: if True, footprint is one half of a mirror symmetric footprint, result of
+            GenLayout.gen_footprint_half
     Returns:
         the Floor offset wall object
     """
@@ -515,18 +575,15 @@ def gen_mesh_offset_wall(context: bpy.types.Context, footprint: list, params_gen
     m_edge = bpy.data.meshes.new("PBGWallOffsetEdge")
     m_edge.from_pydata(verts, edges, [])
     bm.from_mesh(m_edge)
-    bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.0001)
+    Utils.weld_seam(bm, Utils.verts_open_ends(bm))
     # convert to mesh, extrude along
     m = bpy.data.meshes.new("PbgWallOffset")
     bm.to_mesh(m)
     bm.free()
-    m_extruded = Utils.extrude_along_edges(m, footprint, True)
-
-    # check if the object for walls already exists
-    obj = bpy.data.objects.get("PBGOffset")
-    if obj is not None:
-        context.scene.objects.unlink(obj)
-        bpy.data.objects.remove(obj)
+    if is_mirrored:
+        m_extruded = Utils.extrude_along_half(m, footprint)
+    else:
+        m_extruded = Utils.extrude_along_edges(m, footprint, True)
     # end if
 
     # link the created object to the scene
@@ -557,11 +614,14 @@ def gen_mesh_windows_above(context: bpy.types.Context, params_general: GenLayout
         mat_loc = mathutils.Matrix.Translation((0.0, 0.0, 0.0))
         bmesh.ops.translate(bm, vec=vec_trans, verts=bm.verts, space=mat_loc)
 
-        # extrude on x axis, to fill width
+        # extrude on x axis, to fill width, wind the faces to the outside of the wall section
+        section = Utils.bmesh_section(bm)
         vec_ext = (params_general.window_width, 0.0, 0.0)
         ret_extrude = bmesh.ops.extrude_edge_only(bm, edges=bm.edges, use_select_history=True)
         verts_to_translate = [ele for ele in ret_extrude["geom"] if isinstance(ele, bmesh.types.BMVert)]
         bmesh.ops.translate(bm, verts=verts_to_translate, vec=vec_ext, space=mat_loc)
+        Utils.orient_swept_faces(bm, [ele for ele in ret_extrude["geom"] if isinstance(ele, bmesh.types.BMFace)],
+                                 section, lambda co: (co[1], co[2]), lambda face, n: (0.0, n[0], n[1]))
     else:
         # make the cube, same for all types
         # create the first loop, append it to bmesh
@@ -580,12 +640,16 @@ def gen_mesh_windows_above(context: bpy.types.Context, params_general: GenLayout
         m.from_pydata(verts, [(0, 1), (1, 2), (2, 3), (3, 0)], [])
         bm.from_mesh(m)
 
-        # extrude on y forwards
+        # extrude on y forwards, the sides face away from the middle of the box
+        co_z_mid = 0.5 * (co_z_start + co_z_end)
         vec_ext = (0.0, params_window_above.depth, 0.0)
         ret_ext = bmesh.ops.extrude_edge_only(bm, edges=bm.edges, use_select_history=True)
         verts_to_translate = [ele for ele in ret_ext["geom"] if isinstance(ele, bmesh.types.BMVert)]
         mat_loc = mathutils.Matrix.Translation((0.0, 0.0, 0.0))
         bmesh.ops.translate(bm, verts=verts_to_translate, vec=vec_ext, space=mat_loc)
+        Utils.orient_faces(bm, [ele for ele in ret_ext["geom"] if isinstance(ele, bmesh.types.BMFace)],
+                           lambda face: (face.calc_center_median()[0], 0.0,
+                                         face.calc_center_median()[2] - co_z_mid))
 
         # extrude, scale down so it fits width and height
         size_z = co_z_end - co_z_start
@@ -596,17 +660,23 @@ def gen_mesh_windows_above(context: bpy.types.Context, params_general: GenLayout
         verts_to_scale = [ele for ele in ret_ext["geom"] if isinstance(ele, bmesh.types.BMVert)]
         mat_loc = mathutils.Matrix.Translation((0.0, -params_window_above.depth, -co_z_end + 0.5*size_z))
         bmesh.ops.scale(bm, space=mat_loc, verts=verts_to_scale, vec=(scale_x, 1.0, scale_z))
+        Utils.orient_faces(bm, [ele for ele in ret_ext["geom"] if isinstance(ele, bmesh.types.BMFace)],
+                           lambda face: (0.0, 1.0, 0.0))
 
-        # extrude inwards
+        # extrude inwards, the sides of the inset face the middle
         edges_to_extrude = [ele for ele in ret_ext["geom"] if isinstance(ele, bmesh.types.BMEdge)]
         ret_ext = bmesh.ops.extrude_edge_only(bm, edges=edges_to_extrude, use_select_history=True)
         verts_to_translate = [ele for ele in ret_ext["geom"] if isinstance(ele, bmesh.types.BMVert)]
         vec_ext = (0.0, -params_window_above.inset_depth, 0.0)
         mat_loc = mathutils.Matrix.Translation((0.0, 0.0, 0.0))
         bmesh.ops.translate(bm, verts=verts_to_translate, vec=vec_ext, space=mat_loc)
+        Utils.orient_faces(bm, [ele for ele in ret_ext["geom"] if isinstance(ele, bmesh.types.BMFace)],
+                           lambda face: (-face.calc_center_median()[0], 0.0,
+                                         co_z_mid - face.calc_center_median()[2]))
 
         # make a face
-        bmesh.ops.contextual_create(bm, geom=ret_ext["geom"])
+        ret_face = bmesh.ops.contextual_create(bm, geom=ret_ext["geom"])
+        Utils.orient_faces(bm, ret_face["faces"], lambda face: (0.0, 1.0, 0.0))
 
         if params_window_above.type in {"CYCLOID", "SINE"}:
             period_width = (params_general.window_width - 2*params_window_above.width)/params_window_above.period_count
@@ -659,8 +729,13 @@ def gen_mesh_windows_above(context: bpy.types.Context, params_general: GenLayout
                 bmesh.ops.translate(bm_filler, vec=(i*period_width, 0.0, 0.0), space=mat_loc, verts=verts_to_translate)
             # end for
 
-            # remove doubles
-            bmesh.ops.remove_doubles(bm_filler, verts=bm_filler.verts, dist=0.0001)
+            # remove doubles, only the ends of neighbouring periods overlap
+            co_seam_x = -0.5 * params_general.window_width + params_window_above.width
+            Utils.weld_seam(bm_filler, Utils.verts_at_x(bm_filler, [co_seam_x + i*period_width for i in
+                                                                    range(1, params_window_above.period_count)]))
+
+            # the filler is seen from the front
+            Utils.orient_faces(bm_filler, bm_filler.faces, lambda face: (0.0, 1.0, 0.0))
 
             # append to original bmesh
             m_filler = bpy.data.meshes.new("PBGWindowsAboveSineCycle")
@@ -704,7 +779,7 @@ def gen_mesh_windows_above(context: bpy.types.Context, params_general: GenLayout
             m_face = bpy.data.meshes.new("PBGWindowsAboveMeshSimpleFillFace")
             m_face.from_pydata(verts, [(0, 1), (1, 2), (2, 3), (3, 0)], [(0, 1, 2, 3)])
             bm_filler.from_mesh(m_face)
-            bmesh.ops.remove_doubles(bm_filler, verts=bm_filler.verts, dist=0.0001)
+            Utils.weld_seam(bm_filler, Utils.verts_at_z(bm_filler, [params_window_above.simple_depth]))
 
             # rotate, move and offset on y
             mat_loc = mathutils.Matrix.Translation((0.0, 0.0, 0.0))
@@ -721,19 +796,10 @@ def gen_mesh_windows_above(context: bpy.types.Context, params_general: GenLayout
         # end if
     # end if
 
-    # recalculate normals
-    # TODO: normals are sometimes recalculated differently when height changes while using "WALL" type.
-    bmesh.ops.recalc_face_normals(bm, faces=bm.faces)
-
     # convert to mesh and create object
     m = bpy.data.meshes.new("PBGWindowsAboveMesh")
     bm.to_mesh(m)
     bm.free()
-    ob = bpy.data.objects.get("PBGWindowsAbove")
-    if ob is not None:
-        context.scene.objects.unlink(ob)
-        bpy.data.objects.remove(ob)
-
     # link the created object to the scene
     new_obj = bpy.data.objects.new("PBGWindowsAbove", m)
     context.scene.objects.link(new_obj)
@@ -742,6 +808,103 @@ def gen_mesh_windows_above(context: bpy.types.Context, params_general: GenLayout
 
 
 # TODO: refactor naming a bit in this function, extract some things to separate functions...
+def gen_baluster_arrays(params_general: GenLayout.ParamsGeneral, params_window_under: ParamsWindowsUnder):
+    """
+    Creates a single baluster of the PILLARS windows under type, revolved around the Z axis, centered in (0, 0).
+    Balusters are cached by their profile: the section of the base and all sizes it depends on.
+    Args:
+        params_general: instance of the GenLayout.ParamsGeneral class
+        params_window_under: instance of the ParamsWindowsUnder class
+    Returns:
+        Utils.MeshArrays instance, must not be modified
+    """
+    # create a single pillar section(quite a lot of work here)
+    params = GenUtils.ParamsSectionFactory.horizontal_separator_params_large()
+    sequence = GenUtils.gen_section_element_list(params)
+    key = Cache.params_key(params_general.window_offset, params_window_under.height,
+                           params_window_under.pillar_base_height, params_window_under.pillar_base_diameter,
+                           params_window_under.pillar_min_diameter, params_window_under.pillar_max_diameter, *sequence)
+    if key in baluster_cache:
+        baluster_cache.move_to_end(key)
+        return baluster_cache[key]
+    # end if
+
+    mesh = GenUtils.gen_section_mesh(sequence, params_window_under.pillar_base_height,
+                                     0.5*params_window_under.pillar_base_diameter
+                                     - 0.5*params_window_under.pillar_min_diameter)
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    bm.verts.ensure_lookup_table()
+    last_vert = bm.verts[len(bm.verts) - 1]
+    bm.verts.remove(last_vert)
+
+    # move, on y and z, so the middle is on the bottom and goes through the center.
+    vec_trans = (0.0, 0.5 * params_window_under.pillar_min_diameter,
+                 params_general.window_offset - 2 * params_window_under.height
+                 - params_window_under.pillar_base_height)
+    mat_loc = mathutils.Matrix.Translation((0.0, 0.0, 0.0))
+    bmesh.ops.translate(bm, vec=vec_trans, space=mat_loc, verts=bm.verts)
+
+    # generate pillar mesh
+    verts = list()
+    edges = list()
+    start_y = vec_trans[1]
+    start_z = vec_trans[2]
+    end_z = 0.5*params_general.window_offset - params_window_under.height
+    end_y = 0.5*params_window_under.pillar_max_diameter
+    dist_z = start_z - end_z
+    dist_y = end_y - start_y
+    n = 5
+    for i in range(0, n+1):
+        v_co_z = start_z - (dist_z/n)*i
+        v_co_y = start_y + math.sin((0.5*math.pi*i)/n)*dist_y
+        verts.append((0.0, v_co_y, v_co_z))
+        if i > 0:
+            edges.append((i-1, i))
+    # end for
+    # append to bmesh
+    m_profile = bpy.data.meshes.new("PBGWindowsUnderMeshPillar")
+    m_profile.from_pydata(verts, edges, [])
+    bm.from_mesh(m_profile)
+
+    # duplicate and mirror
+    geom = bm.verts[:] + bm.edges[:] + bm.faces[:]
+    ret_dup = bmesh.ops.duplicate(bm, geom=geom)
+    mat_loc = mathutils.Matrix.Translation((0.0, 0.0, -end_z))
+    verts_to_scale = [ele for ele in ret_dup["geom"] if isinstance(ele, bmesh.types.BMVert)]
+    bmesh.ops.scale(bm, verts=verts_to_scale, space=mat_loc, vec=(1.0, 1.0, -1.0))
+
+    # remove doubles and spin, wind the faces to the outside of the profile, away from the axis
+    Utils.weld_seam(bm, Utils.verts_at_z(bm, [end_z]))
+    section = Utils.bmesh_section(bm)
+    geom_spin = bm.verts[:] + bm.edges[:]
+    bmesh.ops.spin(bm, geom=geom_spin, angle=math.radians(360), steps=16, axis=(0.0, 0.0, 1.0),
+                   cent=(0.0, 0.0, 0.0))
+
+    def from_profile(face, n):
+        # the y axis of the profile points away from the axis of the spin
+        radial = face.calc_center_median().xy.normalized()
+        return n[0] * radial[0], n[0] * radial[1], n[1]
+    # end from_profile
+
+    Utils.orient_swept_faces(bm, bm.faces, section, lambda co: (co.xy.length, co[2]), from_profile)
+
+    baluster_mesh = bpy.data.meshes.new("PBGBaluster")
+    bm.to_mesh(baluster_mesh)
+    bm.free()
+    arrays = Utils.mesh_to_arrays(baluster_mesh)
+    for m in (mesh, m_profile, baluster_mesh):
+        bpy.data.meshes.remove(m)
+    # end for
+
+    baluster_cache[key] = arrays
+    if len(baluster_cache) > BALUSTER_CACHE_SIZE:
+        baluster_cache.popitem(last=False)
+    # end if
+    return arrays
+# end gen_baluster_arrays
+
+
 def gen_mesh_windows_under(context: bpy.types.Context, params_general: GenLayout.ParamsGeneral,
                            params_window_under: ParamsWindowsUnder, wall_section_mesh: bpy.types.Mesh):
     # generate the mesh, centered, lowest point at 0
@@ -761,12 +924,16 @@ def gen_mesh_windows_under(context: bpy.types.Context, params_general: GenLayout
         mat_loc = mathutils.Matrix.Translation((0.0, 0.0, 0.0))
         bmesh.ops.translate(windows_under_bmesh, vec=vec_trans, verts=windows_under_bmesh.verts, space=mat_loc)
 
-        # extrude on x axis, to fill width
+        # extrude on x axis, to fill width, wind the faces to the outside of the wall section
+        section = Utils.bmesh_section(windows_under_bmesh)
         vec_ext = (params_general.window_width, 0.0, 0.0)
         ret_extrude = bmesh.ops.extrude_edge_only(windows_under_bmesh, edges=windows_under_bmesh.edges,
                                                   use_select_history=True)
         verts_to_translate = [ele for ele in ret_extrude["geom"] if isinstance(ele, bmesh.types.BMVert)]
         bmesh.ops.translate(windows_under_bmesh, verts=verts_to_translate, vec=vec_ext, space=mat_loc)
+        Utils.orient_swept_faces(windows_under_bmesh,
+                                 [ele for ele in ret_extrude["geom"] if isinstance(ele, bmesh.types.BMFace)],
+                                 section, lambda co: (co[1], co[2]), lambda face, n: (0.0, n[0], n[1]))
     else:
         # make the cube, it is same for all types (SINE, SIMPLE, PILLARS)
         # first loop, append to bmesh...
@@ -779,13 +946,18 @@ def gen_mesh_windows_under(context: bpy.types.Context, params_general: GenLayout
         m.from_pydata(verts, [(0, 1), (1, 2), (2, 3), (3, 0)], [])
         windows_under_bmesh.from_mesh(m)
 
-        # extrude on y forwards
+        # extrude on y forwards, the sides face away from the middle of the box
+        co_z_mid = 0.5 * params_general.window_offset
         vec_ext = (0.0, params_window_under.depth, 0.0)
         ret_extrude = bmesh.ops.extrude_edge_only(windows_under_bmesh, edges=windows_under_bmesh.edges,
                                                   use_select_history=True)
         verts_to_translate = [ele for ele in ret_extrude["geom"] if isinstance(ele, bmesh.types.BMVert)]
         mat_loc = mathutils.Matrix.Translation((0.0, 0.0, 0.0))
         bmesh.ops.translate(windows_under_bmesh, verts=verts_to_translate, vec=vec_ext, space=mat_loc)
+        Utils.orient_faces(windows_under_bmesh,
+                           [ele for ele in ret_extrude["geom"] if isinstance(ele, bmesh.types.BMFace)],
+                           lambda face: (face.calc_center_median()[0], 0.0,
+                                         face.calc_center_median()[2] - co_z_mid))
 
         # extrude, scale down so it fits the width and height
         scale_x = (params_general.window_width - 2*params_window_under.width)/params_general.window_width
@@ -795,17 +967,25 @@ def gen_mesh_windows_under(context: bpy.types.Context, params_general: GenLayout
         verts_to_scale = [ele for ele in ret_extrude["geom"] if isinstance(ele, bmesh.types.BMVert)]
         mat_loc = mathutils.Matrix.Translation((0.0, -params_window_under.depth, -0.5*params_general.window_offset))
         bmesh.ops.scale(windows_under_bmesh, space=mat_loc, verts=verts_to_scale, vec=(scale_x, 0, scale_z))
+        Utils.orient_faces(windows_under_bmesh,
+                           [ele for ele in ret_extrude["geom"] if isinstance(ele, bmesh.types.BMFace)],
+                           lambda face: (0.0, 1.0, 0.0))
 
-        # extrude inwards
+        # extrude inwards, the sides of the inset face the middle
         edges_to_extrude = [ele for ele in ret_extrude["geom"] if isinstance(ele, bmesh.types.BMEdge)]
         ret_extrude = bmesh.ops.extrude_edge_only(windows_under_bmesh, edges=edges_to_extrude, use_select_history=True)
         verts_to_translate = [ele for ele in ret_extrude["geom"] if isinstance(ele, bmesh.types.BMVert)]
         vec_ext = (0.0, -params_window_under.inset_depth, 0.0)
         mat_loc = mathutils.Matrix.Translation((0.0, 0.0, 0.0))
         bmesh.ops.translate(windows_under_bmesh, verts=verts_to_translate, vec=vec_ext, space=mat_loc)
+        Utils.orient_faces(windows_under_bmesh,
+                           [ele for ele in ret_extrude["geom"] if isinstance(ele, bmesh.types.BMFace)],
+                           lambda face: (-face.calc_center_median()[0], 0.0,
+                                         co_z_mid - face.calc_center_median()[2]))
 
         # make a face
-        bmesh.ops.contextual_create(windows_under_bmesh, geom=ret_extrude["geom"])
+        ret_face = bmesh.ops.contextual_create(windows_under_bmesh, geom=ret_extrude["geom"])
+        Utils.orient_faces(windows_under_bmesh, ret_face["faces"], lambda face: (0.0, 1.0, 0.0))
 
         if params_window_under.type in {"CYCLOID", "SINE"}:
             period_width = (params_general.window_width - 2*params_window_under.width)/params_window_under.period_count
@@ -854,8 +1034,13 @@ def gen_mesh_windows_under(context: bpy.types.Context, params_general: GenLayout
                 verts_to_translate = [ele for ele in ret_dup["geom"] if isinstance(ele, bmesh.types.BMVert)]
                 bmesh.ops.translate(bm, vec=(i*period_width, 0.0, 0.0), space=mat_loc, verts=verts_to_translate)
 
-            # remove doubles
-            bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.0001)
+            # remove doubles, only the ends of neighbouring periods overlap
+            co_seam_x = -0.5 * params_general.window_width + params_window_under.width
+            Utils.weld_seam(bm, Utils.verts_at_x(bm, [co_seam_x + i*period_width for i in
+                                                      range(1, params_window_under.period_count)]))
+
+            # the filler is seen from the front
+            Utils.orient_faces(bm, bm.faces, lambda face: (0.0, 1.0, 0.0))
 
             # append to original bmesh
             sine_cycle_mesh = bpy.data.meshes.new("PBGWindowsUnderMeshSineCycle")
@@ -863,83 +1048,20 @@ def gen_mesh_windows_under(context: bpy.types.Context, params_general: GenLayout
             bm.free()
             windows_under_bmesh.from_mesh(sine_cycle_mesh)
         elif params_window_under.type == "PILLARS":
-            # create a single pillar section(quite a lot of work here)
-            params = GenUtils.ParamsSectionFactory.horizontal_separator_params_large()
-            sequence = GenUtils.gen_section_element_list(params)
-            mesh = GenUtils.gen_section_mesh(sequence, params_window_under.pillar_base_height,
-                                             0.5*params_window_under.pillar_base_diameter
-                                             - 0.5*params_window_under.pillar_min_diameter)
-            bm = bmesh.new()
-            bm.from_mesh(mesh)
-            bm.verts.ensure_lookup_table()
-            last_vert = bm.verts[len(bm.verts) - 1]
-            bm.verts.remove(last_vert)
-
-            # move, on y and z, so the middle is on the bottom and goes through the center.
-            vec_trans = (0.0, 0.5 * params_window_under.pillar_min_diameter,
-                         params_general.window_offset - 2 * params_window_under.height
-                         - params_window_under.pillar_base_height)
-            mat_loc = mathutils.Matrix.Translation((0.0, 0.0, 0.0))
-            bmesh.ops.translate(bm, vec=vec_trans, space=mat_loc, verts=bm.verts)
-
-            # generate pillar mesh
-            verts = list()
-            edges = list()
-            start_y = vec_trans[1]
-            start_z = vec_trans[2]
-            end_z = 0.5*params_general.window_offset - params_window_under.height
-            end_y = 0.5*params_window_under.pillar_max_diameter
-            dist_z = start_z - end_z
-            dist_y = end_y - start_y
-            n = 5
-            for i in range(0, n+1):
-                v_co_z = start_z - (dist_z/n)*i
-                v_co_y = start_y + math.sin((0.5*math.pi*i)/n)*dist_y
-                verts.append((0.0, v_co_y, v_co_z))
-                if i > 0:
-                    edges.append((i-1, i))
-            # end for
-            # append to bmesh
-            m = bpy.data.meshes.new("PBGWindowsUnderMeshPillar")
-            m.from_pydata(verts, edges, [])
-            bm.from_mesh(m)
-
-            # duplicate and mirror
-            geom = bm.verts[:] + bm.edges[:] + bm.faces[:]
-            ret_dup = bmesh.ops.duplicate(bm, geom=geom)
-            mat_loc = mathutils.Matrix.Translation((0.0, 0.0, -end_z))
-            verts_to_scale = [ele for ele in ret_dup["geom"] if isinstance(ele, bmesh.types.BMVert)]
-            bmesh.ops.scale(bm, verts=verts_to_scale, space=mat_loc, vec=(1.0, 1.0, -1.0))
-
-            # remove doubles and spin
-            bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.0001)
-            geom_spin = bm.verts[:] + bm.edges[:]
-            ret_spin = bmesh.ops.spin(bm, geom=geom_spin, angle=math.radians(360), steps=16, axis=(0.0, 0.0, 1.0),
-                                      cent=(0.0, 0.0, 0.0))
+            # a single baluster is revolved, cached by its profile, and copied along the window
+            baluster = gen_baluster_arrays(params_general, params_window_under)
 
             # calculate the pillar positions
             width = params_general.window_width - 2*params_window_under.width
             pillar_count = int(width/params_window_under.pillar_base_diameter)
             total_pillar_width = width/pillar_count
-
-            # duplicate original geometry and translate
-            geom_initial = bm.verts[:] + bm.edges[:] + bm.faces[:]
-            mat_loc = mathutils.Matrix.Translation((0.0, 0.0, 0.0))
-            for i in range(0, pillar_count):
-                v_co_x = -0.5*width + total_pillar_width*(i+0.5)
-                ret_dup = bmesh.ops.duplicate(bm, geom=geom_initial)
-                verts_to_translate = [ele for ele in ret_dup["geom"] if isinstance(ele, bmesh.types.BMVert)]
-                v_co_y = 0.5*(params_window_under.depth + (params_window_under.depth - params_window_under.inset_depth))
-                vec_trans = (v_co_x, v_co_y, params_window_under.height)
-                bmesh.ops.translate(bm, vec=vec_trans, verts=verts_to_translate, space=mat_loc)
-
-            # remove original geometry
-            bmesh.ops.delete(bm, geom=geom_initial, context=1)
+            v_co_y = 0.5*(params_window_under.depth + (params_window_under.depth - params_window_under.inset_depth))
+            first = ((-0.5*width + 0.5*total_pillar_width, v_co_y, params_window_under.height), 0.0)
+            arrays = Utils.replicate_arrays(Utils.place_arrays(baluster, [first]), pillar_count,
+                                            (total_pillar_width, 0.0, 0.0))
 
             # append to original bmesh
-            pillar_mesh = bpy.data.meshes.new("PBGWindowsUnderMeshPillar")
-            bm.to_mesh(pillar_mesh)
-            bm.free()
+            pillar_mesh = Utils.mesh_from_arrays("PBGWindowsUnderMeshPillar", arrays)
             windows_under_bmesh.from_mesh(pillar_mesh)
         else:
             # create layout for extruding
@@ -977,7 +1099,7 @@ def gen_mesh_windows_under(context: bpy.types.Context, params_general: GenLayout
             m = bpy.data.meshes.new("PBGWindowsUnderMeshSimpleFillFace")
             m.from_pydata(verts, [(0, 1), (1, 2), (2, 3), (3, 0)], [(0, 1, 2, 3)])
             simple_bmesh.from_mesh(m)
-            bmesh.ops.remove_doubles(simple_bmesh, verts=simple_bmesh.verts, dist=0.0001)
+            Utils.weld_seam(simple_bmesh, Utils.verts_at_z(simple_bmesh, [params_window_under.simple_depth]))
 
             # rotate, move and offset on y
             mat_loc = mathutils.Matrix.Translation((0.0, 0.0, 0.0))
@@ -994,19 +1116,10 @@ def gen_mesh_windows_under(context: bpy.types.Context, params_general: GenLayout
             windows_under_bmesh.from_mesh(simple_mesh)
     # end if
 
-    # recalculate normals
-    # TODO: normals are sometimes recalculated differently when height changes while using "WALL" type.
-    bmesh.ops.recalc_face_normals(windows_under_bmesh, faces=windows_under_bmesh.faces)
-
     # convert to mesh and create object
     windows_under_mesh = bpy.data.meshes.new("PBGWindowsUnderMesh")
     windows_under_bmesh.to_mesh(windows_under_mesh)
     windows_under_bmesh.free()
-    ob = bpy.data.objects.get("PBGWindowsUnder")
-    if ob is not None:
-        context.scene.objects.unlink(ob)
-        bpy.data.objects.remove(ob)
-
     # link the created object to the scene
     new_obj = bpy.data.objects.new("PBGWindowsUnder", windows_under_mesh)
     context.scene.objects.link(new_obj)
@@ -1050,16 +1163,11 @@ def gen_mesh_stairs(context: bpy.types.Context, params_general: GenLayout.Params
     bm.from_mesh(m_filler_face)
 
     # remove doubles
-    bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.0001)
+    Utils.weld_seam(bm, Utils.verts_at_z(bm, [params_general.floor_offset]))
 
     m = bpy.data.meshes.new("PBGStairs")
     bm.to_mesh(m)
     bm.free()
-    ob = bpy.data.objects.get("PBGStairs")
-    if ob is not None:
-        context.scene.objects.unlink(ob)
-        bpy.data.objects.remove(ob)
-
     # link the created object to the scene
     new_obj = bpy.data.objects.new("PBGStairs", m)
     context.scene.objects.link(new_obj)
@@ -1086,18 +1194,17 @@ def gen_mesh_windows_around(context: bpy.types.Context, params_general: GenLayou
     m = Utils.extrude_along_edges(mesh, layout, False)
     bm.from_mesh(m)
 
-    # make filler faces
+    # make filler faces, layout goes clockwise so the bottom face points down, the top face is reversed to point up
     verts = layout.copy()
     for vert in layout:
         verts.append((vert[0], vert[1], params_windows.section_height))
     m_faces = bpy.data.meshes.new("PBGWindowsAroundFaces")
     edges = [(0, 1), (1, 2), (2, 3), (3, 0), (4, 5), (5, 6), (6, 7), (7, 4)]
-    faces = [(0, 1, 2, 3), (4, 5, 6, 7)]
+    faces = [(0, 1, 2, 3), (4, 7, 6, 5)]
     m_faces.from_pydata(verts, edges, faces)
     bm.from_mesh(m_faces)
 
-    bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.0001)
-    bmesh.ops.recalc_face_normals(bm, faces=bm.faces)
+    Utils.weld_seam(bm, Utils.verts_at_z(bm, [0.0, params_windows.section_height]))
 
     #  move on Z to bottom
     vec_trans = (0.0, 0.0, params_general.window_offset)
@@ -1136,18 +1243,16 @@ def gen_mesh_windows_around(context: bpy.types.Context, params_general: GenLayou
     bm_pillars.to_mesh(m_pillars)
     bm_pillars.free()
 
-    bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.0001)
+    # top and bottom only touch when the window is exactly two sections high
+    seam_z = [params_general.window_offset + params_windows.section_height,
+              params_general.window_offset + params_general.window_height - params_windows.section_height]
+    Utils.weld_seam(bm, Utils.verts_at_z(bm, seam_z))
     bm.from_mesh(m_pillars)
 
     # create object
     m = bpy.data.meshes.new("PBGWindowAround")
     bm.to_mesh(m)
     bm.free()
-    ob = bpy.data.objects.get("PBGWindowAround")
-    if ob is not None:
-        context.scene.objects.unlink(ob)
-        bpy.data.objects.remove(ob)
-
     # link the created object to the scene
     new_obj = bpy.data.objects.new("PBGWindowAround", m)
     context.scene.objects.link(new_obj)
@@ -1270,11 +1375,6 @@ def gen_mesh_windows(context: bpy.types.Context, params_general: GenLayout.Param
     m = bpy.data.meshes.new("PBGWindow")
     bm.to_mesh(m)
     bm.free()
-    ob = bpy.data.objects.get("PBGWindow")
-    if ob is not None:
-        context.scene.objects.unlink(ob)
-        bpy.data.objects.remove(ob)
-
     # link the created object to the scene
     new_obj = bpy.data.objects.new("PBGWindow", m)
     context.scene.objects.link(new_obj)
@@ -1284,6 +1384,9 @@ def gen_mesh_windows(context: bpy.types.Context, params_general: GenLayout.Param
 
 def gen_mesh_roof(context: bpy.types.Context, params_general: GenLayout.ParamsGeneral, footprint: list,
                   params_footprint: GenLayout.ParamsFootprint, params_roof: ParamsRoof):
+    if params_roof.type != "RIDGE":
+        return gen_mesh_roof_skeleton(context, params_general, footprint, params_roof)
+    # end if
     bm_roof = bmesh.new()
     # get verts on -x side, create edges
     verts = list()
@@ -1346,9 +1449,8 @@ def gen_mesh_roof(context: bpy.types.Context, params_general: GenLayout.ParamsGe
     verts_to_scale = [ele for ele in ret_dup["geom"] if isinstance(ele, bmesh.types.BMVert)]
     bmesh.ops.scale(bm_roof, vec=(-1.0, 1.0, 1.0), space=mat_loc, verts=verts_to_scale)
 
-    # remove doubles, recalculate normals
-    bmesh.ops.remove_doubles(bm_roof, verts=bm_roof.verts, dist=0.0001)
-    bmesh.ops.recalc_face_normals(bm_roof, faces=bm_roof.faces)
+    # remove doubles
+    Utils.weld_seam(bm_roof, [vert for vert in bm_roof.verts if abs(vert.co[0]) <= 0.0001])
 
     # remove middle edge
     edges_to_dissolve = list()
@@ -1388,17 +1490,13 @@ def gen_mesh_roof(context: bpy.types.Context, params_general: GenLayout.ParamsGe
         bm_roof_wedge.free()
         bm_roof.from_mesh(m_roof_wedge)
 
-    # UV unwrap the roof
-    uv_unwrap(bm_roof)
+    # all roof faces point up, so only the faces facing down need to be reversed
+    bm_roof.normal_update()
+    bmesh.ops.reverse_faces(bm_roof, faces=[face for face in bm_roof.faces if face.normal[2] < 0])
 
     # create object.
     bm_roof.to_mesh(m_roof)
     bm_roof.free()
-    ob = bpy.data.objects.get("PBGRoof")
-    if ob is not None:
-        context.scene.objects.unlink(ob)
-        bpy.data.objects.remove(ob)
-
     # link the created object to the scene
     new_obj = bpy.data.objects.new("PBGRoof", m_roof)
     context.scene.objects.link(new_obj)
@@ -1406,26 +1504,132 @@ def gen_mesh_roof(context: bpy.types.Context, params_general: GenLayout.ParamsGe
 # end gen_mesh_roof
 
 
-def uv_unwrap(bm):
-    uv_layer = bm.loops.layers.uv.verify()
-    bm.faces.layers.tex.verify()  # currently blender needs both layers.
+def gen_mesh_roof_skeleton(context: bpy.types.Context, params_general: GenLayout.ParamsGeneral, footprint: list,
+                           params_roof: ParamsRoof) -> bpy.types.Object:
+    """
+        Generates a hip or gable roof from the straight skeleton of the footprint, works with any simple footprint
+    Args:
+        context: bpy.types.Context
+        params_general: instance of GenLayout.ParamsGeneral class
+        footprint: list(tuple(x,y,z)) - building footprint
+        params_roof: instance of ParamsRoof class
+    Returns:
+        the roof object, linked to the scene
+    """
+    verts, faces = StraightSkeleton.gen_roof(footprint, params_roof.height, params_roof.type == "GABLE")
+    co = numpy.array(verts, dtype=numpy.float32).reshape((-1, 3))
+    co[:, 2] += params_general.floor_offset + params_general.floor_height * (1 + params_general.floor_count)
+    loop_totals = numpy.array([len(face) for face in faces], dtype=numpy.int32)
+    arrays = Utils.MeshArrays(
+        co.ravel(),
+        numpy.empty(0, dtype=numpy.int32),
+        (numpy.cumsum(loop_totals) - loop_totals).astype(numpy.int32),
+        loop_totals,
+        numpy.array([vert for face in faces for vert in face], dtype=numpy.int32),
+        numpy.zeros(len(faces), dtype=numpy.int32),
+        numpy.empty(0, dtype=numpy.float32)
+    )
+    m = Utils.mesh_from_arrays("PBGRoof", arrays)
+    obj = bpy.data.objects.new("PBGRoof", m)
+    context.scene.objects.link(obj)
+    return obj
+# end gen_mesh_roof_skeleton
 
-    # adjust UVs
-    bm.verts.ensure_lookup_table()
-    for face in bm.faces:
-        no = face.normal
-        vec_no = mathutils.Vector((no[0], no[1], 0.0))
-        vec_no.normalize()
-        mat_proj = mathutils.Matrix.OrthoProjection(vec_no, 3)
-        vec_x = mathutils.Vector((1.0, 0.0, 0.0))
-        angle = vec_x.xy.angle_signed(vec_no.xy)
-        mat_rot = mathutils.Matrix.Rotation(angle, 3, "Z")
-        for loop in face.loops:
-            loopuv = loop[uv_layer]
-            vert_proj = mat_proj * loop.vert.co
-            vert_uv_co = mat_rot * vert_proj
-            uv = (vert_uv_co[1], vert_uv_co[2])
-            loopuv.uv = uv
+
+def gen_mesh_placeholder(context: bpy.types.Context, name: str, corner_min: tuple, corner_max: tuple):
+    """
+    Creates an axis aligned box, standing in for a component until its detailed geometry is generated
+    Args:
+        context: bpy.types.Context
+        name: name of the placeholder object
+        corner_min: tuple(x,y,z) - minimum corner of the box
+        corner_max: tuple(x,y,z) - maximum corner of the box
+    Returns:
+        The placeholder object
+    """
+    verts = list()
+    for z in (corner_min[2], corner_max[2]):
+        verts.append((corner_min[0], corner_min[1], z))
+        verts.append((corner_min[0], corner_max[1], z))
+        verts.append((corner_max[0], corner_max[1], z))
+        verts.append((corner_max[0], corner_min[1], z))
+    # end for
+    faces = [(0, 1, 2, 3), (4, 7, 6, 5), (0, 4, 5, 1), (1, 5, 6, 2), (2, 6, 7, 3), (3, 7, 4, 0)]
+    m = bpy.data.meshes.new(name)
+    m.from_pydata(verts, [], faces)
+    m.update(calc_edges=True)
+
+    # link the created object to the scene
+    obj = bpy.data.objects.new(name, m)
+    context.scene.objects.link(obj)
+    return obj
+# end gen_mesh_placeholder
+
+
+def uv_project(mesh: bpy.types.Mesh, params_uv: ParamsUV):
+    """
+        Projects UV coordinates for all loops of the mesh at once, and writes them into the active uv layer
+        BOX projects each face on the axis plane closest to it.
+        PLANAR projects each face on its own plane, with u running horizontally along the face and v up the face,
+        so walls at any angle and roof slopes are not stretched. Horizontal faces are projected from the top.
+    Args:
+        mesh: mesh to project the UVs for, normals must be up to date
+        params_uv: instance of the ParamsUV class
+    """
+    vert_count = len(mesh.vertices)
+    loop_count = len(mesh.loops)
+    poly_count = len(mesh.polygons)
+    if loop_count == 0:
+        return
+    # end if
+
+    # read everything needed in bulk
+    co = numpy.empty(3 * vert_count, dtype=numpy.float32)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape((vert_count, 3)).astype(numpy.float64)
+    no = numpy.empty(3 * poly_count, dtype=numpy.float32)
+    mesh.polygons.foreach_get("normal", no)
+    no = no.reshape((poly_count, 3)).astype(numpy.float64)
+    loop_totals = numpy.empty(poly_count, dtype=numpy.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    loop_verts = numpy.empty(loop_count, dtype=numpy.int32)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+
+    # expand per face values to per loop values, loops of a face are stored consecutively
+    loop_co = co[loop_verts]
+    loop_no = numpy.repeat(no, loop_totals, axis=0)
+    x, y, z = loop_co[:, 0], loop_co[:, 1], loop_co[:, 2]
+    nx, ny, nz = loop_no[:, 0], loop_no[:, 1], loop_no[:, 2]
+
+    if params_uv.projection == "BOX":
+        axis = numpy.argmax(numpy.abs(loop_no), axis=1)
+        sign = numpy.where(loop_no[numpy.arange(loop_count), axis] < 0, -1.0, 1.0)
+        u = numpy.where(axis == 0, y * sign, numpy.where(axis == 1, -x * sign, x))
+        v = numpy.where(axis == 2, y * sign, z)
+    else:
+        # tangent is horizontal, bitangent is normal x tangent
+        length_h = numpy.sqrt(nx * nx + ny * ny)
+        is_top = length_h < 1e-4
+        length_h = numpy.where(is_top, 1.0, length_h)
+        tx = -ny / length_h
+        ty = nx / length_h
+        bx = -nz * ty
+        by = nz * tx
+        bz = nx * ty - ny * tx
+        sign = numpy.where(nz < 0, -1.0, 1.0)
+        u = numpy.where(is_top, x, x * tx + y * ty)
+        v = numpy.where(is_top, y * sign, x * bx + y * by + z * bz)
+    # end if
+
+    uv = numpy.empty((loop_count, 2), dtype=numpy.float32)
+    uv[:, 0] = u * params_uv.scale
+    uv[:, 1] = v * params_uv.scale
+
+    if mesh.uv_layers.active is None:
+        mesh.uv_textures.new()  # currently blender needs both layers.
+    # end if
+    mesh.uv_layers.active.data.foreach_set("uv", uv.ravel())
+# end uv_project
 
 
 def gen_mesh_door_above(context: bpy.types.Context, params_general: GenLayout.ParamsGeneral,
@@ -1456,11 +1660,6 @@ def gen_mesh_door_above(context: bpy.types.Context, params_general: GenLayout.Pa
     m_door_above = bpy.data.meshes.new("PGBDoorAbove")
     bm_wall_above.to_mesh(m_door_above)
     bm_wall_above.free()
-    ob = bpy.data.objects.get("PGBDoorAbove")
-    if ob is not None:
-        context.scene.objects.unlink(ob)
-        bpy.data.objects.remove(ob)
-
     # link the created object to the scene
     new_obj = bpy.data.objects.new("PGBDoorAbove", m_door_above)
     context.scene.objects.link(new_obj)
@@ -1486,18 +1685,17 @@ def gen_mesh_door_around(context: bpy.types.Context, params_general: GenLayout.P
     m = Utils.extrude_along_edges(mesh, layout, False)
     bm.from_mesh(m)
 
-    # make filler faces
+    # make filler faces, layout goes clockwise so the bottom face points down, the top face is reversed to point up
     verts = layout.copy()
     for vert in layout:
         verts.append((vert[0], vert[1], params_door.section_height))
     m_faces = bpy.data.meshes.new("PBGDoorAroundFaces")
     edges = [(0, 1), (1, 2), (2, 3), (3, 0), (4, 5), (5, 6), (6, 7), (7, 4)]
-    faces = [(0, 1, 2, 3), (4, 5, 6, 7)]
+    faces = [(0, 1, 2, 3), (4, 7, 6, 5)]
     m_faces.from_pydata(verts, edges, faces)
     bm.from_mesh(m_faces)
 
-    bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.0001)
-    bmesh.ops.recalc_face_normals(bm, faces=bm.faces)
+    Utils.weld_seam(bm, Utils.verts_at_z(bm, [0.0, params_door.section_height]))
 
     # move on z
     vec_trans = (0.0, 0.0, params_general.door_height - params_door.section_height)
@@ -1534,11 +1732,6 @@ def gen_mesh_door_around(context: bpy.types.Context, params_general: GenLayout.P
     m = bpy.data.meshes.new("PBGDoorAround")
     bm.to_mesh(m)
     bm.free()
-    ob = bpy.data.objects.get("PBGDoorAround")
-    if ob is not None:
-        context.scene.objects.unlink(ob)
-        bpy.data.objects.remove(ob)
-
     # link the created object to the scene
     new_obj = bpy.data.objects.new("PBGDoorAround", m)
     context.scene.objects.link(new_obj)
@@ -1657,11 +1850,6 @@ def gen_mesh_door(context: bpy.types.Context, params_general: GenLayout.ParamsGe
     m = bpy.data.meshes.new("PBGDoorComplete")
     bm.to_mesh(m)
     bm.free()
-    ob = bpy.data.objects.get("PBGDoorComplete")
-    if ob is not None:
-        context.scene.objects.unlink(ob)
-        bpy.data.objects.remove(ob)
-
     # link the created object to the scene
     new_obj = bpy.data.objects.new("PBGDoorComplete", m)
     context.scene.objects.link(new_obj)
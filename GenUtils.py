@@ -21,8 +21,7 @@
 import math
 import bpy
 import random
-import bmesh
-import mathutils
+import numpy
 from . import Constants
 
 
@@ -144,18 +143,18 @@ class ParamsSectionFactory:
 # GenerateSectionParamsFactory
 
 
-def gen_section_mesh(sequence: list, height: float, width: float) -> bpy.types.Mesh:
+def gen_section_verts(sequence: list, height: float, width: float) -> list:
     """
-    Generates a mesh from the given list of sectionElements.
+    Generates the verts of the profile defined by the given list of sectionElements.
 
     Args:
-         sequence (list of SectionElement): a list of SectionElements, to be used for generating the mesh. Likely the
+         sequence (list of SectionElement): a list of SectionElements, to be used for generating the verts. Likely the
              result of calling the generate_section function.
          height (float): height of the section
          width (float): width of the section
 
-    Returns, bpy.types.Mesh:
-        A mesh following the sequence, in Y-Z plane, starting in (0,0,0), with width and height of 1 blender unit.
+    Returns, list of tuple(x,y,z):
+        Ordered verts of the profile in Y-Z plane, starting in (0,0,0) and ending in (0, width, height).
     """
 
     verts = list()
@@ -179,7 +178,27 @@ def gen_section_mesh(sequence: list, height: float, width: float) -> bpy.types.M
         # end if
     # end for
 
-    verts.append([0, 0, verts[-1][2]])
+    # scale the verts so they have the desired width and height.
+    return [(0.0, vert[1] * width, vert[2] * height) for vert in verts]
+# end gen_section_verts
+
+
+def gen_section_mesh(sequence: list, height: float, width: float) -> bpy.types.Mesh:
+    """
+    Generates a mesh from the given list of sectionElements.
+
+    Args:
+         sequence (list of SectionElement): a list of SectionElements, to be used for generating the mesh. Likely the
+             result of calling the generate_section function.
+         height (float): height of the section
+         width (float): width of the section
+
+    Returns, bpy.types.Mesh:
+        A mesh following the sequence, in Y-Z plane, starting in (0,0,0), with width and height of 1 blender unit.
+    """
+
+    verts = gen_section_verts(sequence, height, width)
+    verts.append((0.0, 0.0, verts[-1][2]))
 
     edges = list()
     i = 0
@@ -191,15 +210,6 @@ def gen_section_mesh(sequence: list, height: float, width: float) -> bpy.types.M
     m = bpy.data.meshes.new(name="PBGSection")
     m.from_pydata(verts, edges, [])
     m.update()
-    bm = bmesh.new()
-    bm.from_mesh(m)
-
-    # scale the mesh so it has the desired width and height.
-    mat_loc = mathutils.Matrix.Translation((0, 0, 0))
-    bmesh.ops.scale(bm, vec=(1.0, width, height), space=mat_loc, verts=bm.verts)
-
-    bm.to_mesh(m)
-    bm.free()
     return m
 # end generate_section_mesh
 
@@ -301,7 +311,21 @@ def gen_section_element_list(params_section: ParamsSection) -> list:
 
 def gen_wall_section_mesh(wall_type: str, wall_section_height: float, wall_section_size: float, wall_mortar_size: float,
                           wall_row_count: float) -> bpy.types.Mesh:
-    # TODO: docstring
+    """
+    Generates the cross section/side profile of the wall, in Y-Z plane, starting in (0,0,0)
+
+    Args:
+        wall_type (str in {"FLAT", "ROWS"}): type of the wall
+        wall_section_height (float): total height of the profile
+        wall_section_size (float): size of the brick edge profile
+        wall_mortar_size (float): size of the mortar between two rows
+        wall_row_count (int): number of brick rows
+
+    Returns, bpy.types.Mesh:
+        A mesh containing a single edge chain going from (0,0,0) to (0,0,wall_section_height).
+        For "ROWS", a single row profile is generated, and tiled for all rows. Neighbouring rows share the vert on
+        their boundary, so no merging is needed.
+    """
     if wall_type == "FLAT":
         verts = list()
         edges = list()
@@ -311,64 +335,43 @@ def gen_wall_section_mesh(wall_type: str, wall_section_height: float, wall_secti
         wall_section_mesh = bpy.data.meshes.new(name="PBGWallSectionMesh")
         wall_section_mesh.from_pydata(verts, edges, [])
     else:
-        # generate mesh
+        row_count = int(wall_row_count)
+        row_height = wall_section_height / row_count
+
+        # generate the brick edge profile, going from (0, 0, 0) to (0, size, size)
         wall_offset_params = ParamsSectionFactory.horizontal_separator_params_large()
         wall_offset_section = gen_section_element_list(wall_offset_params)
-        wall_offset_mesh = gen_section_mesh(wall_offset_section, wall_section_size, wall_section_size)
-        # append it to new bmesh
-        bm = bmesh.new()
-        bm.from_mesh(wall_offset_mesh)
-        # remove last vert
-        bm.verts.ensure_lookup_table()
-        last_vert = bm.verts[len(bm.verts) - 1]
-        bm.verts.remove(last_vert)
-        # move up on Z axis
-        vec_trans = (0.0, 0.0, wall_mortar_size)
-        bmesh.ops.translate(bm, vec=vec_trans, verts=bm.verts)
-        # duplicate, flip and move up on Z
-        mat_loc = mathutils.Matrix.Translation((0.0, 0.0, -wall_mortar_size))
-        geom_to_duplicate = bm.verts[:] + bm.edges[:] + bm.faces[:]
-        ret_dup = bmesh.ops.duplicate(bm, geom=geom_to_duplicate)
-        verts_to_transform = [ele for ele in ret_dup["geom"] if isinstance(ele, bmesh.types.BMVert)]
-        bmesh.ops.scale(bm, vec=(1.0, 1.0, -1.0), space=mat_loc, verts=verts_to_transform)
-        row_height = wall_section_height / wall_row_count
-        vec_trans = (0.0, 0.0, row_height - 2 * wall_mortar_size)
-        bmesh.ops.translate(bm, vec=vec_trans, verts=verts_to_transform)
-
-        # create a mesh that fills the gaps...
-        verts = list()
-        edges = list()
-        verts.append((0.0, 0.0, 0.0))
-        verts.append((0.0, 0.0, wall_mortar_size))
-        edges.append((0, 1))
-        verts.append((0.0, 0.0, row_height - wall_mortar_size))
-        verts.append((0.0, 0.0, row_height))
-        edges.append((2, 3))
-        verts.append((0.0, wall_section_size, wall_section_size + wall_mortar_size))
-        verts.append((0.0, wall_section_size, row_height - wall_section_size - wall_mortar_size))
-        edges.append((4, 5))
-        filler_mesh = bpy.data.meshes.new(name="PBGWallSectionMeshFiller")
-        filler_mesh.from_pydata(verts, edges, [])
-        bm.from_mesh(filler_mesh)
-
-        # duplicate bmesh geometry so it fills the whole floor.
-        i = 1
-        geom = bm.verts[:] + bm.edges[:] + bm.faces[:]
-        while i < wall_row_count:
-            ret_dup = bmesh.ops.duplicate(bm, geom=geom)
-            verts_to_translate = [ele for ele in ret_dup["geom"] if isinstance(ele, bmesh.types.BMVert)]
-            bmesh.ops.translate(bm, verts=verts_to_translate, vec=(0.0, 0.0, row_height))
-            geom = ret_dup["geom"]
-            i += 1
-        # end while
-
-        # remove doubles before converting
-        bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.0001)
-
-        # convert bmesh geometry to mesh
+        profile = gen_section_verts(wall_offset_section, wall_section_size, wall_section_size)
+
+        # single row: bottom mortar, lower profile going up, upper profile (lower one mirrored on Z) going down,
+        # top mortar. The top vert of the row is the bottom vert of the next row, so it's left out.
+        row = list()
+        row.append((0.0, 0.0, 0.0))
+        for vert in profile:
+            row.append((0.0, vert[1], vert[2] + wall_mortar_size))
+        # end for
+        for vert in reversed(profile):
+            row.append((0.0, vert[1], row_height - wall_mortar_size - vert[2]))
+        # end for
+
+        # tile the row, add the top vert of the last row
+        row = numpy.array(row, dtype=numpy.float32)
+        offsets = numpy.arange(row_count, dtype=numpy.float32) * row_height
+        co = row.reshape((1, -1, 3)) + numpy.stack((numpy.zeros(row_count, dtype=numpy.float32),
+                                                    numpy.zeros(row_count, dtype=numpy.float32),
+                                                    offsets), axis=1).reshape((row_count, 1, 3))
+        co = numpy.concatenate((co.ravel(), numpy.array((0.0, 0.0, wall_section_height), dtype=numpy.float32)))
+        vert_count = len(co) // 3
+        edges = numpy.stack((numpy.arange(0, vert_count - 1, dtype=numpy.int32),
+                             numpy.arange(1, vert_count, dtype=numpy.int32)), axis=1).ravel()
+
+        # convert to mesh
         wall_section_mesh = bpy.data.meshes.new(name="PBGWallSectionMesh")
-        bm.to_mesh(wall_section_mesh)
-        bm.free()
+        wall_section_mesh.vertices.add(vert_count)
+        wall_section_mesh.vertices.foreach_set("co", co)
+        wall_section_mesh.edges.add(vert_count - 1)
+        wall_section_mesh.edges.foreach_set("vertices", edges)
+        wall_section_mesh.update()
     # end if
     return wall_section_mesh
 # end gen_wall_section_mesh
@@ -19,168 +19,1049 @@
 # ##### END GPL LICENSE BLOCK #####
 
 import bpy
+import mathutils
 from . import GenLayout
 from . import GenMesh
 from . import GenUtils
+from . import Cache
+from . import Utils
+from . import Output
+from . import Streaming
+from . import Stages
+from . import Statistics
+from . import Profiling
+import collections
+import numpy
+import random
+import copy
 import time
+import uuid
 import os
 
+# number of previous buildings kept for undo, per building
+UNDO_DEPTH = 8
+# name of new buildings, blender appends a number if it is taken
+BUILDING_NAME = "PBGBuilding"
+# name prefix of building type groups, shared by all instances with the same params and seed
+BUILDING_TYPE_NAME = "PBGType"
+# number of key characters in building type group names
+BUILDING_TYPE_KEY_LENGTH = 16
+# group property holding the properties a building was generated with, also marks the group as a building
+BUILDING_PROPERTIES_KEY = "pbg_properties"
+# name of the empty all objects of a building are parented to
+BUILDING_ROOT_NAME = "Root"
+# properties which are settings of the tools, not of the generated buildings, they are not stored in buildings
+TOOL_PROPERTIES = ("realize_distance", "use_memory_profile", "cache_enable", "cache_directory", "cache_size")
+# prefixes of the names of tool properties
+TOOL_PROPERTY_PREFIXES = ("sampler_", "batch_")
+# group property holding the id of a building, undo stacks are kept by id, it does not change on rename
+BUILDING_ID_KEY = "pbg_id"
+# names of the values gen_building passes to the building stages
+BUILDING_STAGE_INPUTS = ("context", "group", "prefix", "seed", "cache", "use_deferred", "params_general",
+                         "params_section", "params_pillar", "params_walls", "params_windows_under",
+                         "params_windows_above", "params_footprint", "params_stairs", "params_windows", "params_roof",
+                         "params_door", "params_uv", "params_output")
+# inputs of every component stage, see component_stage
+COMPONENT_STAGE_INPUTS = ("context", "group", "prefix", "seed", "cache", "params_uv", "params_output", "materials")
+# material slots of the chunks of a building generated floor by floor
+CHUNK_MATERIALS = ("pbg_color1", "pbg_color2", "pbg_wood", "pbg_glass", "pbg_roof")
+
+
+class UndoStack:
+    """
+    Undo records of a generated building.
+
+    Note:
+        Instead of deleting the previous objects of a building, Generate unlinks them and keeps them, together with
+        the properties they were generated with. Undo relinks them and restores the properties, so nothing is
+        regenerated and blender's global undo never has to snapshot the generated datablocks. Only the last depth
+        records are kept, older ones are deleted.
+
+    Attributes:
+        depth (int): max number of kept records
+        records (list(tuple(dict, list(tuple(str, bpy.types.Object))))): properties and objects (with their
+            original names) of each record, most recent last
+    """
+    def __init__(self, depth: int):
+        self.depth = depth
+        self.records = list()
+    # end __init__
+
+    def push(self, context: bpy.types.Context, group):
+        """
+            Unlinks all objects of the building and keeps them as the most recent record
+        Args:
+            context: bpy.types.Context
+            group: group holding the building objects
+        """
+        objects = list()
+        for obj in list(group.objects):
+            objects.append((obj.name, obj))
+            if obj.name in context.scene.objects:
+                context.scene.objects.unlink(obj)
+            # end if
+            group.objects.unlink(obj)
+            # rename, so the regenerated objects get the original names
+            obj.name = "PBGUndo"
+        # end for
+        if len(objects) > 0:
+            self.records.append((load_building_properties(group), objects))
+        # end if
+        while len(self.records) > self.depth:
+            self.discard([obj for name, obj in self.records.pop(0)[1]])
+        # end while
+    # end push
+
+    def pop(self, context: bpy.types.Context, group) -> bool:
+        """
+            Deletes the current objects of the building, and restores the most recent record
+        Args:
+            context: bpy.types.Context
+            group: group holding the building objects
+        Returns:
+            False if there is nothing to undo
+        """
+        if len(self.records) == 0:
+            return False
+        # end if
+        properties, objects = self.records.pop()
+        self.discard(list(group.objects))
+        for name, obj in objects:
+            if not is_alive(obj):
+                continue
+            # end if
+            obj.name = name
+            context.scene.objects.link(obj)
+            group.objects.link(obj)
+        # end for
+        if properties is not None:
+            store_building_properties(group, properties)
+            restore_properties(context.scene.PBGPropertyGroup, properties)
+        # end if
+        return True
+    # end pop
+
+    @staticmethod
+    def discard(objects: list):
+        """
+            Deletes the given objects, and their meshes once they are not used anymore
+        Args:
+            objects: list(bpy.types.Object)
+        """
+        objects = [obj for obj in objects if is_alive(obj)]
+        meshes = set(obj.data for obj in objects if obj.data is not None)
+        type_groups = set(obj.dupli_group for obj in objects if obj.dupli_group is not None)
+        for obj in objects:
+            bpy.data.objects.remove(obj)
+        # end for
+        for mesh in meshes:
+            if mesh.users == 0:
+                bpy.data.meshes.remove(mesh)
+            # end if
+        # end for
+        # building types are deleted with their last instance, instances kept for undo still count
+        for type_group in type_groups:
+            if (type_group.name.startswith(BUILDING_TYPE_NAME + ".") and
+                    not any(obj.dupli_group == type_group for obj in bpy.data.objects)):
+                UndoStack.discard(list(type_group.objects))
+                bpy.data.groups.remove(type_group)
+            # end if
+        # end for
+    # end discard
+# end UndoStack
+
+
+# undo stack of each building, by building id, cleared whenever blender replaces its data (see clear_undo_stacks)
+undo_stacks = dict()
+# stages run by gen_building, see register_stage
+building_stages = list()
+# outputs of cached building stages, shared by all buildings
+stage_memo = collections.OrderedDict()
+
+
+def get_undo_stack(group) -> UndoStack:
+    """
+        Returns the undo stack of the given building, creates it if needed
+    Args:
+        group: group of the building
+    Returns:
+        UndoStack instance
+    """
+    if BUILDING_ID_KEY not in group:
+        group[BUILDING_ID_KEY] = uuid.uuid4().hex
+    # end if
+    key = group[BUILDING_ID_KEY]
+    if key not in undo_stacks:
+        undo_stacks[key] = UndoStack(UNDO_DEPTH)
+    # end if
+    return undo_stacks[key]
+# end get_undo_stack
+
+
+@bpy.app.handlers.persistent
+def clear_undo_stacks(dummy):
+    """
+        Forgets all undo records, registered as a load_pre and undo_pre handler. Loading a file and blender's global
+        undo free or replace the kept objects, so the records would point to freed datablocks.
+    Args:
+        dummy: unused, passed by blender
+    """
+    undo_stacks.clear()
+# end clear_undo_stacks
+
+
+def is_alive(obj: bpy.types.Object) -> bool:
+    """
+        Checks that the object was not freed by blender since it was stored
+    Args:
+        obj: bpy.types.Object
+    Returns:
+        True if the object still exists in bpy.data
+    """
+    try:
+        return bpy.data.objects.get(obj.name) == obj
+    except ReferenceError:
+        return False
+    # end try
+# end is_alive
+
+
+def find_building(context: bpy.types.Context):
+    """
+        Finds the building the active object belongs to
+    Args:
+        context: bpy.types.Context
+    Returns:
+        group of the building, None if the active object is not a part of a building
+    """
+    if context.active_object is None:
+        return None
+    # end if
+    return building_of(context.active_object)
+# end find_building
+
+
+def building_of(obj: bpy.types.Object):
+    """
+        Finds the building the given object belongs to
+    Args:
+        obj: bpy.types.Object
+    Returns:
+        group of the building, None if the object is not a part of a building
+    """
+    for group in obj.users_group:
+        if BUILDING_PROPERTIES_KEY in group:
+            return group
+        # end if
+    # end for
+    return None
+# end building_of
+
+
+def new_building():
+    """
+        Creates the group of a new, empty building
+    Returns:
+        group of the building
+    """
+    group = bpy.data.groups.new(BUILDING_NAME)
+    group[BUILDING_PROPERTIES_KEY] = dict()
+    group[BUILDING_ID_KEY] = uuid.uuid4().hex
+    return group
+# end new_building
+
+
+def store_building_properties(group, values: dict):
+    """
+        Stores the properties the building was generated with into its group
+    Args:
+        group: group of the building
+        values: dict, property name to value, from snapshot_properties
+    """
+    # ID properties can not hold bools, store them as ints
+    group[BUILDING_PROPERTIES_KEY] = dict((name, int(value) if isinstance(value, bool) else value)
+                                          for name, value in values.items())
+# end store_building_properties
+
+
+def load_building_properties(group):
+    """
+        Loads the properties the building was generated with from its group
+    Args:
+        group: group of the building
+    Returns:
+        dict, property name to value, None if the building was not generated yet
+    """
+    values = group.get(BUILDING_PROPERTIES_KEY)
+    if values is None or len(values) == 0:
+        return None
+    # end if
+    # older buildings stored the tool settings as well, loading them must not change those
+    return dict((name, value) for name, value in values.to_dict().items() if is_generation_property(name))
+# end load_building_properties
+
 
 class Generator(bpy.types.Operator):
     # TODO: docstring
 
     bl_idname = "pbg.generate_building"
     bl_label = "Generate Building"
+    # no UNDO option, previous buildings are kept by undo_stacks instead of blender's global undo
+    bl_options = {"REGISTER"}
+
+    new_building = bpy.props.BoolProperty(
+        name="New building",
+        description="Generate a new building, instead of regenerating the building of the active object",
+        default=False,
+        options={"SKIP_SAVE"}
+    )
 
     def invoke(self, context, event):
-        group = bpy.data.groups.get("pbg_group")
-        if not group:
-            bpy.ops.group.create(name="pbg_group")
-            group = bpy.data.groups.get("pbg_group")
-        # delete all objects from group
+        group = None
+        if not self.new_building:
+            group = find_building(context)
+        # end if
+        if group is None:
+            group = new_building()
+        # end if
+        Statistics.begin_run()
+        obj_main = generate_building(context, group)
+        # make the building active, so the next generate regenerates it
+        context.scene.objects.active = obj_main
+        for warning in Statistics.warnings:
+            self.report({"WARNING"}, warning)
+        # end for
+        return {"FINISHED"}
+    # end invoke
+# end Generator
+
+
+def generate_building(context: bpy.types.Context, group) -> bpy.types.Object:
+    """
+        Regenerates the building from the current properties, keeping its previous objects for undo
+    Args:
+        context: bpy.types.Context
+        group: group of the building
+    Returns:
+        the main object of the building
+    """
+    # buildings keep the transform of their root (or instance) when regenerated, new ones are placed at the cursor
+    matrix = mathutils.Matrix.Translation(context.scene.cursor_location)
+    root = building_root(group)
+    if root is not None:
+        matrix = root.matrix_world.copy()
+    # end if
+    # keep the previous objects of this building for undo, instead of deleting them
+    get_undo_stack(group).push(context, group)
+    prefix = group.name + "."
+
+    if context.scene.PBGPropertyGroup.use_instancing:
+        obj_main = instance_building(context, group, prefix, matrix)
+    else:
+        obj_main = gen_building(context, group, prefix)
+        # parent all objects to an empty, moving it moves the whole building
+        root = bpy.data.objects.new(prefix + BUILDING_ROOT_NAME, None)
+        root.matrix_world = matrix
+        context.scene.objects.link(root)
         for obj in group.objects:
-            bpy.data.objects.remove(obj)
+            if obj.parent is None:
+                obj.parent = root
+            # end if
+        # end for
+        group.objects.link(root)
+    # end if
+    store_building_properties(group, building_properties(context.scene.PBGPropertyGroup))
+    return obj_main
+# end generate_building
+
+
+def building_root(group):
+    """
+        Finds the object holding the transform of the building, its root empty or its instance
+    Args:
+        group: group of the building
+    Returns:
+        bpy.types.Object, None if the building was not generated yet
+    """
+    for obj in group.objects:
+        if obj.type == "EMPTY" and obj.parent is None:
+            return obj
+        # end if
+    # end for
+    return None
+# end building_root
+
+
+def deferred_buildings(context: bpy.types.Context, scope: str, distance: float) -> list:
+    """
+        Finds the buildings generated with placeholders only
+    Args:
+        context: bpy.types.Context
+        scope: ACTIVE - the building of the active object, SELECTED - buildings of all selected objects,
+            CAMERA - all buildings with an object within the given distance of the scene camera
+        distance: distance from the camera, only used by the CAMERA scope
+    Returns:
+        list of building groups
+    """
+    if scope == "ACTIVE":
+        groups = [find_building(context)]
+    elif scope == "SELECTED":
+        groups = [building_of(obj) for obj in context.selected_objects]
+    else:
+        groups = list()
+        camera = context.scene.camera
+        if camera is not None:
+            location = camera.matrix_world.translation
+            for obj in context.scene.objects:
+                if not obj.hide and (obj.matrix_world.translation - location).length <= distance:
+                    groups.append(building_of(obj))
+                # end if
+            # end for
+        # end if
+    # end if
+    buildings = list()
+    for group in groups:
+        if group is None or group in buildings:
+            continue
+        # end if
+        values = load_building_properties(group)
+        if values is not None and values.get("use_deferred"):
+            buildings.append(group)
+        # end if
+    # end for
+    return buildings
+# end deferred_buildings
+
+
+def realize_buildings(context: bpy.types.Context, buildings: list):
+    """
+        Regenerates the given buildings with all details, from the properties they were generated with
+    Args:
+        context: bpy.types.Context
+        buildings: list of building groups, result of deferred_buildings
+    """
+    properties = context.scene.PBGPropertyGroup
+    values = snapshot_properties(properties)
+    try:
+        for group in buildings:
+            restore_properties(properties, load_building_properties(group))
+            properties.use_deferred = False
+            generate_building(context, group)
+        # end for
+    finally:
+        restore_properties(properties, values)
+    # end try
+# end realize_buildings
+
+
+def gen_building(context: bpy.types.Context, group, prefix: str) -> bpy.types.Object:
+    """
+        Generates all building objects from the current properties
+    Args:
+        context: bpy.types.Context
+        group: group where to keep the building objects
+        prefix: prefix of the object names, unique for each building
+    Returns:
+        the main (walls) object of the building
+    """
+    if context.scene.PBGPropertyGroup.use_streaming:
+        return gen_building_streamed(context, Streaming.SceneSink(context, group), prefix)
+    # end if
+    time_start = time.time()
+    Statistics.begin_run()
+    properties = context.scene.PBGPropertyGroup
+    params_cache = Cache.ParamsCache.from_ui()
+    cache = None
+    if params_cache.enabled:
+        cache = Cache.GeometryCache(params_cache.directory, params_cache.max_size)
+    # end if
+    values = {
+        "context": context,
+        "group": group,
+        "prefix": prefix,
+        "seed": properties.seed,
+        "cache": cache,
+        "use_deferred": properties.use_deferred,
+        "params_general": GenLayout.ParamsGeneral.from_ui(),
+        "params_section": GenUtils.ParamsSectionFactory.horizontal_separator_params_large(),
+        "params_pillar": GenMesh.ParamsPillar.from_ui(),
+        "params_walls": GenMesh.ParamsWalls.from_ui(),
+        "params_windows_under": GenMesh.ParamsWindowsUnder.from_ui(),
+        "params_windows_above": GenMesh.ParamsWindowsAbove.from_ui(),
+        "params_footprint": GenLayout.ParamsFootprint.from_ui(),
+        "params_stairs": GenMesh.ParamsStairs.from_ui(),
+        "params_windows": GenMesh.ParamsWindows.from_ui(),
+        "params_roof": GenMesh.ParamsRoof.from_ui(),
+        "params_door": GenMesh.ParamsDoor.from_ui(),
+        "params_uv": GenMesh.ParamsUV.from_ui(),
+        "params_output": Output.ParamsOutput.from_ui()
+    }
+    graph = Stages.StageGraph(building_stages, BUILDING_STAGE_INPUTS)
+    if properties.use_memory_profile:
+        profiler = Profiling.MemoryProfiler()
+        profiler.start()
+        try:
+            values = graph.run(values, stage_memo, profiler)
+        finally:
+            Profiling.print_report(profiler.stop())
+        # end try
+    else:
+        values = graph.run(values, stage_memo)
+    # end if
+
+    Statistics.record_warnings(values["door_positions"]["warnings"] + values["layout"]["warnings"])
+    Statistics.record_run(values, time.time() - time_start)
+    return values["PBGWalls"]
+# end gen_building
+
+
+def gen_placeholders(context: bpy.types.Context, group, prefix: str, params_general: GenLayout.ParamsGeneral,
+                     params_pillar: GenMesh.ParamsPillar, params_windows: GenMesh.ParamsWindows, layout: dict,
+                     wall_section_height: float) -> list:
+    """
+        Places boxes filling the window and door openings and standing in for the pillars
+    Args:
+        context: bpy.types.Context
+        group: group where to keep the placeholder objects
+        prefix: prefix of the object names, unique for each building
+        params_general: instance of the GenLayout.ParamsGeneral class
+        params_pillar: instance of the GenMesh.ParamsPillar class
+        params_windows: instance of the GenMesh.ParamsWindows class
+        layout: result of GenLayout.gen_layout
+        wall_section_height: height of the wall openings
+    Returns:
+        list(bpy.types.Object) - source objects of the placed duplicates, hidden
+    """
+    placeholders = [
+        ("PBGWindowPlaceholder", layout["window_positions"], 0.5 * params_general.window_width, wall_section_height),
+        ("PBGDoorPlaceholder", layout["door_positions"], 0.5 * params_general.door_width, wall_section_height)
+    ]
+    objects = list()
+    for name, positions, half_width, height in placeholders:
+        obj = GenMesh.gen_mesh_placeholder(context, prefix + name, (-half_width, -params_windows.inner_depth, 0.0),
+                                           (half_width, params_windows.outer_depth, height))
+        objects.append(obj)
+        group.objects.link(obj)
+        apply_positions(obj, positions, group)
+        obj.hide = True
+    # end for
+    if params_general.generate_pillar == True:
+        obj = GenMesh.gen_mesh_placeholder(context, prefix + "PBGPillarPlaceholder",
+                                           (-0.5 * params_pillar.width, 0.0, 0.0),
+                                           (0.5 * params_pillar.width, params_pillar.depth,
+                                            params_general.floor_height))
+        objects.append(obj)
+        group.objects.link(obj)
+        apply_positions(obj, layout["pillar_positions"], group)
+        obj.hide = True
+    # end if
+    return objects
+# end gen_placeholders
+
+
+def gen_template(params_uv: GenMesh.ParamsUV, seed: int, obj_name: str, slots: tuple, gen_func) -> Utils.MeshArrays:
+    """
+        Generates a component for gen_building_streamed, reads it into arrays and deletes the component object
+    Args:
+        params_uv: instance of the GenMesh.ParamsUV class
+        seed: building seed
+        obj_name: name of the component object, also used as the name of the stage, the same as in gen_building
+        slots: tuple(int) - chunk material slot (index into CHUNK_MATERIALS) of each component material index
+        gen_func: function which generates the component object, called with no arguments
+    Returns:
+        MeshArrays instance, with material indices of the chunk material slots
+    """
+    random.seed(stage_seed(seed, obj_name))
+    obj = gen_func()
+    GenMesh.uv_project(obj.data, params_uv)
+    arrays = Utils.mesh_to_arrays(obj.data)
+    UndoStack.discard([obj])
+    arrays.material_indices = numpy.array(slots, dtype=numpy.int32)[numpy.frombuffer(arrays.material_indices,
+                                                                                      dtype=numpy.int32)]
+    return arrays
+# end gen_template
+
+
+def project_arrays(arrays: Utils.MeshArrays, params_uv: GenMesh.ParamsUV) -> Utils.MeshArrays:
+    """
+        Projects the UVs of geometry which is already in place, like the walls of a single floor
+    Args:
+        arrays: MeshArrays instance
+        params_uv: instance of the GenMesh.ParamsUV class
+    Returns:
+        MeshArrays instance with projected UVs
+    """
+    m = Utils.mesh_from_arrays("PBGProject", arrays)
+    GenMesh.uv_project(m, params_uv)
+    arrays = Utils.mesh_to_arrays(m)
+    bpy.data.meshes.remove(m)
+    return arrays
+# end project_arrays
+
+
+def emit_chunk(sink, name: str, arrays_list: list, materials: list, params_output: Output.ParamsOutput):
+    """
+        Joins the geometry of a chunk into a single object, applies the output stage and passes it to the sink
+    Args:
+        sink: Streaming.SceneSink or Streaming.ObjFileSink instance
+        name: name of the chunk object
+        arrays_list: list(MeshArrays) - geometry of the chunk, material indices of the chunk material slots
+        materials: list(bpy.types.Material) - chunk materials, in the order of CHUNK_MATERIALS
+        params_output: instance of the Output.ParamsOutput class
+    Returns:
+        the chunk object
+    """
+    arrays_list = [arrays for arrays in arrays_list if len(arrays.loop_totals) > 0]
+    m = Utils.mesh_from_arrays(name, Utils.join_arrays(arrays_list))
+    for material in materials:
+        m.materials.append(material)
+    # end for
+    obj = bpy.data.objects.new(name, m)
+    Output.apply_output(obj, params_output)
+    sink.emit(obj)
+    return obj
+# end emit_chunk
+
+
+def gen_building_streamed(context: bpy.types.Context, sink, prefix: str) -> bpy.types.Object:
+    """
+        Generates the building from the current properties floor by floor: ground floor, each upper floor and the
+        roof are emitted as separate chunks, each a single object with all its components in place.
+    Note:
+        Only the component templates and the geometry of a single floor are kept in memory, so memory use does not
+        depend on the floor count. Components are generated with the same stage seeds as in gen_building, the
+        geometry cache is not used.
+    Args:
+        context: bpy.types.Context
+        sink: Streaming.SceneSink or Streaming.ObjFileSink instance, receives the chunks
+        prefix: prefix of the chunk names, unique for each building
+    Returns:
+        the ground floor chunk object
+    """
+    seed = context.scene.PBGPropertyGroup.seed
+    params_general = GenLayout.ParamsGeneral.from_ui()
+    params_section = GenUtils.ParamsSectionFactory.horizontal_separator_params_large()
+    params_pillar = GenMesh.ParamsPillar.from_ui()
+    params_walls = GenMesh.ParamsWalls.from_ui()
+    params_windows_under = GenMesh.ParamsWindowsUnder.from_ui()
+    params_windows_above = GenMesh.ParamsWindowsAbove.from_ui()
+    params_footprint = GenLayout.ParamsFootprint.from_ui()
+    params_stairs = GenMesh.ParamsStairs.from_ui()
+    params_windows = GenMesh.ParamsWindows.from_ui()
+    params_roof = GenMesh.ParamsRoof.from_ui()
+    params_door = GenMesh.ParamsDoor.from_ui()
+    params_uv = GenMesh.ParamsUV.from_ui()
+    params_output = Output.ParamsOutput.from_ui()
+    material_dict = load_materials()
+    materials = [material_dict[name] for name in CHUNK_MATERIALS]
+
+    # upper floors only differ in z, so the layout of the ground floor and the first upper floor is enough
+    params_layout = copy.copy(params_general)
+    params_layout.floor_count = min(params_general.floor_count, 1)
+    footprint = GenLayout.gen_footprint(params_footprint)
+    door_positions = GenLayout.gen_door_positions(params_general, params_footprint)
+    layout = GenLayout.gen_layout(params_layout, footprint, door_positions["positions"])
+    Statistics.record_warnings(door_positions["warnings"] + layout["warnings"])
+    footprint_extrude = gen_footprint_extrude(footprint, layout)
+    section_mesh = GenUtils.gen_section_mesh(gen_section_elements(seed, params_section),
+                                             params_general.separator_height, params_general.separator_width)
+    wall_section_height = gen_wall_section_height(params_general)
+    wall_section_mesh = gen_wall_section(seed, params_walls, wall_section_height)
 
-        # generate stuff needed for other functions that generate geometry
-        time_start = time.time()
-        params_general = GenLayout.ParamsGeneral.from_ui()
-        params_section = GenUtils.ParamsSectionFactory.horizontal_separator_params_large()
-        params_pillar = GenMesh.ParamsPillar.from_ui()
-        params_walls = GenMesh.ParamsWalls.from_ui()
-        params_windows_under = GenMesh.ParamsWindowsUnder.from_ui()
-        params_windows_above = GenMesh.ParamsWindowsAbove.from_ui()
-        params_footprint = GenLayout.ParamsFootprint.from_ui()
-        params_stairs = GenMesh.ParamsStairs.from_ui()
-        params_windows = GenMesh.ParamsWindows.from_ui()
-        params_roof = GenMesh.ParamsRoof.from_ui()
-        params_door = GenMesh.ParamsDoor.from_ui()
-
-        door_position = ((0.0, 0.5*params_footprint.building_depth+params_footprint.building_wedge_depth,
-                          params_general.floor_offset), 0)
-        door_positions = list()
-        # TODO: fix this door position mess, not sure if the zero above is critical
-        door_positions.append((door_position[0], door_position[1], params_general.floor_offset))
-
-        footprint = GenLayout.gen_footprint(params_footprint)
-        layout = GenLayout.gen_layout(params_general, footprint, door_position)
-        section_element_list = GenUtils.gen_section_element_list(params_section)
-        section_mesh = GenUtils.gen_section_mesh(section_element_list, params_general.separator_height,
-                                                 params_general.separator_width)
-        if params_general.generate_separator == True:
-            wall_section_height = params_general.floor_height - params_general.separator_height
-        else:
-            wall_section_height = params_general.floor_height
-        # end if
-        wall_section_mesh = GenUtils.gen_wall_section_mesh(params_walls.type, wall_section_height,
-                                                           params_walls.section_size,
-                                                           params_walls.mortar_size,
-                                                           params_walls.row_count)
-
-        # generate geometry
-        obj_separator = None
-        if params_general.generate_separator == True:
-            obj_separator = GenMesh.gen_mesh_floor_separator(context, footprint, section_mesh.copy())
-            group.objects.link(obj_separator)
-            separator_positions = list()
-            for i in range(0, params_general.floor_count+1):
-                separator_positions.append(((0, 0, params_general.floor_offset + wall_section_height +
-                                            i*params_general.floor_height), 0))
-            apply_positions(obj_separator, separator_positions, group)
-            obj_separator.hide = True
-        # end if
-        obj_wall = GenMesh.gen_mesh_wall(context, layout["wall_loops"], wall_section_mesh.copy())
-        group.objects.link(obj_wall)
-        obj_offset_wall = GenMesh.gen_mesh_offset_wall(context, footprint, params_general, params_walls)
-        group.objects.link(obj_offset_wall)
-        obj_stairs = GenMesh.gen_mesh_stairs(context, params_general, params_footprint, params_stairs)
-        group.objects.link(obj_stairs)
-
-        obj_window_under = GenMesh.gen_mesh_windows_under(context, params_general, params_windows_under, wall_section_mesh)
-        group.objects.link(obj_window_under)
-        apply_positions(obj_window_under, layout["window_positions"], group)
-        obj_window_under.hide = True
-
-        obj_window_above = GenMesh.gen_mesh_windows_above(context, params_general, params_windows_above, wall_section_mesh)
-        group.objects.link(obj_window_above)
-        apply_positions(obj_window_above, layout["window_positions"], group)
-        obj_window_above.hide = True
-
-        obj_window_around = GenMesh.gen_mesh_windows_around(context, params_general, params_windows)
-        group.objects.link(obj_window_around)
-        apply_positions(obj_window_around, layout["window_positions"], group)
-        obj_window_around.hide = True
-
-        obj_window = GenMesh.gen_mesh_windows(context, params_general, params_windows)
-        group.objects.link(obj_window)
-        apply_positions(obj_window, layout["window_positions"], group)
-        obj_window.hide = True
-
-        obj_door_above = GenMesh.gen_mesh_door_above(context, params_general, wall_section_mesh)
-        group.objects.link(obj_door_above)
-        apply_positions(obj_door_above, door_positions, group)
-        obj_door_above.hide = True
-
-        obj_door_around = GenMesh.gen_mesh_door_around(context, params_general, params_door)
-        group.objects.link(obj_door_around)
-        apply_positions(obj_door_around, door_positions, group)
-        obj_door_around.hide = True
-
-        obj_door = GenMesh.gen_mesh_door(context, params_general, params_door)
-        group.objects.link(obj_door)
-        apply_positions(obj_door, door_positions, group)
-        obj_door.hide = True
-
-        obj_pillar = None
-        if params_general.generate_pillar == True:
-            obj_pillar = GenMesh.gen_mesh_pillar(context, params_pillar, params_general, section_mesh.copy())
-            group.objects.link(obj_pillar)
-            apply_positions(obj_pillar, layout["pillar_positions"], group)
-            obj_pillar.hide = True
-        # end if
-
-        obj_roof = GenMesh.gen_mesh_roof(context, params_general, footprint, params_footprint, params_roof)
-        group.objects.link(obj_roof)
-
-        time_end = time.time()
-        msg = "generation finished in " + str(time_end - time_start) + " seconds"
-        print(msg)
-
-        time_start = time.time()
-        material_dict = load_materials()
-        time_end = time.time()
-        msg = "loading materials finished in " + str(time_end - time_start) + " seconds"
-
-        # apply materials to objects
-        time_start = time.time()
-        if obj_separator:
-            obj_separator.data.materials.append(material_dict["pbg_color2"])
-        obj_wall.data.materials.append(material_dict["pbg_color1"])
-        obj_offset_wall.data.materials.append(material_dict["pbg_color2"])
-        obj_stairs.data.materials.append(material_dict["pbg_color2"])
-        obj_window_around.data.materials.append(material_dict["pbg_color2"])
-        obj_door_above.data.materials.append(material_dict["pbg_color1"])
-        obj_door_around.data.materials.append(material_dict["pbg_color2"])
-        obj_door.data.materials.append(material_dict["pbg_wood"])
-        obj_roof.data.materials.append(material_dict["pbg_roof"])
-        if obj_pillar:
-            obj_pillar.data.materials.append(material_dict["pbg_color2"])
-        # TODO:
-        if params_windows_under.type == "WALL" or params_windows_under.type == "PILLARS":
-            obj_window_under.data.materials.append(material_dict["pbg_color1"])
-        else:
-            obj_window_under.data.materials.append(material_dict["pbg_color2"])
-        if params_windows_above.type == "WALL":
-            obj_window_above.data.materials.append(material_dict["pbg_color1"])
-        else:
-            obj_window_above.data.materials.append(material_dict["pbg_color2"])
-        obj_window.data.materials.append(material_dict["pbg_wood"])
-        obj_window.data.materials.append(material_dict["pbg_glass"])
-        time_end = time.time()
-        msg = "applying materials finished in " + str(time_end - time_start) + " seconds"
-        print(msg)
+    # templates of the components placed on each floor
+    window_under_slot = 0 if params_windows_under.type == "WALL" or params_windows_under.type == "PILLARS" else 1
+    window_above_slot = 0 if params_windows_above.type == "WALL" else 1
+    templates = [
+        gen_template(params_uv, seed, "PBGWindowsUnder", (window_under_slot,),
+                     lambda: GenMesh.gen_mesh_windows_under(context, params_general, params_windows_under,
+                                                            wall_section_mesh)),
+        gen_template(params_uv, seed, "PBGWindowsAbove", (window_above_slot,),
+                     lambda: GenMesh.gen_mesh_windows_above(context, params_general, params_windows_above,
+                                                            wall_section_mesh)),
+        gen_template(params_uv, seed, "PBGWindowAround", (1,),
+                     lambda: GenMesh.gen_mesh_windows_around(context, params_general, params_windows)),
+        gen_template(params_uv, seed, "PBGWindow", (2, 3),
+                     lambda: GenMesh.gen_mesh_windows(context, params_general, params_windows))
+    ]
+    template_pillar = None
+    if params_general.generate_pillar == True:
+        template_pillar = gen_template(params_uv, seed, "PBGPillar", (1,),
+                                       lambda: GenMesh.gen_mesh_pillar(context, params_pillar, params_general,
+                                                                       section_mesh.copy()))
+    # end if
+    template_separator = None
+    if params_general.generate_separator == True:
+        template_separator = gen_template(params_uv, seed, "PBGFloorSeparator", (1,),
+                                          lambda: GenMesh.gen_mesh_floor_separator(context, footprint_extrude,
+                                                                                   section_mesh.copy(),
+                                                                                   layout["is_mirrored"]))
+    # end if
+    random.seed(stage_seed(seed, "PBGWalls"))
+    walls_ground = GenMesh.gen_wall_floor_arrays(layout["wall_loops_ground"], wall_section_mesh.copy(),
+                                                 layout["is_mirrored"])
+    walls_ground.material_indices = numpy.zeros(len(walls_ground.loop_totals), dtype=numpy.int32)
+    walls_upper = GenMesh.gen_wall_floor_arrays(layout["wall_loops_upper"], wall_section_mesh.copy(),
+                                                layout["is_mirrored"])
+    walls_upper.material_indices = numpy.zeros(len(walls_upper.loop_totals), dtype=numpy.int32)
+
+    # split the positions into the ground floor and the first upper floor
+    floor_positions = ([], [])
+    for name in ("window_positions", "pillar_positions"):
+        positions = ([], [])
+        for position in layout[name]:
+            positions[0 if position[0][2] < params_general.floor_offset + 0.5 * params_general.floor_height
+                      else 1].append(position)
+        # end for
+        floor_positions[0].append(positions[0])
+        floor_positions[1].append(positions[1])
+    # end for
+
+    def floor_arrays(floor: int, window_positions: list, pillar_positions: list) -> list:
+        # components of a single floor, placed onto the given positions
+        arrays_list = [Utils.place_arrays(template, window_positions) for template in templates]
+        if template_pillar is not None:
+            arrays_list.append(Utils.place_arrays(template_pillar, pillar_positions))
+        # end if
+        if template_separator is not None:
+            arrays_list.append(Utils.place_arrays(template_separator, [(
+                (0, 0, params_general.floor_offset + wall_section_height + floor * params_general.floor_height), 0)]))
+        # end if
+        return arrays_list
+    # end floor_arrays
+
+    # ground floor, with the base of the building and the doors
+    arrays_list = floor_arrays(0, floor_positions[0][0], floor_positions[0][1])
+    arrays_list.append(project_arrays(walls_ground, params_uv))
+    arrays_list.append(gen_template(params_uv, seed, "PBGOffset", (1,),
+                                    lambda: GenMesh.gen_mesh_offset_wall(context, footprint_extrude, params_general,
+                                                                         params_walls, layout["is_mirrored"])))
+    arrays_list.append(gen_template(params_uv, seed, "PBGStairs", (1,),
+                                    lambda: GenMesh.gen_mesh_stairs(context, params_general, params_footprint,
+                                                                    params_stairs)))
+    for obj_name, slot, gen_func in (
+            ("PGBDoorAbove", 0, lambda: GenMesh.gen_mesh_door_above(context, params_general, wall_section_mesh)),
+            ("PBGDoorAround", 1, lambda: GenMesh.gen_mesh_door_around(context, params_general, params_door)),
+            ("PBGDoorComplete", 2, lambda: GenMesh.gen_mesh_door(context, params_general, params_door))):
+        arrays_list.append(Utils.place_arrays(gen_template(params_uv, seed, obj_name, (slot,), gen_func),
+                                              layout["door_positions"]))
+    # end for
+    obj_ground = emit_chunk(sink, prefix + "PBGGroundFloor", arrays_list, materials, params_output)
+    arrays_list = None
+
+    # upper floors, each one released before the next one is generated
+    context.window_manager.progress_begin(0, params_general.floor_count)
+    for floor in range(1, params_general.floor_count + 1):
+        offset = (floor - 1) * params_general.floor_height
+        window_positions = [((p[0][0], p[0][1], p[0][2] + offset), p[1]) for p in floor_positions[1][0]]
+        pillar_positions = [((p[0][0], p[0][1], p[0][2] + offset), p[1]) for p in floor_positions[1][1]]
+        arrays_list = floor_arrays(floor, window_positions, pillar_positions)
+        arrays_list.append(project_arrays(Utils.place_arrays(walls_upper, [((0, 0, offset), 0)]), params_uv))
+        emit_chunk(sink, prefix + "PBGFloor" + str(floor), arrays_list, materials, params_output)
+        arrays_list = None
+        context.window_manager.progress_update(floor)
+    # end for
+    context.window_manager.progress_end()
+
+    arrays_roof = gen_template(params_uv, seed, "PBGRoof", (4,),
+                               lambda: GenMesh.gen_mesh_roof(context, params_general, footprint, params_footprint,
+                                                             params_roof))
+    emit_chunk(sink, prefix + "PBGRoof", [arrays_roof], materials, params_output)
+    sink.close()
+
+    # the sections are only used to generate the templates, none of the chunks keeps them
+    bpy.data.meshes.remove(section_mesh)
+    bpy.data.meshes.remove(wall_section_mesh)
+    return obj_ground
+# end gen_building_streamed
+
+
+class ExportStreamed(bpy.types.Operator):
+    # TODO: docstring
+
+    bl_idname = "pbg.export_streamed"
+    bl_label = "Export Floor by Floor"
+    bl_options = {"REGISTER"}
+
+    filepath = bpy.props.StringProperty(
+        name="File path",
+        description="Wavefront obj file where to write the building",
+        default="",
+        subtype="FILE_PATH"
+    )
+
+    filter_glob = bpy.props.StringProperty(
+        default="*.obj",
+        options={"HIDDEN"}
+    )
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {"RUNNING_MODAL"}
+    # end invoke
+
+    def execute(self, context):
+        # chunks are written and deleted one at a time, the building is never complete in the scene
+        Statistics.begin_run()
+        gen_building_streamed(context, Streaming.ObjFileSink(bpy.path.ensure_ext(self.filepath, ".obj")), "")
+        for warning in Statistics.warnings:
+            self.report({"WARNING"}, warning)
+        # end for
+        return {"FINISHED"}
+    # end execute
+# end ExportStreamed
+
+
+def building_key(context: bpy.types.Context) -> str:
+    """
+        Creates the key identifying the building generated from the current properties
+    Args:
+        context: bpy.types.Context
+    Returns:
+        hex digest, equal for all buildings with the same params and seed
+    """
+    properties = context.scene.PBGPropertyGroup
+    return Cache.params_key(BUILDING_TYPE_NAME, properties.seed, properties.use_deferred, properties.use_streaming,
+                            GenLayout.ParamsGeneral.from_ui(), GenLayout.ParamsFootprint.from_ui(),
+                            GenMesh.ParamsPillar.from_ui(), GenMesh.ParamsWalls.from_ui(),
+                            GenMesh.ParamsWindowsUnder.from_ui(), GenMesh.ParamsWindowsAbove.from_ui(),
+                            GenMesh.ParamsStairs.from_ui(), GenMesh.ParamsWindows.from_ui(),
+                            GenMesh.ParamsRoof.from_ui(), GenMesh.ParamsDoor.from_ui(), GenMesh.ParamsUV.from_ui(),
+                            Output.ParamsOutput.from_ui())
+# end building_key
+
+
+def instance_building(context: bpy.types.Context, group, prefix: str, matrix) -> bpy.types.Object:
+    """
+        Places an instance of the building type generated from the current properties, generates the building type
+        if it does not exist yet
+    Args:
+        context: bpy.types.Context
+        group: group where to keep the instance object
+        prefix: prefix of the object names, unique for each building
+        matrix: mathutils.Matrix, world transform of the instance
+    Returns:
+        the instance object
+    """
+    type_name = BUILDING_TYPE_NAME + "." + building_key(context)[:BUILDING_TYPE_KEY_LENGTH]
+    type_group = bpy.data.groups.get(type_name)
+    if type_group is None:
+        print("generating building type " + type_name)
+        type_group = bpy.data.groups.new(type_name)
+        gen_building(context, type_group, type_name + ".")
+        for obj in list(type_group.objects):
+            if obj.hide:
+                # source objects of linked duplicates, their meshes are kept by the duplicates
+                type_group.objects.unlink(obj)
+                UndoStack.discard([obj])
+            else:
+                # the building type is only shown through its instances
+                context.scene.objects.unlink(obj)
+            # end if
+        # end for
+    # end if
+    obj = bpy.data.objects.new(prefix + "Instance", None)
+    obj.dupli_type = "GROUP"
+    obj.dupli_group = type_group
+    obj.matrix_world = matrix
+    context.scene.objects.link(obj)
+    group.objects.link(obj)
+    return obj
+# end instance_building
+
+
+class RealizeBuildings(bpy.types.Operator):
+    # TODO: docstring
+
+    bl_idname = "pbg.realize_buildings"
+    bl_label = "Realize Buildings"
+    bl_options = {"REGISTER"}
+
+    scope_types = [
+        ("ACTIVE", "ACTIVE", "Building of the active object", 0),
+        ("SELECTED", "SELECTED", "Buildings of all selected objects", 1),
+        ("CAMERA", "CAMERA", "All buildings near the scene camera", 2)
+    ]
+
+    scope = bpy.props.EnumProperty(
+        items=scope_types,
+        default="ACTIVE"
+    )
+
+    def invoke(self, context, event):
+        buildings = deferred_buildings(context, self.scope, context.scene.PBGPropertyGroup.realize_distance)
+        if len(buildings) == 0:
+            self.report({"WARNING"}, "No buildings with placeholders found")
+            return {"CANCELLED"}
+        # end if
+        realize_buildings(context, buildings)
+        self.report({"INFO"}, str(len(buildings)) + " buildings realized")
         return {"FINISHED"}
     # end invoke
-# end Generator
+# end RealizeBuildings
+
+
+class UndoGenerate(bpy.types.Operator):
+    # TODO: docstring
+
+    bl_idname = "pbg.undo_generate"
+    bl_label = "Undo Generate"
+    bl_options = {"REGISTER"}
+
+    def invoke(self, context, event):
+        group = find_building(context)
+        if group is None or not get_undo_stack(group).pop(context, group):
+            self.report({"WARNING"}, "Nothing to undo")
+            return {"CANCELLED"}
+        # end if
+        return {"FINISHED"}
+    # end invoke
+# end UndoGenerate
+
+
+class LoadBuilding(bpy.types.Operator):
+    # TODO: docstring
+
+    bl_idname = "pbg.load_building"
+    bl_label = "Load Building"
+    bl_options = {"REGISTER"}
+
+    def invoke(self, context, event):
+        group = find_building(context)
+        properties = None
+        if group is not None:
+            properties = load_building_properties(group)
+        # end if
+        if properties is None:
+            self.report({"WARNING"}, "Active object is not a part of a generated building")
+            return {"CANCELLED"}
+        # end if
+        restore_properties(context.scene.PBGPropertyGroup, properties)
+        return {"FINISHED"}
+    # end invoke
+# end LoadBuilding
+
+
+def snapshot_properties(properties) -> dict:
+    """
+        Copies the values of all properties
+    Args:
+        properties: PBGPropertyGroup instance
+    Returns:
+        dict, property name to value
+    """
+    values = dict()
+    for name in properties.bl_rna.properties.keys():
+        if name == "rna_type":
+            continue
+        # end if
+        value = getattr(properties, name)
+        if hasattr(value, "__len__") and not isinstance(value, str):
+            value = tuple(value)
+        # end if
+        values[name] = value
+    # end for
+    return values
+# end snapshot_properties
+
+
+def is_generation_property(name: str) -> bool:
+    """
+        Checks whether the property affects the generated building, see TOOL_PROPERTIES
+    Args:
+        name: property name
+    Returns:
+        False for the settings of the tools
+    """
+    return name not in TOOL_PROPERTIES and not name.startswith(TOOL_PROPERTY_PREFIXES)
+# end is_generation_property
+
+
+def building_properties(properties) -> dict:
+    """
+        Copies the values of the properties the building is generated from, without the tool settings
+    Args:
+        properties: PBGPropertyGroup instance
+    Returns:
+        dict, property name to value
+    """
+    values = snapshot_properties(properties)
+    return dict((name, value) for name, value in values.items() if is_generation_property(name))
+# end building_properties
+
+
+def restore_properties(properties, values: dict):
+    """
+        Sets the values of all properties, from the result of snapshot_properties
+    Args:
+        properties: PBGPropertyGroup instance
+        values: dict, property name to value
+    """
+    for name, value in values.items():
+        # values stored by older versions may hold properties which were removed since
+        if name in properties.bl_rna.properties:
+            setattr(properties, name, value)
+        # end if
+    # end for
+# end restore_properties
+
+
+def stage_seed(seed: int, name: str) -> str:
+    """
+        Creates the seed for a single generation stage.
+        Each stage reseeds the random generator, so its result does not depend on the stages generated before it.
+    Args:
+        seed: building seed
+        name: name of the stage
+    Returns:
+        value to be passed to random.seed
+    """
+    return str(seed) + ":" + name
+# end stage_seed
+
+
+def gen_cached(context: bpy.types.Context, cache, params_uv: GenMesh.ParamsUV, params_output: Output.ParamsOutput,
+               seed: int, prefix: str, obj_name: str, params: tuple, gen_func):
+    """
+        Loads the component object from the cache, or generates it, projects its UVs, applies the output stage and
+        stores it into the cache.
+    Args:
+        context: bpy.types.Context
+        cache: Cache.GeometryCache instance, or None if the cache is disabled
+        params_uv: instance of the GenMesh.ParamsUV class
+        params_output: instance of the Output.ParamsOutput class
+        seed: building seed
+        prefix: prefix of the object name, unique for each building
+        obj_name: name of the component object, also used as the name of the stage
+        params: tuple of all Params instances the component depends on
+        gen_func: function which generates the component object, called with no arguments
+    Returns:
+        The component object, linked to the scene
+    """
+    key = None
+    if cache is not None:
+        key = Cache.params_key(seed, obj_name, params_uv, params_output, *params)
+        with cache.load(key) as arrays:
+            if arrays is not None:
+                Statistics.record_cache(obj_name, True)
+                m = Utils.mesh_from_arrays(obj_name, arrays)
+                obj = bpy.data.objects.new(prefix + obj_name, m)
+                context.scene.objects.link(obj)
+                return obj
+            # end if
+        # end with
+    # end if
+
+    random.seed(stage_seed(seed, obj_name))
+    obj = gen_func()
+    GenMesh.uv_project(obj.data, params_uv)
+    Statistics.record_output(obj_name, Output.apply_output(obj, params_output))
+    if cache is not None:
+        Statistics.record_cache(obj_name, False)
+        cache.store(key, Utils.mesh_to_arrays(obj.data))
+    # end if
+    obj.name = prefix + obj_name
+    return obj
+# end gen_cached
 
 
 def apply_positions(obj: bpy.types.Object, positions: list, group):
@@ -235,3 +1116,232 @@ def load_materials() -> dict:
                 bpy.ops.wm.append(filename=material_name, directory=file_path + "\\Material\\")
                 materials[material_name] = bpy.data.materials[material_name]
     return materials
+
+
+def register_stage(stage: Stages.Stage):
+    """
+        Adds a stage to gen_building, new components are added with register_stage(component_stage(...))
+    Args:
+        stage: Stages.Stage instance, its inputs may be any of BUILDING_STAGE_INPUTS and outputs of other stages
+    """
+    building_stages.append(stage)
+# end register_stage
+
+
+def component_stage(obj_name: str, params: tuple, inputs: tuple, gen_func, materials, positions=None,
+                    condition=None) -> Stages.Stage:
+    """
+        Creates the stage of a component: loads the component object from the cache or generates it, links it to
+        the building group, applies its materials and places its linked duplicates
+    Args:
+        obj_name: name of the component object, also the name of the stage
+        params: tuple(str) - names of the Params values the component depends on, they are its cache key
+        inputs: tuple(str) - names of the other values gen_func needs
+        gen_func: called with a dict of the stage inputs, returns the component object, linked to the scene
+        materials: called with a dict of the stage inputs, returns the names of the component materials
+        positions: called with a dict of the stage inputs, returns the positions of the linked duplicates, the
+            component object itself is hidden. None if the component object is used as it is
+        condition: called with a dict of the stage inputs, the component is skipped if it returns False
+    Returns:
+        Stages.Stage instance
+    """
+    def run(values: dict) -> bpy.types.Object:
+        obj = gen_cached(values["context"], values["cache"], values["params_uv"], values["params_output"],
+                         values["seed"], values["prefix"], obj_name, tuple(values[name] for name in params),
+                         lambda: gen_func(values))
+        values["group"].objects.link(obj)
+        for name in materials(values):
+            obj.data.materials.append(values["materials"][name])
+        # end for
+        if positions is not None:
+            apply_positions(obj, positions(values), values["group"])
+            obj.hide = True
+        # end if
+        return obj
+    # end run
+
+    stage_inputs = list()
+    for name in COMPONENT_STAGE_INPUTS + tuple(params) + tuple(inputs):
+        if name not in stage_inputs:
+            stage_inputs.append(name)
+        # end if
+    # end for
+    return Stages.Stage(obj_name, tuple(stage_inputs), run, bpy.types.Object, condition=condition)
+# end component_stage
+
+
+def gen_footprint_extrude(footprint: list, layout: dict) -> list:
+    """
+        Creates the footprint walls, separators and the offset wall are extruded along
+    Args:
+        footprint: list(tuple(x,y,z)) - building footprint
+        layout: result of GenLayout.gen_layout
+    Returns:
+        list(tuple(x,y,z)) - one half of the footprint for a symmetric building, the whole footprint otherwise
+    """
+    if layout["is_mirrored"]:
+        return GenLayout.gen_footprint_half(footprint, GenLayout.find_mirror_edges(footprint))
+    # end if
+    return footprint
+# end gen_footprint_extrude
+
+
+def gen_wall_section_height(params_general: GenLayout.ParamsGeneral) -> float:
+    if params_general.generate_separator == True:
+        return params_general.floor_height - params_general.separator_height
+    # end if
+    return params_general.floor_height
+# end gen_wall_section_height
+
+
+def gen_section_elements(seed: int, params_section) -> list:
+    random.seed(stage_seed(seed, "PBGSection"))
+    return GenUtils.gen_section_element_list(params_section)
+# end gen_section_elements
+
+
+def gen_wall_section(seed: int, params_walls: GenMesh.ParamsWalls, wall_section_height: float) -> bpy.types.Mesh:
+    random.seed(stage_seed(seed, "PBGWallSectionMesh"))
+    return GenUtils.gen_wall_section_mesh(params_walls.type, wall_section_height, params_walls.section_size,
+                                          params_walls.mortar_size, params_walls.row_count)
+# end gen_wall_section
+
+
+def gen_separator_positions(params_general: GenLayout.ParamsGeneral, wall_section_height: float) -> list:
+    separator_positions = list()
+    for i in range(0, params_general.floor_count+1):
+        separator_positions.append(((0, 0, params_general.floor_offset + wall_section_height +
+                                    i*params_general.floor_height), 0))
+    # end for
+    return separator_positions
+# end gen_separator_positions
+
+
+def gen_placeholder_stage(values: dict) -> list:
+    objects = gen_placeholders(values["context"], values["group"], values["prefix"], values["params_general"],
+                               values["params_pillar"], values["params_windows"], values["layout"],
+                               values["wall_section_height"])
+    for obj in objects:
+        obj.data.materials.append(values["materials"]["pbg_color2"])
+    # end for
+    return objects
+# end gen_placeholder_stage
+
+
+def is_detailed(values: dict) -> bool:
+    # windows, doors and pillars are only blocked out by placeholders in deferred mode, see realize_buildings
+    return not values["use_deferred"]
+# end is_detailed
+
+
+# layout, independent of blender, these may run concurrently and are kept in stage_memo
+register_stage(Stages.Stage(
+    "footprint", ("params_footprint",),
+    lambda v: GenLayout.gen_footprint(v["params_footprint"]), list, concurrent=True, cached=True))
+register_stage(Stages.Stage(
+    "door_positions", ("params_general", "params_footprint"),
+    lambda v: GenLayout.gen_door_positions(v["params_general"], v["params_footprint"]), dict,
+    concurrent=True, cached=True))
+register_stage(Stages.Stage(
+    "layout", ("params_general", "footprint", "door_positions"),
+    lambda v: GenLayout.gen_layout(v["params_general"], v["footprint"], v["door_positions"]["positions"]),
+    dict,
+    concurrent=True, cached=True))
+register_stage(Stages.Stage(
+    "footprint_extrude", ("footprint", "layout"),
+    lambda v: gen_footprint_extrude(v["footprint"], v["layout"]), list, concurrent=True, cached=True))
+register_stage(Stages.Stage(
+    "wall_section_height", ("params_general",),
+    lambda v: gen_wall_section_height(v["params_general"]), float, concurrent=True))
+
+# sections, reseeding the random generator
+register_stage(Stages.Stage(
+    "section_elements", ("seed", "params_section"),
+    lambda v: gen_section_elements(v["seed"], v["params_section"]), list, cached=True))
+register_stage(Stages.Stage(
+    "section_mesh", ("section_elements", "params_general"),
+    lambda v: GenUtils.gen_section_mesh(v["section_elements"], v["params_general"].separator_height,
+                                        v["params_general"].separator_width), bpy.types.Mesh))
+register_stage(Stages.Stage(
+    "wall_section_mesh", ("seed", "params_walls", "wall_section_height"),
+    lambda v: gen_wall_section(v["seed"], v["params_walls"], v["wall_section_height"]), bpy.types.Mesh))
+register_stage(Stages.Stage("materials", (), lambda v: load_materials(), dict))
+
+# components, each one is keyed by the params it depends on, including the params of the sections it uses.
+register_stage(component_stage(
+    "PBGFloorSeparator", ("params_general", "params_footprint", "params_section"),
+    ("footprint_extrude", "section_mesh", "layout", "wall_section_height"),
+    lambda v: GenMesh.gen_mesh_floor_separator(v["context"], v["footprint_extrude"], v["section_mesh"].copy(),
+                                               v["layout"]["is_mirrored"]),
+    lambda v: ["pbg_color2"],
+    positions=lambda v: gen_separator_positions(v["params_general"], v["wall_section_height"]),
+    condition=lambda v: v["params_general"].generate_separator == True))
+register_stage(component_stage(
+    "PBGWalls", ("params_general", "params_footprint", "params_walls"), ("layout", "wall_section_mesh"),
+    lambda v: GenMesh.gen_mesh_wall(v["context"], v["params_general"], v["layout"]["wall_loops_ground"],
+                                    v["layout"]["wall_loops_upper"], v["wall_section_mesh"].copy(),
+                                    v["layout"]["is_mirrored"]),
+    lambda v: ["pbg_color1"]))
+register_stage(component_stage(
+    "PBGOffset", ("params_general", "params_footprint", "params_walls"), ("footprint_extrude", "layout"),
+    lambda v: GenMesh.gen_mesh_offset_wall(v["context"], v["footprint_extrude"], v["params_general"],
+                                           v["params_walls"], v["layout"]["is_mirrored"]),
+    lambda v: ["pbg_color2"]))
+register_stage(component_stage(
+    "PBGStairs", ("params_general", "params_footprint", "params_stairs"), (),
+    lambda v: GenMesh.gen_mesh_stairs(v["context"], v["params_general"], v["params_footprint"], v["params_stairs"]),
+    lambda v: ["pbg_color2"]))
+register_stage(Stages.Stage(
+    "PBGPlaceholders", ("context", "group", "prefix", "use_deferred", "params_general", "params_pillar",
+                        "params_windows", "layout", "wall_section_height", "materials"),
+    gen_placeholder_stage, list, condition=lambda v: v["use_deferred"]))
+register_stage(component_stage(
+    "PBGWindowsUnder", ("params_general", "params_windows_under", "params_walls"),
+    ("use_deferred", "wall_section_mesh", "layout"),
+    lambda v: GenMesh.gen_mesh_windows_under(v["context"], v["params_general"], v["params_windows_under"],
+                                             v["wall_section_mesh"]),
+    lambda v: ["pbg_color1" if v["params_windows_under"].type in ("WALL", "PILLARS") else "pbg_color2"],
+    positions=lambda v: v["layout"]["window_positions"], condition=is_detailed))
+register_stage(component_stage(
+    "PBGWindowsAbove", ("params_general", "params_windows_above", "params_walls"),
+    ("use_deferred", "wall_section_mesh", "layout"),
+    lambda v: GenMesh.gen_mesh_windows_above(v["context"], v["params_general"], v["params_windows_above"],
+                                             v["wall_section_mesh"]),
+    lambda v: ["pbg_color1" if v["params_windows_above"].type == "WALL" else "pbg_color2"],
+    positions=lambda v: v["layout"]["window_positions"], condition=is_detailed))
+register_stage(component_stage(
+    "PBGWindowAround", ("params_general", "params_windows"), ("use_deferred", "layout"),
+    lambda v: GenMesh.gen_mesh_windows_around(v["context"], v["params_general"], v["params_windows"]),
+    lambda v: ["pbg_color2"],
+    positions=lambda v: v["layout"]["window_positions"], condition=is_detailed))
+register_stage(component_stage(
+    "PBGWindow", ("params_general", "params_windows"), ("use_deferred", "layout"),
+    lambda v: GenMesh.gen_mesh_windows(v["context"], v["params_general"], v["params_windows"]),
+    lambda v: ["pbg_wood", "pbg_glass"],
+    positions=lambda v: v["layout"]["window_positions"], condition=is_detailed))
+register_stage(component_stage(
+    "PGBDoorAbove", ("params_general", "params_walls"), ("use_deferred", "wall_section_mesh", "layout"),
+    lambda v: GenMesh.gen_mesh_door_above(v["context"], v["params_general"], v["wall_section_mesh"]),
+    lambda v: ["pbg_color1"],
+    positions=lambda v: v["layout"]["door_positions"], condition=is_detailed))
+register_stage(component_stage(
+    "PBGDoorAround", ("params_general", "params_door"), ("use_deferred", "layout"),
+    lambda v: GenMesh.gen_mesh_door_around(v["context"], v["params_general"], v["params_door"]),
+    lambda v: ["pbg_color2"],
+    positions=lambda v: v["layout"]["door_positions"], condition=is_detailed))
+register_stage(component_stage(
+    "PBGDoorComplete", ("params_general", "params_door"), ("use_deferred", "layout"),
+    lambda v: GenMesh.gen_mesh_door(v["context"], v["params_general"], v["params_door"]),
+    lambda v: ["pbg_wood"],
+    positions=lambda v: v["layout"]["door_positions"], condition=is_detailed))
+register_stage(component_stage(
+    "PBGPillar", ("params_general", "params_pillar", "params_section"), ("use_deferred", "section_mesh", "layout"),
+    lambda v: GenMesh.gen_mesh_pillar(v["context"], v["params_pillar"], v["params_general"], v["section_mesh"].copy()),
+    lambda v: ["pbg_color2"],
+    positions=lambda v: v["layout"]["pillar_positions"],
+    condition=lambda v: is_detailed(v) and v["params_general"].generate_pillar == True))
+register_stage(component_stage(
+    "PBGRoof", ("params_general", "params_footprint", "params_roof"), ("footprint",),
+    lambda v: GenMesh.gen_mesh_roof(v["context"], v["params_general"], v["footprint"], v["params_footprint"],
+                                    v["params_roof"]),
+    lambda v: ["pbg_roof"]))
@@ -0,0 +1,580 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  Procedural building generator
+#  Copyright (C) 2019 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import numpy
+import collections
+from . import Utils
+
+# vertex cache optimization constants, see Tom Forsyth, "Linear-Speed Vertex Cache Optimisation"
+CACHE_DECAY_POWER = 1.5
+LAST_TRI_SCORE = 0.75
+VALENCE_BOOST_SCALE = 2.0
+VALENCE_BOOST_POWER = 0.5
+# max difference between face normals (as 1 - cos of the angle) and max distance from the plane, for faces to be
+# merged. Kept tight, so merging never changes the shape.
+MERGE_NORMAL_LIMIT = 1e-6
+MERGE_DISTANCE = 1e-5
+
+
+class ParamsOutput:
+    """
+    Settings of the output stage, applied to each component after it is generated (see apply_output).
+
+    Attributes:
+        merge_coplanar (bool): merge neighbouring faces which lie in the same plane into single polygons.
+        triangulate (bool): split all faces into triangles and reorder them for vertex cache efficiency.
+        cache_size (int): size of the simulated post-transform vertex cache the triangles are ordered for.
+    """
+
+    def __init__(self, merge_coplanar: bool, triangulate: bool, cache_size: int):
+        self.merge_coplanar = merge_coplanar
+        self.triangulate = triangulate
+        self.cache_size = cache_size
+    # end __init__
+
+    @staticmethod
+    def from_ui():
+        properties = bpy.context.scene.PBGPropertyGroup
+        params = ParamsOutput(
+            properties.output_merge_coplanar,
+            properties.output_triangulate,
+            properties.output_cache_size
+        )
+        return params
+    # end from_ui
+# end ParamsOutput
+
+
+def merge_coplanar_arrays(arrays: Utils.MeshArrays) -> Utils.MeshArrays:
+    """
+        Merges neighbouring faces which lie in the same plane into a single polygon
+        Faces are only merged across edges where both faces have the same material and the same uvs, so material and
+        uv seams are kept. A group of faces is left as it is if its outline is not a single loop (it would have a hole).
+        Verts are not removed, so the shape and the uvs of the mesh stay exactly the same.
+    Args:
+        arrays: MeshArrays instance
+    Returns:
+        MeshArrays instance with merged faces
+    """
+    co = numpy.frombuffer(arrays.co, dtype=numpy.float32).reshape((-1, 3)).astype(numpy.float64)
+    loop_verts = numpy.frombuffer(arrays.loop_verts, dtype=numpy.int32).tolist()
+    loop_starts = numpy.frombuffer(arrays.loop_starts, dtype=numpy.int32).tolist()
+    loop_totals = numpy.frombuffer(arrays.loop_totals, dtype=numpy.int32).tolist()
+    material_indices = numpy.frombuffer(arrays.material_indices, dtype=numpy.int32).tolist()
+    has_uvs = len(arrays.uvs) > 0
+    if has_uvs:
+        uvs = numpy.frombuffer(arrays.uvs, dtype=numpy.float32).reshape((-1, 2)).tolist()
+    # end if
+    face_count = len(loop_starts)
+
+    # face normals (Newell) and plane offsets
+    normals = list()
+    offsets = list()
+    for face in range(0, face_count):
+        points = co[loop_verts[loop_starts[face]:loop_starts[face] + loop_totals[face]]]
+        normal = numpy.sum(numpy.cross(points, numpy.roll(points, -1, axis=0)), axis=0)
+        length = numpy.linalg.norm(normal)
+        if length > 0:
+            normal /= length
+        # end if
+        normals.append(normal)
+        offsets.append(float(numpy.dot(normal, points[0])))
+    # end for
+
+    # directed edges of each face, and the loop they start at
+    edge_faces = dict()
+    for face in range(0, face_count):
+        start = loop_starts[face]
+        total = loop_totals[face]
+        for corner in range(0, total):
+            vert_a = loop_verts[start + corner]
+            vert_b = loop_verts[start + (corner + 1) % total]
+            edge_faces.setdefault((min(vert_a, vert_b), max(vert_a, vert_b)), list()).append(
+                (face, start + corner, start + (corner + 1) % total))
+        # end for
+    # end for
+
+    def can_merge(face_seed, use_a, use_b) -> bool:
+        # check whether the face of use_b can be merged into the group of face_seed, over the edge of use_a/use_b
+        face = use_b[0]
+        if material_indices[face] != material_indices[face_seed]:
+            return False
+        # end if
+        if 1.0 - float(numpy.dot(normals[face], normals[face_seed])) > MERGE_NORMAL_LIMIT:
+            return False
+        # end if
+        points = co[loop_verts[loop_starts[face]:loop_starts[face] + loop_totals[face]]]
+        if numpy.max(numpy.abs(points.dot(normals[face_seed]) - offsets[face_seed])) > MERGE_DISTANCE:
+            return False
+        # end if
+        if has_uvs:
+            # both faces use the edge in opposite directions, so the start of one is the end of the other
+            if uvs[use_a[1]] != uvs[use_b[2]] or uvs[use_a[2]] != uvs[use_b[1]]:
+                return False
+            # end if
+        # end if
+        return True
+    # end can_merge
+
+    # flood fill groups of faces, each compared to the first face of its group
+    groups = list()
+    group_of = [-1] * face_count
+    for seed in range(0, face_count):
+        if group_of[seed] >= 0:
+            continue
+        # end if
+        group_of[seed] = len(groups)
+        group = [seed]
+        i = 0
+        while i < len(group):
+            face = group[i]
+            start = loop_starts[face]
+            total = loop_totals[face]
+            for corner in range(0, total):
+                vert_a = loop_verts[start + corner]
+                vert_b = loop_verts[start + (corner + 1) % total]
+                uses = edge_faces[(min(vert_a, vert_b), max(vert_a, vert_b))]
+                if len(uses) != 2:
+                    # boundary or non-manifold edge
+                    continue
+                # end if
+                use_a = uses[0] if uses[0][0] == face else uses[1]
+                use_b = uses[1] if uses[0][0] == face else uses[0]
+                if group_of[use_b[0]] < 0 and loop_verts[use_a[1]] == loop_verts[use_b[2]] and \
+                        can_merge(seed, use_a, use_b):
+                    group_of[use_b[0]] = group_of[seed]
+                    group.append(use_b[0])
+                # end if
+            # end for
+            i += 1
+        # end while
+        groups.append(group)
+    # end for
+
+    # build the outline of each group from the directed edges not shared within the group
+    new_loops = list()
+    new_totals = list()
+    new_materials = list()
+    for group in groups:
+        if len(group) > 1:
+            group_set = set(group)
+            next_loop = dict()
+            is_simple = True
+            for face in group:
+                start = loop_starts[face]
+                total = loop_totals[face]
+                for corner in range(0, total):
+                    vert_a = loop_verts[start + corner]
+                    vert_b = loop_verts[start + (corner + 1) % total]
+                    uses = edge_faces[(min(vert_a, vert_b), max(vert_a, vert_b))]
+                    if sum(1 for use in uses if use[0] in group_set) > 1:
+                        continue
+                    # end if
+                    if vert_a in next_loop:
+                        is_simple = False
+                    # end if
+                    next_loop[vert_a] = (vert_b, start + corner)
+                # end for
+            # end for
+
+            # walk the outline, it has to be a single loop using all outline edges
+            outline = list()
+            if is_simple and next_loop:
+                vert_first = min(next_loop)
+                vert = vert_first
+                while vert in next_loop and len(outline) < len(next_loop):
+                    outline.append(next_loop[vert][1])
+                    vert = next_loop[vert][0]
+                # end while
+                is_simple = vert == vert_first and len(outline) == len(next_loop)
+            # end if
+            if is_simple:
+                new_loops.append(outline)
+                new_totals.append(len(outline))
+                new_materials.append(material_indices[group[0]])
+                continue
+            # end if
+        # end if
+        for face in group:
+            new_loops.append(list(range(loop_starts[face], loop_starts[face] + loop_totals[face])))
+            new_totals.append(loop_totals[face])
+            new_materials.append(material_indices[face])
+        # end for
+    # end for
+
+    # keep loose edges and the edges still used by faces
+    loops = numpy.array([loop for outline in new_loops for loop in outline], dtype=numpy.int32)
+    new_loop_verts = numpy.frombuffer(arrays.loop_verts, dtype=numpy.int32)[loops]
+    used_edges = set()
+    start = 0
+    for total in new_totals:
+        for corner in range(0, total):
+            vert_a = int(new_loop_verts[start + corner])
+            vert_b = int(new_loop_verts[start + (corner + 1) % total])
+            used_edges.add((min(vert_a, vert_b), max(vert_a, vert_b)))
+        # end for
+        start += total
+    # end for
+    edges = [edge for edge in numpy.frombuffer(arrays.edges, dtype=numpy.int32).reshape((-1, 2)).tolist()
+             if (min(edge), max(edge)) in used_edges or (min(edge), max(edge)) not in edge_faces]
+    if has_uvs:
+        new_uvs = numpy.frombuffer(arrays.uvs, dtype=numpy.float32).reshape((-1, 2))[loops].ravel()
+    else:
+        new_uvs = numpy.empty(0, dtype=numpy.float32)
+    # end if
+    new_totals = numpy.array(new_totals, dtype=numpy.int32)
+    return Utils.MeshArrays(
+        arrays.co,
+        numpy.array(edges, dtype=numpy.int32).ravel(),
+        (numpy.cumsum(new_totals) - new_totals).astype(numpy.int32),
+        new_totals,
+        new_loop_verts,
+        numpy.array(new_materials, dtype=numpy.int32),
+        new_uvs
+    )
+# end merge_coplanar_arrays
+
+
+def triangulate_polygon(co, polygon: list) -> list:
+    """
+        Splits a single polygon into triangles
+        Quads are split along the shorter diagonal, polygons with more verts are split by ear clipping, so the
+        result is the same every time and concave polygons are handled.
+    Args:
+        co: numpy array of vertex coordinates, shape (vert_count, 3)
+        polygon: list(int) - indices of polygon corners, in winding order
+    Returns:
+        list(tuple(int, int, int)) - triangles, as indices into polygon, with the same winding as the polygon
+    """
+    count = len(polygon)
+    if count == 3:
+        return [(0, 1, 2)]
+    # end if
+    points = co[polygon]
+    if count == 4:
+        if numpy.sum((points[0] - points[2])**2) <= numpy.sum((points[1] - points[3])**2):
+            return [(0, 1, 2), (0, 2, 3)]
+        # end if
+        return [(0, 1, 3), (1, 2, 3)]
+    # end if
+
+    # project to the plane the polygon mostly faces, using the Newell normal
+    normal = numpy.sum(numpy.cross(points, numpy.roll(points, -1, axis=0)), axis=0)
+    axis = int(numpy.argmax(numpy.abs(normal)))
+    x, y = [(1, 2), (2, 0), (0, 1)][axis]
+    sign = 1.0 if normal[axis] >= 0 else -1.0
+    points_2d = [(p[x], sign * p[y]) for p in points.tolist()]
+
+    def area(a, b, c):
+        return ((points_2d[b][0] - points_2d[a][0]) * (points_2d[c][1] - points_2d[a][1]) -
+                (points_2d[c][0] - points_2d[a][0]) * (points_2d[b][1] - points_2d[a][1]))
+    # end area
+
+    triangles = list()
+    remaining = list(range(0, count))
+    while len(remaining) > 3:
+        ear = None
+        for i in range(0, len(remaining)):
+            a = remaining[i - 1]
+            b = remaining[i]
+            c = remaining[(i + 1) % len(remaining)]
+            if area(a, b, c) <= 0:
+                continue
+            # end if
+            if any(area(a, b, p) >= 0 and area(b, c, p) >= 0 and area(c, a, p) >= 0
+                   for p in remaining if p not in (a, b, c)):
+                continue
+            # end if
+            ear = i
+            break
+        # end for
+        if ear is None:
+            # degenerate polygon, fall back to a fan
+            ear = 1
+        # end if
+        triangles.append((remaining[ear - 1], remaining[ear], remaining[(ear + 1) % len(remaining)]))
+        del remaining[ear]
+    # end while
+    triangles.append(tuple(remaining))
+    return triangles
+# end triangulate_polygon
+
+
+def triangulate_arrays(arrays: Utils.MeshArrays) -> Utils.MeshArrays:
+    """
+        Splits all polygons into triangles
+    Args:
+        arrays: MeshArrays instance
+    Returns:
+        MeshArrays instance, containing only triangles. Each triangle keeps the material and uvs of its polygon.
+    """
+    co = numpy.frombuffer(arrays.co, dtype=numpy.float32).reshape((-1, 3)).astype(numpy.float64)
+    loop_verts = numpy.frombuffer(arrays.loop_verts, dtype=numpy.int32)
+    material_indices = numpy.frombuffer(arrays.material_indices, dtype=numpy.int32)
+    tri_loops = list()
+    tri_materials = list()
+    for loop_start, loop_total, material_index in zip(arrays.loop_starts, arrays.loop_totals, material_indices):
+        polygon = loop_verts[loop_start:loop_start + loop_total]
+        for triangle in triangulate_polygon(co, polygon):
+            tri_loops.extend(loop_start + corner for corner in triangle)
+            tri_materials.append(material_index)
+        # end for
+    # end for
+    tri_loops = numpy.array(tri_loops, dtype=numpy.int32)
+    tri_count = len(tri_materials)
+    if len(arrays.uvs) > 0:
+        uvs = numpy.frombuffer(arrays.uvs, dtype=numpy.float32).reshape((-1, 2))[tri_loops].ravel()
+    else:
+        uvs = numpy.empty(0, dtype=numpy.float32)
+    # end if
+    return Utils.MeshArrays(
+        arrays.co,
+        arrays.edges,
+        numpy.arange(0, 3 * tri_count, 3, dtype=numpy.int32),
+        numpy.full(tri_count, 3, dtype=numpy.int32),
+        loop_verts[tri_loops],
+        numpy.array(tri_materials, dtype=numpy.int32),
+        uvs
+    )
+# end triangulate_arrays
+
+
+def vertex_score(cache_position: int, remaining: int, cache_size: int) -> float:
+    """
+        Score of a vertex, triangles using high scoring vertices are emitted first
+    Args:
+        cache_position: position of the vertex in the simulated cache, -1 if it's not in the cache
+        remaining: number of triangles using this vertex, which are not emitted yet
+        cache_size: size of the simulated cache
+    Returns:
+        the score, -1 if the vertex is not used by any remaining triangle
+    """
+    if remaining == 0:
+        return -1.0
+    # end if
+    score = 0.0
+    if cache_position >= 0:
+        if cache_position < 3:
+            # the vertices of the last triangle get a fixed score, so the same triangle is not favoured twice
+            score = LAST_TRI_SCORE
+        else:
+            score = (1.0 - (cache_position - 3) / (cache_size - 3)) ** CACHE_DECAY_POWER
+        # end if
+    # end if
+    score += VALENCE_BOOST_SCALE * remaining ** -VALENCE_BOOST_POWER
+    return score
+# end vertex_score
+
+
+def optimize_vertex_cache(indices: list, vert_count: int, cache_size: int) -> list:
+    """
+        Reorders triangles, so the vertices they use are more likely to be in the post-transform vertex cache
+    Args:
+        indices: list(int) - triangle list, three vertex indices per triangle
+        vert_count: number of vertices
+        cache_size: size of the simulated LRU cache, must be greater than 3
+    Returns:
+        list(int) - triangle order, index of the original triangle for each emitted triangle
+    """
+    tri_count = len(indices) // 3
+    vert_tris = [list() for i in range(0, vert_count)]
+    for tri in range(0, tri_count):
+        for vert in indices[3 * tri:3 * tri + 3]:
+            vert_tris[vert].append(tri)
+        # end for
+    # end for
+    remaining = [len(tris) for tris in vert_tris]
+    cache_positions = [-1] * vert_count
+    vert_scores = [vertex_score(-1, remaining[vert], cache_size) for vert in range(0, vert_count)]
+    tri_scores = [sum(vert_scores[vert] for vert in indices[3 * tri:3 * tri + 3]) for tri in range(0, tri_count)]
+    is_emitted = [False] * tri_count
+    cache = list()
+    order = list()
+    best_tri = max(range(0, tri_count), key=lambda tri: tri_scores[tri], default=-1)
+    next_unemitted = 0
+    while len(order) < tri_count:
+        if best_tri < 0:
+            # nothing in the cache is usable, continue with the next triangle in the original order
+            while is_emitted[next_unemitted]:
+                next_unemitted += 1
+            # end while
+            best_tri = next_unemitted
+        # end if
+
+        # emit the triangle
+        is_emitted[best_tri] = True
+        order.append(best_tri)
+        tri_verts = indices[3 * best_tri:3 * best_tri + 3]
+        for vert in tri_verts:
+            remaining[vert] -= 1
+            vert_tris[vert].remove(best_tri)
+        # end for
+
+        # move the triangle vertices to the front of the cache
+        cache = list(tri_verts) + [vert for vert in cache if vert not in tri_verts]
+        for vert in cache[cache_size:]:
+            cache_positions[vert] = -1
+            vert_scores[vert] = vertex_score(-1, remaining[vert], cache_size)
+        # end for
+        cache = cache[:cache_size]
+
+        # update scores of cached vertices and their triangles, pick the best one
+        touched = set()
+        for position, vert in enumerate(cache):
+            cache_positions[vert] = position
+            vert_scores[vert] = vertex_score(position, remaining[vert], cache_size)
+            touched.update(vert_tris[vert])
+        # end for
+        best_tri = -1
+        best_score = -1.0
+        for tri in sorted(touched):
+            tri_scores[tri] = sum(vert_scores[vert] for vert in indices[3 * tri:3 * tri + 3])
+            if tri_scores[tri] > best_score:
+                best_tri = tri
+                best_score = tri_scores[tri]
+            # end if
+        # end for
+    # end while
+    return order
+# end optimize_vertex_cache
+
+
+def acmr(indices, cache_size: int) -> float:
+    """
+        Calculates the average cache miss ratio, using a simulated LRU vertex cache, the same model
+        optimize_vertex_cache orders the triangles for
+    Args:
+        indices: triangle list, three vertex indices per triangle
+        cache_size: size of the simulated cache
+    Returns:
+        number of transformed vertices per triangle, between 0.5 (best case for large meshes) and 3
+    """
+    tri_count = len(indices) // 3
+    if tri_count == 0:
+        return 0.0
+    # end if
+    # cached vertices, least recently used first
+    cache = collections.OrderedDict()
+    misses = 0
+    for vert in indices:
+        if vert in cache:
+            cache.move_to_end(vert)
+        else:
+            misses += 1
+            cache[vert] = True
+            if len(cache) > cache_size:
+                cache.popitem(last=False)
+            # end if
+        # end if
+    # end for
+    return misses / tri_count
+# end acmr
+
+
+def optimize_arrays(arrays: Utils.MeshArrays, cache_size: int) -> Utils.MeshArrays:
+    """
+        Reorders the triangles for vertex cache efficiency, then renumbers vertices in the order they are first used,
+        so vertex fetches are mostly sequential
+    Args:
+        arrays: MeshArrays instance, containing only triangles
+        cache_size: size of the simulated vertex cache
+    Returns:
+        MeshArrays instance with reordered triangles and vertices
+    """
+    co = numpy.frombuffer(arrays.co, dtype=numpy.float32).reshape((-1, 3))
+    vert_count = len(co)
+    loop_verts = numpy.frombuffer(arrays.loop_verts, dtype=numpy.int32)
+    order = numpy.array(optimize_vertex_cache(loop_verts.tolist(), vert_count, cache_size), dtype=numpy.int32)
+    tri_loops = (3 * order[:, None] + numpy.arange(3, dtype=numpy.int32)[None, :]).ravel()
+    loop_verts = loop_verts[tri_loops]
+
+    # vertex order, first by first use, then the unused vertices
+    first_use = numpy.full(vert_count, len(loop_verts), dtype=numpy.int64)
+    numpy.minimum.at(first_use, loop_verts, numpy.arange(len(loop_verts)))
+    vert_order = numpy.lexsort((numpy.arange(vert_count), first_use)).astype(numpy.int32)
+    new_index = numpy.empty(vert_count, dtype=numpy.int32)
+    new_index[vert_order] = numpy.arange(vert_count, dtype=numpy.int32)
+
+    if len(arrays.uvs) > 0:
+        uvs = numpy.frombuffer(arrays.uvs, dtype=numpy.float32).reshape((-1, 2))[tri_loops].ravel()
+    else:
+        uvs = numpy.empty(0, dtype=numpy.float32)
+    # end if
+    return Utils.MeshArrays(
+        co[vert_order].ravel(),
+        new_index[numpy.frombuffer(arrays.edges, dtype=numpy.int32)],
+        arrays.loop_starts,
+        arrays.loop_totals,
+        new_index[loop_verts],
+        numpy.frombuffer(arrays.material_indices, dtype=numpy.int32)[order],
+        uvs
+    )
+# end optimize_arrays
+
+
+def apply_output(obj: bpy.types.Object, params_output: ParamsOutput) -> dict:
+    """
+        Applies the output stage to the object mesh: coplanar face merging, triangulation and index buffer
+        optimization
+    Args:
+        obj: component object, its mesh is replaced
+        params_output: instance of the ParamsOutput class
+    Returns:
+        a dictionary with the following keys, only containing the keys of the steps which were applied
+            "faces_before" - number of faces before merging
+            "faces_after" - number of faces after merging
+            "acmr_before" - average cache miss ratio of the triangulated mesh, in the original order
+            "acmr_after" - average cache miss ratio after optimization, the original order is kept if the
+                optimization does not lower it
+    """
+    result = dict()
+    if not params_output.merge_coplanar and not params_output.triangulate:
+        return result
+    # end if
+    arrays = Utils.mesh_to_arrays(obj.data)
+    if params_output.merge_coplanar:
+        result["faces_before"] = len(arrays.loop_totals)
+        arrays = merge_coplanar_arrays(arrays)
+        result["faces_after"] = len(arrays.loop_totals)
+    # end if
+    if params_output.triangulate:
+        arrays = triangulate_arrays(arrays)
+        result["acmr_before"] = acmr(numpy.frombuffer(arrays.loop_verts, dtype=numpy.int32).tolist(),
+                                     params_output.cache_size)
+        arrays_optimized = optimize_arrays(arrays, params_output.cache_size)
+        result["acmr_after"] = acmr(arrays_optimized.loop_verts.tolist(), params_output.cache_size)
+        if result["acmr_after"] < result["acmr_before"]:
+            arrays = arrays_optimized
+        else:
+            result["acmr_after"] = result["acmr_before"]
+        # end if
+    # end if
+
+    # replace the mesh, keep materials
+    m_old = obj.data
+    m = Utils.mesh_from_arrays(m_old.name, arrays)
+    for material in m_old.materials:
+        m.materials.append(material)
+    # end for
+    obj.data = m
+    bpy.data.meshes.remove(m_old)
+    return result
+# end apply_output
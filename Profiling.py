@@ -0,0 +1,201 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  Procedural building generator
+#  Copyright (C) 2019 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import time
+import tracemalloc
+from . import Stages
+
+# number of source lines listed as the largest python allocations of a run
+PROFILE_TOP_LINES = 10
+# number of frames kept for each traced allocation
+PROFILE_FRAME_COUNT = 1
+
+# report of the last profiled generation, see MemoryProfiler.stop
+last_report = None
+
+
+def datablock_counts() -> dict:
+    """
+        Counts the blender datablocks a generation creates
+    Returns:
+        dict with keys meshes, objects, materials and verts, the total number of vertices of all meshes
+    """
+    return {
+        "meshes": len(bpy.data.meshes),
+        "objects": len(bpy.data.objects),
+        "materials": len(bpy.data.materials),
+        "verts": sum(len(m.vertices) for m in bpy.data.meshes)
+    }
+# end datablock_counts
+
+
+def datablock_names() -> set:
+    """
+        Lists the meshes, objects and materials which currently exist
+    Returns:
+        set(tuple(str, str)) - type and name of each datablock
+    """
+    names = set()
+    for kind, collection in (("mesh", bpy.data.meshes), ("object", bpy.data.objects),
+                             ("material", bpy.data.materials)):
+        names.update((kind, block.name) for block in collection)
+    # end for
+    return names
+# end datablock_names
+
+
+def count_growth(before: dict, after: dict) -> dict:
+    """
+        Subtracts two results of datablock_counts
+    Args:
+        before: counts at the start
+        after: counts at the end
+    Returns:
+        dict, the same keys, growth of each count
+    """
+    return {key: after[key] - before[key] for key in before.keys()}
+# end count_growth
+
+
+class MemoryProfiler:
+    """
+    Measures python allocations (with tracemalloc) and blender datablocks of a generation, attributing the growth to
+    each stage.
+
+    Note:
+        While profiling, StageGraph runs all stages in the calling thread, one after another, so the growth measured
+        around a stage belongs to that stage only.
+    """
+
+    def __init__(self):
+        self.stages = list()
+        self.started = False
+        self.counts_start = None
+        self.names_start = None
+        self.snapshot_start = None
+        self.time_start = 0.0
+    # end __init__
+
+    def start(self):
+        """
+            Starts tracing, call before the generation
+        """
+        self.started = not tracemalloc.is_tracing()
+        if self.started:
+            tracemalloc.start(PROFILE_FRAME_COUNT)
+        # end if
+        self.counts_start = datablock_counts()
+        self.names_start = datablock_names()
+        self.snapshot_start = tracemalloc.take_snapshot()
+        self.time_start = time.time()
+    # end start
+
+    def run(self, stage: Stages.Stage, values: dict) -> tuple:
+        """
+            Runs and measures a single stage, used by StageGraph.run in place of Stages.timed
+        Args:
+            stage: Stage instance
+            values: dict, all available values
+        Returns:
+            tuple(output, float) - output of the stage, time in seconds
+        """
+        counts_before = datablock_counts()
+        size_before = tracemalloc.get_traced_memory()[0]
+        output, elapsed = Stages.timed(stage, values)
+        size_after = tracemalloc.get_traced_memory()[0]
+        growth = count_growth(counts_before, datablock_counts())
+        growth["python"] = size_after - size_before
+        growth["name"] = stage.name
+        self.stages.append(growth)
+        return output, elapsed
+    # end run
+
+    def stop(self) -> dict:
+        """
+            Stops tracing and collects the report, call after the generation
+        Returns:
+            dict with keys:
+                time: generation time in seconds
+                python: growth of traced python memory in bytes
+                peak: peak traced python memory in bytes
+                growth: growth of datablock_counts
+                stages: list(dict) - growth of datablock_counts and python memory of each stage
+                top: list(str) - source lines with the largest python memory growth
+                leaked: list(str) - datablocks created by the generation which nothing uses
+        """
+        global last_report
+        size, peak = tracemalloc.get_traced_memory()
+        snapshot_end = tracemalloc.take_snapshot()
+        if self.started:
+            tracemalloc.stop()
+        # end if
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        differences = snapshot_end.filter_traces(filters).compare_to(
+            self.snapshot_start.filter_traces(filters), "lineno")
+        top = [str(difference) for difference in differences[:PROFILE_TOP_LINES] if difference.size_diff > 0]
+
+        leaked = list()
+        for kind, collection in (("mesh", bpy.data.meshes), ("object", bpy.data.objects),
+                                 ("material", bpy.data.materials)):
+            for block in collection:
+                if block.users == 0 and (kind, block.name) not in self.names_start:
+                    leaked.append(kind + " " + block.name)
+                # end if
+            # end for
+        # end for
+
+        last_report = {
+            "time": time.time() - self.time_start,
+            "python": sum(stage["python"] for stage in self.stages),
+            "peak": peak,
+            "growth": count_growth(self.counts_start, datablock_counts()),
+            "stages": sorted(self.stages, key=lambda stage: stage["python"], reverse=True),
+            "top": top,
+            "leaked": leaked
+        }
+        return last_report
+    # end stop
+# end MemoryProfiler
+
+
+def print_report(report: dict):
+    """
+        Prints the report of a profiled generation to the console
+    Args:
+        report: result of MemoryProfiler.stop
+    """
+    growth = report["growth"]
+    print("memory profile: python {:+.1f} KiB, peak {:.1f} KiB".format(report["python"] / 1024.0,
+                                                                      report["peak"] / 1024.0))
+    print("memory profile: meshes {:+}, objects {:+}, materials {:+}, verts {:+}".format(
+        growth["meshes"], growth["objects"], growth["materials"], growth["verts"]))
+    print("stage                   python (KiB)   meshes  objects      verts")
+    for stage in report["stages"]:
+        print("{:<24}{:>12.1f}{:>9}{:>9}{:>11}".format(stage["name"], stage["python"] / 1024.0, stage["meshes"],
+                                                      stage["objects"], stage["verts"]))
+    # end for
+    for line in report["top"]:
+        print("memory profile: " + line)
+    # end for
+    for name in report["leaked"]:
+        print("memory profile: leaked " + name)
+    # end for
+# end print_report
@@ -0,0 +1,333 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  Procedural building generator
+#  Copyright (C) 2019 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import mathutils
+import os
+import csv
+import json
+import math
+import random
+import shutil
+import hashlib
+import tempfile
+from . import Generator
+from . import Fingerprint
+from . import Workers
+
+# parameter distributions used when no spec file is given, next to this file
+SAMPLER_SPEC_FILE = "sampler_spec.json"
+# upper bound of the drawn building seeds
+SAMPLER_SEED_MAX = 1000000
+# columns of the result table, followed by the sampled parameters
+TABLE_COLUMNS = ["index", "name", "time", "objects", "faces", "verts", "fingerprint"]
+
+
+class ParamsSampler:
+    # TODO: docstring
+
+    def __init__(self, spec: str, count: int, seed: int, worker_count: int, output: str, use_grid: bool,
+                 grid_spacing: float):
+        self.spec = spec
+        self.count = count
+        self.seed = seed
+        self.worker_count = worker_count
+        self.output = output
+        self.use_grid = use_grid
+        self.grid_spacing = grid_spacing
+    # end __init__
+
+    @staticmethod
+    def from_ui():
+        properties = bpy.context.scene.PBGPropertyGroup
+        spec = bpy.path.abspath(properties.sampler_spec)
+        if spec == "":
+            spec = os.path.join(os.path.dirname(os.path.realpath(__file__)), SAMPLER_SPEC_FILE)
+        # end if
+        params = ParamsSampler(
+            spec=spec,
+            count=properties.sampler_count,
+            seed=properties.sampler_seed,
+            worker_count=properties.sampler_worker_count,
+            output=bpy.path.abspath(properties.sampler_output),
+            use_grid=properties.sampler_use_grid,
+            grid_spacing=properties.sampler_grid_spacing
+        )
+        return params
+    # end from_ui
+# end ParamsSampler
+
+
+def draw_value(rng: random.Random, distribution: dict):
+    """
+        Draws a single parameter value
+    Args:
+        rng: random.Random instance
+        distribution: dict with a single key, one of:
+            uniform: [min, max] - float
+            normal: [mean, deviation] - float
+            randint: [min, max] - int, both included
+            choice: [values] - any of the values
+    Returns:
+        the drawn value
+    """
+    if "uniform" in distribution:
+        return rng.uniform(*distribution["uniform"])
+    elif "normal" in distribution:
+        return rng.gauss(*distribution["normal"])
+    elif "randint" in distribution:
+        return rng.randint(*distribution["randint"])
+    elif "choice" in distribution:
+        return rng.choice(distribution["choice"])
+    # end if
+    raise ValueError("Unknown distribution: " + repr(distribution))
+# end draw_value
+
+
+def draw_configurations(spec: dict, count: int, seed: int) -> list:
+    """
+        Draws configurations from the parameter distributions, the same spec, count and seed give the same result
+    Args:
+        spec: dict, property name to distribution, see draw_value
+        count: number of configurations
+        seed: sampler seed
+    Returns:
+        list(dict) - configurations with keys name and properties, as used by Fingerprint.gen_configuration
+    """
+    rng = random.Random(seed)
+    configurations = list()
+    for i in range(0, count):
+        values = dict()
+        for name in sorted(spec.keys()):
+            values[name] = draw_value(rng, spec[name])
+        # end for
+        values["seed"] = rng.randrange(0, SAMPLER_SEED_MAX)
+        configurations.append({"name": "sample" + str(i), "properties": values})
+    # end for
+    return configurations
+# end draw_configurations
+
+
+def building_fingerprint(fingerprints: dict) -> str:
+    """
+        Combines the fingerprints of all components into the fingerprint of the whole building
+    Args:
+        fingerprints: result of Fingerprint.fingerprint_building
+    Returns:
+        hex digest
+    """
+    h = hashlib.sha1()
+    for name in sorted(fingerprints.keys()):
+        fingerprint = fingerprints[name]
+        h.update(repr((name, fingerprint["hash"], fingerprint["placements"])).encode())
+    # end for
+    return h.hexdigest()
+# end building_fingerprint
+
+
+def run_samples(context: bpy.types.Context, configurations: list, indices: list) -> list:
+    """
+        Generates the given configurations one after another, in this process
+    Args:
+        context: bpy.types.Context
+        configurations: list(dict) - result of draw_configurations
+        indices: list(int) - index of each configuration in the whole sample
+    Returns:
+        list(dict) - one row of the result table for each configuration
+    """
+    properties = context.scene.PBGPropertyGroup
+    values = Generator.snapshot_properties(properties)
+    rows = list()
+    try:
+        for index, configuration in zip(indices, configurations):
+            print("sampler: generating " + configuration["name"])
+            fingerprints, elapsed = Fingerprint.gen_configuration(context, configuration)
+            row = {
+                "index": index,
+                "name": configuration["name"],
+                "time": elapsed,
+                "objects": sum(f["count"] for f in fingerprints.values()),
+                "faces": sum(f["faces"] * f["count"] for f in fingerprints.values()),
+                "verts": sum(f["verts"] * f["count"] for f in fingerprints.values()),
+                "fingerprint": building_fingerprint(fingerprints)
+            }
+            row.update(configuration["properties"])
+            rows.append(row)
+        # end for
+    finally:
+        Generator.restore_properties(properties, values)
+    # end try
+    return rows
+# end run_samples
+
+
+def worker_main():
+    """
+        Entry point of a worker process, a background blender instance started by run_workers.
+        The worker arguments are the path of the input json (configurations and indices) and of the output json.
+    """
+    input_path, output_path = Workers.worker_args()
+    with open(input_path, "r") as f:
+        work = json.load(f)
+    # end with
+    rows = run_samples(bpy.context, work["configurations"], work["indices"])
+    with open(output_path, "w") as f:
+        json.dump(rows, f)
+    # end with
+# end worker_main
+
+
+def run_workers(configurations: list, worker_count: int) -> list:
+    """
+        Generates the given configurations in background blender processes, running in parallel
+    Note:
+        Each worker enables this addon in a fresh blender instance, so the addon has to be installed.
+    Args:
+        configurations: list(dict) - result of draw_configurations
+        worker_count: number of worker processes
+    Returns:
+        list(dict) - rows of the result table, without the configurations of failed workers
+    """
+    directory = tempfile.mkdtemp(prefix="pbg_sampler_")
+    workers = list()
+    for i in range(0, min(worker_count, len(configurations))):
+        indices = Workers.shard(list(range(0, len(configurations))), i, worker_count)
+        input_path = os.path.join(directory, "input" + str(i) + ".json")
+        output_path = os.path.join(directory, "output" + str(i) + ".json")
+        log_path = os.path.join(directory, "worker" + str(i) + ".log")
+        with open(input_path, "w") as f:
+            json.dump({"configurations": [configurations[index] for index in indices], "indices": indices}, f)
+        # end with
+        workers.append(Workers.start_worker("Sampler", [input_path, output_path], log_path) + (output_path, log_path))
+    # end for
+
+    rows = list()
+    failed = False
+    for process, log, output_path, log_path in workers:
+        process.wait()
+        log.close()
+        if process.returncode != 0 or not os.path.isfile(output_path):
+            print("sampler: worker failed, see " + log_path)
+            failed = True
+            continue
+        # end if
+        with open(output_path, "r") as f:
+            rows.extend(json.load(f))
+        # end with
+    # end for
+    if not failed:
+        shutil.rmtree(directory, ignore_errors=True)
+    # end if
+    rows.sort(key=lambda row: row["index"])
+    return rows
+# end run_workers
+
+
+def write_table(rows: list, path: str):
+    """
+        Writes the result table as csv
+    Args:
+        rows: list(dict) - rows of the result table
+        path: path of the csv file
+    """
+    parameters = sorted(set(name for row in rows for name in row.keys()) - set(TABLE_COLUMNS))
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=TABLE_COLUMNS + parameters)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+        # end for
+    # end with
+# end write_table
+
+
+def print_table(rows: list):
+    """
+        Prints the result table to the console, the most expensive configurations first
+    Args:
+        rows: list(dict) - rows of the result table
+    """
+    print("name          time (s)    objects      faces      verts  fingerprint")
+    for row in sorted(rows, key=lambda r: r["time"], reverse=True):
+        print("{:<12}{:>10.3f}{:>11}{:>11}{:>11}  {}".format(row["name"], row["time"], row["objects"], row["faces"],
+                                                          row["verts"], row["fingerprint"][:12]))
+    # end for
+# end print_table
+
+
+def layout_grid(context: bpy.types.Context, configurations: list, spacing: float):
+    """
+        Places a building for each configuration in a grid, starting at the 3D cursor
+    Note:
+        Buildings are placed as instances, each one keeps its parameters, so it can be loaded and regenerated.
+    Args:
+        context: bpy.types.Context
+        configurations: list(dict) - result of draw_configurations
+        spacing: distance between the grid cells
+    """
+    properties = context.scene.PBGPropertyGroup
+    values = Generator.snapshot_properties(properties)
+    column_count = max(1, int(math.ceil(math.sqrt(len(configurations)))))
+    try:
+        for i, configuration in enumerate(configurations):
+            Fingerprint.apply_configuration(properties, configuration)
+            offset = mathutils.Vector(((i % column_count) * spacing, -(i // column_count) * spacing, 0.0))
+            group = Generator.new_building()
+            Generator.instance_building(context, group, group.name + ".",
+                                        mathutils.Matrix.Translation(context.scene.cursor_location + offset))
+            Generator.store_building_properties(group, Generator.building_properties(properties))
+        # end for
+    finally:
+        Generator.restore_properties(properties, values)
+    # end try
+# end layout_grid
+
+
+class SampleDesigns(bpy.types.Operator):
+    # TODO: docstring
+
+    bl_idname = "pbg.sample_designs"
+    bl_label = "Sample Designs"
+    bl_options = {"REGISTER"}
+
+    def invoke(self, context, event):
+        params_sampler = ParamsSampler.from_ui()
+        with open(params_sampler.spec, "r") as f:
+            spec = json.load(f)
+        # end with
+        configurations = draw_configurations(spec, params_sampler.count, params_sampler.seed)
+        if params_sampler.worker_count > 0:
+            rows = run_workers(configurations, params_sampler.worker_count)
+        else:
+            rows = run_samples(context, configurations, list(range(0, len(configurations))))
+        # end if
+        print_table(rows)
+        if params_sampler.output != "":
+            write_table(rows, params_sampler.output)
+        # end if
+        if params_sampler.use_grid:
+            layout_grid(context, configurations, params_sampler.grid_spacing)
+        # end if
+        if len(rows) < len(configurations):
+            self.report({"WARNING"}, str(len(configurations) - len(rows)) + " configurations failed, see the console")
+        # end if
+        return {"FINISHED"}
+    # end invoke
+# end SampleDesigns
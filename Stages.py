@@ -0,0 +1,238 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  Procedural building generator
+#  Copyright (C) 2019 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import time
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from . import Cache
+
+# number of threads running concurrent stages
+STAGE_WORKER_COUNT = 4
+# number of cached stage outputs kept in memory
+STAGE_MEMO_SIZE = 64
+
+# threads running concurrent stages, shared by all runs, see get_executor
+executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+        Finds the threads running concurrent stages, starts them on first use
+    Returns:
+        ThreadPoolExecutor instance
+    """
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=STAGE_WORKER_COUNT)
+    # end if
+    return executor
+# end get_executor
+
+
+def shutdown_executor():
+    """
+        Stops the threads running concurrent stages, if they were started
+    """
+    global executor
+    if executor is not None:
+        executor.shutdown()
+        executor = None
+    # end if
+# end shutdown_executor
+
+
+class Stage:
+    """
+    A single step of building generation.
+
+    Note:
+        A stage runs once all of its inputs are available, and provides its output under its own name.
+        Concurrent stages must not use bpy or the global random generator, they may run in a worker thread at the
+        same time as other stages. Cached stages must only depend on their inputs and must not output blender data,
+        their outputs are kept in memory and reused while the inputs stay the same, so other stages must not modify
+        them.
+    """
+
+    def __init__(self, name: str, inputs: tuple, func, output_type=object, concurrent: bool=False,
+                 cached: bool=False, condition=None):
+        """
+            Creates a stage
+        Args:
+            name: name of the stage and its output
+            inputs: tuple(str) - names of the outputs of other stages, or of the initial values, the stage needs
+            func: called with a dict of the inputs, returns the output
+            output_type: type, or tuple of types, the output is checked against. None is always allowed, it is
+                the output of skipped stages
+            concurrent: if True, the stage may run in a worker thread
+            cached: if True, the output is reused for equal inputs
+            condition: called with a dict of the inputs, the stage is skipped (output is None) if it returns False
+        """
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.func = func
+        self.output_type = output_type
+        self.concurrent = concurrent
+        self.cached = cached
+        self.condition = condition
+    # end __init__
+
+    def run(self, values: dict):
+        """
+            Runs the stage, or skips it if its condition is not met
+        Args:
+            values: dict, all available values
+        Returns:
+            output of the stage
+        """
+        inputs = {name: values[name] for name in self.inputs}
+        if self.condition is not None and not self.condition(inputs):
+            return None
+        # end if
+        output = self.func(inputs)
+        if output is not None and not isinstance(output, self.output_type):
+            raise TypeError("Stage " + self.name + " returned " + type(output).__name__)
+        # end if
+        return output
+    # end run
+# end Stage
+
+
+class StageGraph:
+    """
+    Dependency graph of stages, run in waves: every stage whose inputs are available runs in the next wave,
+    concurrent stages in worker threads and all other stages one after another in the calling thread.
+    """
+
+    def __init__(self, stages: list, initial: tuple):
+        """
+            Creates the graph and checks that all inputs are provided and there are no cycles
+        Args:
+            stages: list(Stage) - stages, names must be unique
+            initial: tuple(str) - names of the values passed to run
+        """
+        self.stages = list()
+        self.waves = list()
+        names = set(initial)
+        for stage in stages:
+            if stage.name in names:
+                raise ValueError("Duplicate stage " + stage.name)
+            # end if
+            names.add(stage.name)
+        # end for
+        for stage in stages:
+            for name in stage.inputs:
+                if name not in names:
+                    raise ValueError("Stage " + stage.name + " needs " + name + ", which is not provided")
+                # end if
+            # end for
+        # end for
+
+        # group stages into waves, keeping the declared order within each wave
+        available = set(initial)
+        remaining = list(stages)
+        while len(remaining) > 0:
+            wave = [stage for stage in remaining if all(name in available for name in stage.inputs)]
+            if len(wave) == 0:
+                raise ValueError("Stages " + ", ".join(stage.name for stage in remaining) + " depend on each other")
+            # end if
+            for stage in wave:
+                remaining.remove(stage)
+                available.add(stage.name)
+            # end for
+            self.waves.append(wave)
+            self.stages.extend(wave)
+        # end while
+    # end __init__
+
+    def run(self, values: dict, memo: collections.OrderedDict=None, profiler=None) -> dict:
+        """
+            Runs all stages
+        Args:
+            values: dict, initial values
+            memo: outputs of cached stages from previous runs, updated in place, None to disable caching
+            profiler: Profiling.MemoryProfiler instance, which runs and measures each stage, None to run normally.
+                All stages run in the calling thread while profiling
+        Returns:
+            dict, initial values and the outputs of all stages, and "stage_times", stage name to time in seconds
+        """
+        values = dict(values)
+        times = dict()
+        for wave in self.waves:
+            keys = dict()
+            pending = list()
+            for stage in wave:
+                if stage.cached and memo is not None:
+                    keys[stage.name] = Cache.params_key(stage.name, *(values[name] for name in stage.inputs))
+                    if keys[stage.name] in memo:
+                        memo.move_to_end(keys[stage.name])
+                        values[stage.name] = memo[keys[stage.name]]
+                        times[stage.name] = 0.0
+                        continue
+                    # end if
+                # end if
+                pending.append(stage)
+            # end for
+            # a worker thread only pays off if another stage of the wave runs meanwhile
+            if profiler is None and len(pending) > 1:
+                threaded = [stage for stage in pending if stage.concurrent]
+            else:
+                threaded = list()
+            # end if
+            futures = [(stage, get_executor().submit(timed, stage, values)) for stage in threaded]
+            for stage in pending:
+                if stage in threaded:
+                    continue
+                elif profiler is not None:
+                    values[stage.name], times[stage.name] = profiler.run(stage, values)
+                else:
+                    values[stage.name], times[stage.name] = timed(stage, values)
+                # end if
+            # end for
+            for stage, future in futures:
+                values[stage.name], times[stage.name] = future.result()
+            # end for
+            for stage in pending:
+                if stage.name in keys:
+                    memo[keys[stage.name]] = values[stage.name]
+                    if len(memo) > STAGE_MEMO_SIZE:
+                        memo.popitem(last=False)
+                    # end if
+                # end if
+            # end for
+        # end for
+        values["stage_times"] = times
+        return values
+    # end run
+# end StageGraph
+
+
+def timed(stage: Stage, values: dict) -> tuple:
+    """
+        Runs the stage and measures its time
+    Args:
+        stage: Stage instance
+        values: dict, all available values
+    Returns:
+        tuple(output, float) - output of the stage, time in seconds
+    """
+    time_start = time.time()
+    output = stage.run(values)
+    return output, time.time() - time_start
+# end timed
@@ -0,0 +1,173 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  Procedural building generator
+#  Copyright (C) 2019 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import time
+from . import Profiling
+
+# number of previous runs kept in the history
+HISTORY_SIZE = 10
+
+# statistics of the last generation, see record_run
+last_run = None
+# summaries of previous generations, newest first
+history = list()
+# geometry cache result of each component of the current generation, True for hits
+cache_results = dict()
+# result of Output.apply_output for each component generated by the current generation
+output_stats = dict()
+# problems of the current generation the artist should know about, e.g. dropped doors
+warnings = list()
+
+
+def begin_run():
+    """
+        Starts collecting the statistics of a new generation
+    """
+    cache_results.clear()
+    output_stats.clear()
+    del warnings[:]
+# end begin_run
+
+
+def record_cache(obj_name: str, hit: bool):
+    """
+        Records whether the component was loaded from the geometry cache
+    Args:
+        obj_name: name of the component object
+        hit: True if it was loaded from the cache, False if it was generated and stored
+    """
+    cache_results[obj_name] = hit
+# end record_cache
+
+
+def record_output(obj_name: str, stats: dict):
+    """
+        Records what the output stage did to the component
+    Args:
+        obj_name: name of the component object
+        stats: result of Output.apply_output
+    """
+    output_stats[obj_name] = stats
+# end record_output
+
+
+def record_warnings(messages: list):
+    """
+        Records problems of the current generation, they are also printed to the console
+    Args:
+        messages: list(str) - warnings, e.g. of GenLayout.gen_door_positions and GenLayout.gen_layout
+    """
+    for message in messages:
+        print("warning: " + message)
+    # end for
+    warnings.extend(messages)
+# end record_warnings
+
+
+def orphan_count() -> int:
+    """
+        Counts the meshes, materials and objects which are not used by anything
+    Returns:
+        number of orphaned datablocks
+    """
+    count = 0
+    for collection in (bpy.data.meshes, bpy.data.materials, bpy.data.objects):
+        count += sum(1 for block in collection if block.users == 0)
+    # end for
+    return count
+# end orphan_count
+
+
+def record_run(values: dict, elapsed: float):
+    """
+        Collects the statistics of each component of a finished generation, and adds them to the history
+    Args:
+        values: result of Stages.StageGraph.run
+        elapsed: total generation time in seconds
+    """
+    global last_run
+    components = list()
+    for name, stage_time in values["stage_times"].items():
+        output = values[name]
+        if isinstance(output, bpy.types.Object):
+            objects = [output]
+        elif isinstance(output, list) and len(output) > 0 and isinstance(output[0], bpy.types.Object):
+            objects = output
+        else:
+            continue
+        # end if
+        verts = 0
+        faces = 0
+        instances = 0
+        for obj in objects:
+            # hidden component objects are only the source of their linked duplicates
+            count = obj.data.users - 1 if obj.hide else obj.data.users
+            verts += len(obj.data.vertices) * count
+            faces += len(obj.data.polygons) * count
+            instances += count
+        # end for
+        if name in cache_results:
+            cache = "hit" if cache_results[name] else "miss"
+        else:
+            cache = "off"
+        # end if
+        components.append({
+            "name": name,
+            "time": stage_time,
+            "verts": verts,
+            "faces": faces,
+            "instances": instances,
+            "cache": cache,
+            "output": output_stats.get(name, dict())
+        })
+    # end for
+    components.sort(key=lambda component: component["time"], reverse=True)
+    last_run = {
+        "time": elapsed,
+        "verts": sum(component["verts"] for component in components),
+        "faces": sum(component["faces"] for component in components),
+        "instances": sum(component["instances"] for component in components),
+        "hits": sum(1 for hit in cache_results.values() if hit),
+        "misses": sum(1 for hit in cache_results.values() if not hit),
+        "orphans": orphan_count(),
+        "components": components,
+        "label": time.strftime("%H:%M:%S")
+    }
+    history.insert(0, last_run)
+    del history[HISTORY_SIZE:]
+# end record_run
+
+
+class ClearStatistics(bpy.types.Operator):
+    # TODO: docstring
+
+    bl_idname = "pbg.clear_statistics"
+    bl_label = "Clear Statistics"
+    bl_options = {"REGISTER"}
+
+    def invoke(self, context, event):
+        global last_run
+        last_run = None
+        del history[:]
+        Profiling.last_report = None
+        return {"FINISHED"}
+    # end invoke
+# end ClearStatistics
@@ -0,0 +1,517 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  Procedural building generator
+#  Copyright (C) 2019 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import heapq
+import math
+import numpy
+
+# max cross product of two edge directions, for the edges to be treated as parallel
+PARALLEL_LIMIT = 1e-9
+# max difference of two event times or positions, for them to be treated as equal
+EVENT_TOLERANCE = 1e-6
+# number of decimals to which node positions are rounded, nodes at the same rounded position are merged
+NODE_PRECISION = 6
+
+# event kinds, edge events are handled before split events at the same time
+EVENT_EDGE = 0
+EVENT_SPLIT = 1
+
+
+class WavefrontVertex:
+    """
+    Vertex of the shrinking polygon (wavefront).
+
+    Note:
+        Each vertex moves with a constant velocity along the bisector of its two edges, so that both of its edges
+        move inwards with unit speed. A vertex between two anti parallel edges only exists at the moment it is
+        created (the two edges overlap), its velocity is None.
+
+    Attributes:
+        point (tuple(x, y)): position at the time the vertex was created
+        time (float): time the vertex was created, equal to its distance from both of its edges
+        node (int): index of the skeleton node the vertex was created at
+        edge_left (int): index of the polygon edge entering the vertex
+        edge_right (int): index of the polygon edge leaving the vertex
+        velocity (tuple(x, y)): None if the edges are anti parallel
+        prev (WavefrontVertex): previous vertex of the wavefront
+        next (WavefrontVertex): next vertex of the wavefront
+        loop (int): index of the wavefront loop the vertex is in, the wavefront splits into more loops over time
+        valid (bool): False once the vertex stopped moving
+    """
+    def __init__(self, point: tuple, time: float, node: int, edge_left: int, edge_right: int, velocity):
+        self.point = point
+        self.time = time
+        self.node = node
+        self.edge_left = edge_left
+        self.edge_right = edge_right
+        self.velocity = velocity
+        self.prev = None
+        self.next = None
+        self.loop = 0
+        self.valid = True
+    # end __init__
+
+    def position(self, time: float) -> tuple:
+        """
+            Calculates the position of the vertex at the given time
+        Args:
+            time: time, not earlier than the time the vertex was created
+        Returns:
+            tuple(x, y)
+        """
+        if self.velocity is None:
+            return self.point
+        # end if
+        dt = time - self.time
+        return self.point[0] + self.velocity[0] * dt, self.point[1] + self.velocity[1] * dt
+    # end position
+# end WavefrontVertex
+
+
+class StraightSkeleton:
+    """
+    Straight skeleton of a simple polygon, computed by an event queue simulation of the shrinking polygon.
+
+    Note:
+        Edge events (an edge of the wavefront shrinks to zero length) and split events (a reflex vertex hits an
+        edge on the opposite side, splitting the wavefront in two) are kept in a heap ordered by time, and each
+        event only updates the wavefront around the vertices it touches, so a polygon with n vertices is processed
+        in O(n log n) plus O(n) split candidates per reflex vertex. Split candidates are pushed one at a time, in
+        order of time, so the heap never holds more than one of them per vertex.
+
+    Attributes:
+        edges (list(tuple(tuple(x, y), tuple(x, y), float))): direction, inward normal and offset of each edge,
+            the line of edge i at time t is dot(normal, p) == offset + t
+        nodes (list(tuple(x, y, t))): skeleton nodes, the first len(edges) nodes are the polygon vertices
+        arcs (list(tuple(int, int, int, int))): skeleton arcs, as two node indices and the indices of the two edges
+            whose faces the arc separates
+    """
+    def __init__(self, points: list):
+        self.edges = list()
+        self.nodes = list()
+        self.arcs = list()
+        self._node_keys = dict()
+        self._heap = list()
+        self._event_count = 0
+        self._edge_vertices = dict()
+        self._split_candidates = dict()
+        self._loop_count = 1
+
+        count = len(points)
+        for i in range(0, count):
+            start = points[i]
+            end = points[(i + 1) % count]
+            length = math.hypot(end[0] - start[0], end[1] - start[1])
+            direction = ((end[0] - start[0]) / length, (end[1] - start[1]) / length)
+            normal = (-direction[1], direction[0])
+            self.edges.append((direction, normal, normal[0] * start[0] + normal[1] * start[1]))
+            self._edge_vertices[i] = set()
+        # end for
+        self._normals = numpy.array([normal for direction, normal, offset in self.edges], dtype=numpy.float64)
+        self._offsets = numpy.array([offset for direction, normal, offset in self.edges], dtype=numpy.float64)
+
+        vertices = list()
+        for i in range(0, count):
+            node = self._add_node(points[i], 0.0)
+            vertices.append(self._new_vertex(points[i], 0.0, node, (i - 1) % count, i))
+        # end for
+        for i in range(0, count):
+            vertices[i].prev = vertices[i - 1]
+            vertices[i].next = vertices[(i + 1) % count]
+        # end for
+        for vertex in vertices:
+            self._schedule_edge(vertex, vertex.next, 0.0)
+            self._schedule_split(vertex, 0.0)
+        # end for
+        self._run()
+    # end __init__
+
+    def faces(self) -> list:
+        """
+            Collects the face of each polygon edge from the skeleton arcs
+        Returns:
+            list(list(int)) - node indices of each face, counter clockwise, starting with the two nodes of its edge.
+            Faces which could not be closed are left out.
+        """
+        count = len(self.edges)
+        adjacency = [dict() for i in range(0, count)]
+        for node_a, node_b, edge_a, edge_b in self.arcs:
+            if node_a == node_b:
+                continue
+            # end if
+            for edge in (edge_a, edge_b):
+                adjacency[edge].setdefault(node_a, set()).add(node_b)
+                adjacency[edge].setdefault(node_b, set()).add(node_a)
+            # end for
+        # end for
+
+        faces = list()
+        for i in range(0, count):
+            start = i
+            face = [start, (i + 1) % count]
+            visited = set(face)
+            prev = start
+            current = face[-1]
+            while True:
+                candidates = [node for node in adjacency[i].get(current, ()) if node != prev]
+                if start in candidates and len(face) > 2:
+                    break
+                # end if
+                candidates = [node for node in candidates if node not in visited]
+                if len(candidates) == 0:
+                    face = None
+                    break
+                # end if
+                prev = current
+                current = candidates[0]
+                face.append(current)
+                visited.add(current)
+            # end while
+            if face is not None:
+                faces.append(face)
+            # end if
+        # end for
+        return faces
+    # end faces
+
+    def _add_node(self, point: tuple, time: float) -> int:
+        key = (round(point[0], NODE_PRECISION), round(point[1], NODE_PRECISION))
+        node = self._node_keys.get(key)
+        if node is None:
+            node = len(self.nodes)
+            self.nodes.append((point[0], point[1], time))
+            self._node_keys[key] = node
+        # end if
+        return node
+    # end _add_node
+
+    def _new_vertex(self, point: tuple, time: float, node: int, edge_left: int, edge_right: int) -> WavefrontVertex:
+        direction_left, normal_left, offset_left = self.edges[edge_left]
+        direction_right, normal_right, offset_right = self.edges[edge_right]
+        cross = direction_left[0] * direction_right[1] - direction_left[1] * direction_right[0]
+        if abs(cross) < PARALLEL_LIMIT:
+            if direction_left[0] * direction_right[0] + direction_left[1] * direction_right[1] > 0:
+                velocity = normal_left
+            else:
+                velocity = None
+            # end if
+        else:
+            # move so that both edges move with unit speed: dot(normal, velocity) == 1 for both normals
+            det = normal_left[0] * normal_right[1] - normal_left[1] * normal_right[0]
+            velocity = ((normal_right[1] - normal_left[1]) / det, (normal_left[0] - normal_right[0]) / det)
+        # end if
+        vertex = WavefrontVertex(point, time, node, edge_left, edge_right, velocity)
+        self._edge_vertices[edge_right].add(vertex)
+        return vertex
+    # end _new_vertex
+
+    def _is_reflex(self, vertex: WavefrontVertex) -> bool:
+        direction_left = self.edges[vertex.edge_left][0]
+        direction_right = self.edges[vertex.edge_right][0]
+        return direction_left[0] * direction_right[1] - direction_left[1] * direction_right[0] < -PARALLEL_LIMIT
+    # end _is_reflex
+
+    def _push(self, time: float, kind: int, vertex: WavefrontVertex, other, point: tuple):
+        self._event_count += 1
+        heapq.heappush(self._heap, (time, kind, self._event_count, vertex, other, point))
+    # end _push
+
+    def _schedule_edge(self, vertex_a: WavefrontVertex, vertex_b: WavefrontVertex, now: float):
+        """
+            Pushes the event of the edge between the two consecutive vertices shrinking to zero length, if it shrinks
+        """
+        if vertex_a.velocity is None or vertex_b.velocity is None:
+            # the overlapping edges cancel out up to the nearer neighbour, which the vertex is merged with right away
+            time = max(vertex_a.time, vertex_b.time, now)
+            merges_a = vertex_a.velocity is None and self._nearer_neighbour(vertex_a, time) is vertex_b
+            merges_b = vertex_b.velocity is None and self._nearer_neighbour(vertex_b, time) is vertex_a
+            if merges_a:
+                point = vertex_b.position(time)
+            elif merges_b:
+                point = vertex_a.position(time)
+            else:
+                return
+            # end if
+            self._push(time, EVENT_EDGE, vertex_a, vertex_b, point)
+            return
+        # end if
+        direction = self.edges[vertex_a.edge_right][0]
+        speed_a = direction[0] * vertex_a.velocity[0] + direction[1] * vertex_a.velocity[1]
+        speed_b = direction[0] * vertex_b.velocity[0] + direction[1] * vertex_b.velocity[1]
+        # positions along the edge, extrapolated to time 0
+        start_a = direction[0] * vertex_a.point[0] + direction[1] * vertex_a.point[1] - speed_a * vertex_a.time
+        start_b = direction[0] * vertex_b.point[0] + direction[1] * vertex_b.point[1] - speed_b * vertex_b.time
+        time = max(vertex_a.time, vertex_b.time, now)
+        if (start_b + speed_b * time) - (start_a + speed_a * time) > EVENT_TOLERANCE:
+            # the edge still has some length, it collapses only if its vertices approach each other
+            if speed_a - speed_b < PARALLEL_LIMIT:
+                return
+            # end if
+            time = max((start_b - start_a) / (speed_a - speed_b), time)
+        # end if
+        position_a = vertex_a.position(time)
+        position_b = vertex_b.position(time)
+        point = (0.5 * (position_a[0] + position_b[0]), 0.5 * (position_a[1] + position_b[1]))
+        self._push(time, EVENT_EDGE, vertex_a, vertex_b, point)
+    # end _schedule_edge
+
+    @staticmethod
+    def _nearer_neighbour(vertex: WavefrontVertex, time: float) -> WavefrontVertex:
+        position_prev = vertex.prev.position(time)
+        position_next = vertex.next.position(time)
+        distance_prev = math.hypot(position_prev[0] - vertex.point[0], position_prev[1] - vertex.point[1])
+        distance_next = math.hypot(position_next[0] - vertex.point[0], position_next[1] - vertex.point[1])
+        return vertex.prev if distance_prev <= distance_next else vertex.next
+    # end _nearer_neighbour
+
+    def _schedule_split(self, vertex: WavefrontVertex, now: float):
+        """
+            Finds all edges a reflex vertex might hit, and pushes the earliest of them
+        """
+        if vertex.velocity is None or not self._is_reflex(vertex):
+            return
+        # end if
+        # all edges are tested at once, this is the only part of the simulation that is not local
+        approach = self._normals.dot(vertex.velocity) - 1.0
+        distance = self._normals.dot(vertex.point) - self._offsets - vertex.time
+        mask = (approach < -PARALLEL_LIMIT) & (distance >= -EVENT_TOLERANCE)
+        mask[vertex.edge_left] = False
+        mask[vertex.edge_right] = False
+        edges = numpy.flatnonzero(mask)
+        times = numpy.maximum(vertex.time - distance[edges] / approach[edges], now)
+        order = numpy.argsort(times)
+        self._split_candidates[vertex] = [times[order].tolist(), edges[order].tolist(), 0]
+        self._schedule_next_split(vertex)
+    # end _schedule_split
+
+    def _schedule_next_split(self, vertex: WavefrontVertex):
+        candidates = self._split_candidates.get(vertex)
+        if candidates is not None and candidates[2] < len(candidates[0]):
+            time = candidates[0][candidates[2]]
+            edge = candidates[1][candidates[2]]
+            candidates[2] += 1
+            self._push(time, EVENT_SPLIT, vertex, edge, vertex.position(time))
+        # end if
+    # end _schedule_next_split
+
+    def _schedule(self, vertex: WavefrontVertex, now: float):
+        self._schedule_edge(vertex.prev, vertex, now)
+        self._schedule_edge(vertex, vertex.next, now)
+        # a vertex created on top of a neighbour is merged with it right away, and never reaches another edge
+        for neighbour in (vertex.prev, vertex.next):
+            position = neighbour.position(now)
+            if math.hypot(position[0] - vertex.point[0], position[1] - vertex.point[1]) <= EVENT_TOLERANCE:
+                return
+            # end if
+        # end for
+        self._schedule_split(vertex, now)
+    # end _schedule
+
+    def _stop(self, vertex: WavefrontVertex, node: int):
+        """
+            Stops the vertex at the given node, adding the arc it travelled along
+        """
+        self.arcs.append((vertex.node, node, vertex.edge_left, vertex.edge_right))
+        vertex.valid = False
+        self._edge_vertices[vertex.edge_right].discard(vertex)
+        self._split_candidates.pop(vertex, None)
+    # end _stop
+
+    def _run(self):
+        while len(self._heap) > 0:
+            time, kind, count, vertex, other, point = heapq.heappop(self._heap)
+            if kind == EVENT_EDGE:
+                if vertex.valid and other.valid and vertex.next is other:
+                    self._handle_edge(vertex, other, time, point)
+                # end if
+            elif vertex.valid:
+                if not self._handle_split(vertex, other, time, point):
+                    self._schedule_next_split(vertex)
+                # end if
+            # end if
+        # end while
+    # end _run
+
+    def _handle_edge(self, vertex_a: WavefrontVertex, vertex_b: WavefrontVertex, time: float, point: tuple):
+        node = self._add_node(point, time)
+        if vertex_a.prev is vertex_b.next:
+            # the last three vertices meet in a single point
+            vertex_c = vertex_b.next
+            for vertex in (vertex_a, vertex_b, vertex_c):
+                self._stop(vertex, node)
+            # end for
+            return
+        # end if
+        vertex = self._new_vertex(point, time, node, vertex_a.edge_left, vertex_b.edge_right)
+        vertex.prev = vertex_a.prev
+        vertex.next = vertex_b.next
+        vertex.loop = vertex_a.loop
+        vertex.prev.next = vertex
+        vertex.next.prev = vertex
+        self._stop(vertex_a, node)
+        self._stop(vertex_b, node)
+        self._schedule(vertex, time)
+    # end _handle_edge
+
+    def _handle_split(self, vertex: WavefrontVertex, edge: int, time: float, point: tuple) -> bool:
+        """
+            Splits the wavefront where the vertex hits the given edge
+        Returns:
+            False if the vertex does not hit the part of the edge still in the wavefront
+        """
+        direction = self.edges[edge][0]
+        along = direction[0] * point[0] + direction[1] * point[1]
+        opposite = None
+        for candidate in self._edge_vertices[edge]:
+            if candidate is vertex or candidate.next is vertex or candidate.loop != vertex.loop:
+                continue
+            # end if
+            position_start = candidate.position(time)
+            position_end = candidate.next.position(time)
+            along_start = direction[0] * position_start[0] + direction[1] * position_start[1]
+            along_end = direction[0] * position_end[0] + direction[1] * position_end[1]
+            if along_start - EVENT_TOLERANCE <= along <= along_end + EVENT_TOLERANCE:
+                opposite = candidate
+                break
+            # end if
+        # end for
+        if opposite is None:
+            return False
+        # end if
+
+        node = self._add_node(point, time)
+        opposite_next = opposite.next
+        vertex_left = self._new_vertex(point, time, node, vertex.edge_left, edge)
+        vertex_right = self._new_vertex(point, time, node, edge, vertex.edge_right)
+        vertex_left.prev = vertex.prev
+        vertex_left.next = opposite_next
+        vertex.prev.next = vertex_left
+        opposite_next.prev = vertex_left
+        vertex_right.prev = opposite
+        vertex_right.next = vertex.next
+        opposite.next = vertex_right
+        vertex.next.prev = vertex_right
+        self._stop(vertex, node)
+        vertex_left.loop = vertex.loop
+        vertex_right.loop = self._loop_count
+        self._loop_count += 1
+        current = vertex_right.next
+        while current is not vertex_right:
+            current.loop = vertex_right.loop
+            current = current.next
+        # end while
+
+        for new_vertex in (vertex_left, vertex_right):
+            if new_vertex.next.next is new_vertex:
+                # the split left only two vertices, which are connected by both of their edges
+                other = new_vertex.next
+                self.arcs.append((new_vertex.node, other.node, new_vertex.edge_left, new_vertex.edge_right))
+                for stopped in (new_vertex, other):
+                    stopped.valid = False
+                    self._edge_vertices[stopped.edge_right].discard(stopped)
+                # end for
+            else:
+                self._schedule(new_vertex, time)
+            # end if
+        # end for
+        return True
+    # end _handle_split
+# end StraightSkeleton
+
+
+def polygon_area(points: list) -> float:
+    """
+        Calculates the signed area of the polygon
+    Args:
+        points: list(tuple(x, y, ...))
+    Returns:
+        area, positive if the polygon is counter clockwise
+    """
+    area = 0.0
+    for i in range(0, len(points)):
+        area += points[i - 1][0] * points[i][1] - points[i][0] * points[i - 1][1]
+    # end for
+    return 0.5 * area
+# end polygon_area
+
+
+def gen_roof(points: list, height: float, use_gables: bool) -> tuple:
+    """
+        Generates a roof with all faces at the same slope over the given polygon, from its straight skeleton
+    Args:
+        points: list(tuple(x, y, ...)) - simple polygon, clockwise or counter clockwise
+        height: height of the highest roof node above the polygon
+        use_gables: if True, hip faces ending in their own single ridge node are turned into vertical gables
+    Returns:
+        tuple(list(tuple(x, y, z)), list(list(int))) - roof vertices and faces, faces point up. The polygon is
+        at z=0.
+    """
+    # drop repeated points, they would create zero length edges
+    polygon = list()
+    for point in points:
+        if len(polygon) == 0 or math.hypot(point[0] - polygon[-1][0], point[1] - polygon[-1][1]) > EVENT_TOLERANCE:
+            polygon.append((point[0], point[1]))
+        # end if
+    # end for
+    if len(polygon) > 1 and math.hypot(polygon[0][0] - polygon[-1][0], polygon[0][1] - polygon[-1][1]) <= \
+            EVENT_TOLERANCE:
+        polygon.pop()
+    # end if
+    if len(polygon) < 3:
+        return list(), list()
+    # end if
+    if polygon_area(polygon) < 0:
+        polygon.reverse()
+    # end if
+
+    skeleton = StraightSkeleton(polygon)
+    faces = skeleton.faces()
+    nodes = [list(node) for node in skeleton.nodes]
+
+    if use_gables:
+        node_faces = dict()
+        for face in faces:
+            for node in face:
+                node_faces[node] = node_faces.get(node, 0) + 1
+            # end for
+        # end for
+        moved = set()
+        for face in faces:
+            apex = face[-1]
+            if len(face) != 3 or node_faces[apex] != 3 or apex in moved:
+                continue
+            # end if
+            # move the ridge node above the edge, its two neighbouring faces are extended to it
+            start = nodes[face[0]]
+            end = nodes[face[1]]
+            direction = (end[0] - start[0], end[1] - start[1])
+            factor = ((nodes[apex][0] - start[0]) * direction[0] + (nodes[apex][1] - start[1]) * direction[1]) / \
+                (direction[0] * direction[0] + direction[1] * direction[1])
+            nodes[apex][0] = start[0] + factor * direction[0]
+            nodes[apex][1] = start[1] + factor * direction[1]
+            moved.add(apex)
+        # end for
+    # end if
+
+    max_time = max(node[2] for node in nodes)
+    slope = height / max_time if max_time > 0 else 0.0
+    verts = [(node[0], node[1], node[2] * slope) for node in nodes]
+    return verts, faces
+# end gen_roof
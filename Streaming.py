@@ -0,0 +1,154 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  Procedural building generator
+#  Copyright (C) 2019 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import os
+import numpy
+from . import Utils
+
+
+# Sinks receive the chunks of a building generated floor by floor (see Generator.gen_building_streamed).
+# emit is called with each chunk object, not linked to the scene, close once the building is finished.
+
+
+class SceneSink:
+    """
+    Keeps the chunks of a streamed building in the scene.
+
+    Note:
+        Chunks are linked to the scene and to the building group as they arrive, so the building is complete in the
+        scene once generation ends, like a building generated by Generator.gen_building.
+
+    Attributes:
+        context (bpy.types.Context): context whose scene receives the chunks.
+        group (bpy.types.Group): group of the building, the chunks are added to it.
+    """
+
+    def __init__(self, context: bpy.types.Context, group):
+        self.context = context
+        self.group = group
+    # end __init__
+
+    def emit(self, obj: bpy.types.Object):
+        """
+            Links the chunk object to the scene and the building group
+        Args:
+            obj: chunk object
+        """
+        self.context.scene.objects.link(obj)
+        self.group.objects.link(obj)
+    # end emit
+
+    def close(self):
+        pass
+    # end close
+# end SceneSink
+
+
+class ObjFileSink:
+    """
+    Writes the chunks of a streamed building to a wavefront obj file.
+
+    Note:
+        Each chunk is appended to the file and deleted as soon as it arrives, so only a single floor exists in
+        blender at a time. The materials of the chunks are collected and written to a mtl file next to the obj file
+        by close.
+
+    Attributes:
+        file (file): the obj file, open for writing until close.
+        mtl_path (str): path of the mtl file, referenced by the obj file.
+        vert_count (int): number of vertices written so far, obj indices are global to the file.
+        uv_count (int): number of uvs written so far.
+        materials (dict): material name to (diffuse color, alpha), of all materials used by the chunks.
+    """
+
+    def __init__(self, path: str):
+        self.mtl_path = os.path.splitext(path)[0] + ".mtl"
+        self.file = open(path, "w")
+        self.file.write("# procedural building generator, streamed floor by floor\n")
+        self.file.write("mtllib " + os.path.basename(self.mtl_path) + "\n")
+        self.vert_count = 0
+        self.uv_count = 0
+        self.materials = dict()
+    # end __init__
+
+    def emit(self, obj: bpy.types.Object):
+        """
+            Appends the chunk to the wavefront obj file, and deletes the chunk object and its mesh
+        Note:
+            Coordinates are converted to Y up, -Z forward, the same as blender's obj exporter does by default.
+        Args:
+            obj: chunk object
+        """
+        m = obj.data
+        name = obj.name
+        arrays = Utils.mesh_to_arrays(m)
+        materials = [material.name for material in m.materials]
+        for material in m.materials:
+            self.materials[material.name] = (tuple(c * material.diffuse_intensity for c in material.diffuse_color),
+                                             material.alpha)
+        # end for
+        bpy.data.objects.remove(obj)
+        bpy.data.meshes.remove(m)
+
+        co = numpy.frombuffer(arrays.co, dtype=numpy.float32).reshape((-1, 3))
+        uvs = numpy.frombuffer(arrays.uvs, dtype=numpy.float32).reshape((-1, 2))
+        write = self.file.write
+        write("o " + name + "\n")
+        for x, y, z in co.tolist():
+            write("v %.6f %.6f %.6f\n" % (x, z, -y))
+        # end for
+        for u, v in uvs.tolist():
+            write("vt %.6f %.6f\n" % (u, v))
+        # end for
+        loop_verts = (numpy.frombuffer(arrays.loop_verts, dtype=numpy.int32) + self.vert_count + 1).tolist()
+        material_current = None
+        for start, total, material in zip(arrays.loop_starts, arrays.loop_totals, arrays.material_indices):
+            if material != material_current and material < len(materials):
+                write("usemtl " + materials[material] + "\n")
+                material_current = material
+            # end if
+            if len(uvs) > 0:
+                corners = ["%d/%d" % (loop_verts[i], self.uv_count + i + 1) for i in range(start, start + total)]
+            else:
+                corners = [str(loop_verts[i]) for i in range(start, start + total)]
+            # end if
+            write("f " + " ".join(corners) + "\n")
+        # end for
+        self.vert_count += len(co)
+        self.uv_count += len(uvs)
+    # end emit
+
+    def close(self):
+        """
+            Finishes the obj file and writes the materials it uses to the mtl file next to it
+        """
+        self.file.close()
+        with open(self.mtl_path, "w") as f:
+            f.write("# procedural building generator\n")
+            for name in sorted(self.materials.keys()):
+                diffuse, alpha = self.materials[name]
+                f.write("\nnewmtl " + name + "\n")
+                f.write("Kd %.6f %.6f %.6f\n" % diffuse)
+                f.write("d %.6f\n" % alpha)
+            # end for
+        # end with
+    # end close
+# end ObjFileSink
@@ -19,7 +19,9 @@
 # ##### END GPL LICENSE BLOCK #####
 
 from bpy.types import Panel, PropertyGroup
-from bpy.props import FloatProperty, BoolProperty, EnumProperty, IntProperty
+from bpy.props import FloatProperty, BoolProperty, EnumProperty, IntProperty, StringProperty
+from . import Statistics
+from . import Profiling
 
 
 class PBGPropertyGroup(PropertyGroup):
@@ -95,6 +97,12 @@ class PBGPropertyGroup(PropertyGroup):
         default=True
     )
 
+    use_symmetry = BoolProperty(
+        name="Use symmetry",
+        description="Generate only one half of a mirror symmetric building, and mirror it",
+        default=True
+    )
+
     distance_window_pillar = FloatProperty(
         name="Distance Window to Pillar",
         default=0.8
@@ -390,6 +398,17 @@ class PBGPropertyGroup(PropertyGroup):
         default=False
     )
 
+    roof_types = [
+        ("RIDGE", "RIDGE", "", 0),
+        ("HIP", "HIP", "", 1),
+        ("GABLE", "GABLE", "", 2)
+    ]
+
+    roof_type = EnumProperty(
+        items=roof_types,
+        default="RIDGE"
+    )
+
     roof_offset_width = FloatProperty(
         name="roof offset width",
         default=4.0
@@ -415,6 +434,35 @@ class PBGPropertyGroup(PropertyGroup):
         default=2.5
     )
 
+    door_count = IntProperty(
+        name="Door count front",
+        default=1,
+        min=0
+    )
+
+    door_count_back = IntProperty(
+        name="Door count back",
+        default=0,
+        min=0
+    )
+
+    door_count_left = IntProperty(
+        name="Door count left",
+        default=0,
+        min=0
+    )
+
+    door_count_right = IntProperty(
+        name="Door count right",
+        default=0,
+        min=0
+    )
+
+    distance_door_door = FloatProperty(
+        name="Distance between doors",
+        default=3.0
+    )
+
     door_around_section_height = FloatProperty(
         name="Door around section height",
         default=0.2
@@ -465,6 +513,174 @@ class PBGPropertyGroup(PropertyGroup):
         default=0.05
     )
 
+    uv_projections = [
+        ("PLANAR", "PLANAR", "", 0),
+        ("BOX", "BOX", "", 1)
+    ]
+
+    uv_projection = EnumProperty(
+        items=uv_projections,
+        default="PLANAR"
+    )
+
+    uv_scale = FloatProperty(
+        name="UV units per meter",
+        default=1.0,
+        min=0.0
+    )
+
+    seed = IntProperty(
+        name="Seed",
+        default=0,
+        min=0
+    )
+
+    use_instancing = BoolProperty(
+        name="Use instancing",
+        description="Generate each distinct building once, and place buildings with the same parameters and seed "
+                    "as instances of it",
+        default=False
+    )
+
+    use_deferred = BoolProperty(
+        name="Placeholders only",
+        description="Generate boxes in place of windows, doors and pillars, detailed components are generated "
+                    "later by Realize",
+        default=False
+    )
+
+    realize_distance = FloatProperty(
+        name="Realize distance",
+        description="Buildings with an object closer than this to the scene camera are realized by Near camera",
+        default=100.0,
+        min=0.0
+    )
+
+    use_streaming = BoolProperty(
+        name="Generate floor by floor",
+        description="Generate each floor and the roof as a separate object, keeping only one floor in memory at a "
+                    "time, for very tall buildings",
+        default=False
+    )
+
+    use_memory_profile = BoolProperty(
+        name="Profile memory",
+        description="Trace python allocations and count blender datablocks during generation, print the growth of "
+                    "each component and the leaked datablocks to the console",
+        default=False
+    )
+
+    cache_enable = BoolProperty(
+        name="Use geometry cache",
+        default=False
+    )
+
+    cache_directory = StringProperty(
+        name="Cache directory",
+        default="",
+        subtype="DIR_PATH"
+    )
+
+    cache_size = IntProperty(
+        name="Max cache size (MB)",
+        default=512,
+        min=1
+    )
+
+    output_merge_coplanar = BoolProperty(
+        name="Merge coplanar faces",
+        description="Merge neighbouring faces lying in the same plane, keeping material and uv seams",
+        default=False
+    )
+
+    output_triangulate = BoolProperty(
+        name="Triangulate",
+        description="Output triangles, ordered for vertex cache efficiency",
+        default=False
+    )
+
+    output_cache_size = IntProperty(
+        name="Vertex cache size",
+        description="Size of the post-transform vertex cache to optimize for",
+        default=32,
+        min=4
+    )
+
+    sampler_spec = StringProperty(
+        name="Distributions",
+        description="Json file with the distribution of each sampled parameter, the bundled sampler_spec.json if "
+                    "empty",
+        default="",
+        subtype="FILE_PATH"
+    )
+
+    sampler_count = IntProperty(
+        name="Sample count",
+        default=16,
+        min=1
+    )
+
+    sampler_seed = IntProperty(
+        name="Sampler seed",
+        default=0,
+        min=0
+    )
+
+    sampler_worker_count = IntProperty(
+        name="Worker processes",
+        description="Number of background blender processes generating the samples, 0 generates them in this one",
+        default=2,
+        min=0
+    )
+
+    sampler_output = StringProperty(
+        name="Result table",
+        description="Csv file where to write the result table, it is only printed to the console if empty",
+        default="",
+        subtype="FILE_PATH"
+    )
+
+    sampler_use_grid = BoolProperty(
+        name="Lay out in grid",
+        description="Place the sampled buildings in a grid, starting at the 3D cursor",
+        default=False
+    )
+
+    sampler_grid_spacing = FloatProperty(
+        name="Grid spacing",
+        default=50.0,
+        min=0.0
+    )
+
+    batch_manifest = StringProperty(
+        name="Manifest",
+        description="Json lines file with one building per line, a dict with keys name and properties",
+        default="",
+        subtype="FILE_PATH"
+    )
+
+    batch_results = StringProperty(
+        name="Results",
+        description="Json lines file where the status and timing of each building is appended, finished buildings "
+                    "are skipped when the batch is run again. Next to the manifest if empty",
+        default="",
+        subtype="FILE_PATH"
+    )
+
+    batch_output = StringProperty(
+        name="Output directory",
+        description="Directory where to write the usda file of each building, the manifest directory if empty",
+        default="",
+        subtype="DIR_PATH"
+    )
+
+    batch_worker_count = IntProperty(
+        name="Worker processes",
+        description="Number of background blender processes generating the buildings, 0 generates them in this one",
+        default=2,
+        min=0
+    )
+
 # end PBGPropertyGroup
 
 
@@ -514,6 +730,7 @@ class PBGToolbarLayoutPanel(Panel):
         col = layout.column(align=True)
         col.prop(properties, "distance_window_window")
         col.prop(properties, "distance_window_pillar")
+        col.prop(properties, "use_symmetry")
     # end draw
 # end PBGLayoutPanel
 
@@ -703,6 +920,7 @@ class PBGToolbarRoofPanel(Panel):
 
         col = layout.column(align=True)
         col.label(text="Roof settings")
+        col.prop(properties, "roof_type")
         col.prop(properties, "roof_offset_width")
         col.prop(properties, "roof_offset_wedge")
         col.prop(properties, "roof_height")
@@ -725,6 +943,11 @@ class PBGToolbarDoorPanel(Panel):
         col.label(text="Door settings")
         col.prop(properties, "door_width")
         col.prop(properties, "door_height")
+        col.prop(properties, "door_count")
+        col.prop(properties, "door_count_back")
+        col.prop(properties, "door_count_left")
+        col.prop(properties, "door_count_right")
+        col.prop(properties, "distance_door_door")
         col.label(text="Around Door")
         col.prop(properties, "door_around_section_height")
         col.prop(properties, "door_around_section_width")
@@ -741,6 +964,25 @@ class PBGToolbarDoorPanel(Panel):
 # end PBGToolbarDoorPanel
 
 
+class PBGToolbarUVPanel(Panel):
+    bl_label = "UV Settings"
+    bl_category = "PBG"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "TOOLS"
+    bl_context = "objectmode"
+
+    def draw(self, context):
+        layout = self.layout
+        properties = context.scene.PBGPropertyGroup
+
+        col = layout.column(align=True)
+        col.label(text="UV projection")
+        col.prop(properties, "uv_projection")
+        col.prop(properties, "uv_scale")
+    # end draw
+# end PBGToolbarUVPanel
+
+
 class PBGToolbarGeneratePanel(Panel):
     # TODO: docstring
     bl_label = "Generate"
@@ -751,7 +993,194 @@ class PBGToolbarGeneratePanel(Panel):
 
     def draw(self, context):
         layout = self.layout
+        properties = context.scene.PBGPropertyGroup
+
+        col = layout.column(align=True)
+        col.prop(properties, "seed")
+        col.prop(properties, "use_instancing")
+        col.prop(properties, "use_streaming")
+        col.prop(properties, "use_deferred")
         row = layout.row(align=True)
         row.operator("pbg.generate_building", text="Generate")
+        row.operator("pbg.generate_building", text="New").new_building = True
+        row = layout.row(align=True)
+        row.operator("pbg.load_building", text="Load")
+        row.operator("pbg.undo_generate", text="Undo")
+        layout.operator("pbg.export_streamed", text="Export OBJ floor by floor")
+        row = layout.row(align=True)
+        row.operator("pbg.export_usd", text="Export USD")
+        row.operator("pbg.export_usd", text="Export USD selected").selected_only = True
+
+        col = layout.column(align=True)
+        col.label(text="Realize placeholders:")
+        row = col.row(align=True)
+        row.operator("pbg.realize_buildings", text="Active").scope = "ACTIVE"
+        row.operator("pbg.realize_buildings", text="Selected").scope = "SELECTED"
+        row.operator("pbg.realize_buildings", text="Near camera").scope = "CAMERA"
+        col.prop(properties, "realize_distance")
     # end draw
 # end PBGGeneratePanel
+
+
+class PBGToolbarStatisticsPanel(Panel):
+    bl_label = "Statistics"
+    bl_category = "PBG"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "TOOLS"
+    bl_context = "objectmode"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(context.scene.PBGPropertyGroup, "use_memory_profile")
+        run = Statistics.last_run
+        if run is None:
+            layout.label(text="Generate a building to see its statistics")
+            return
+        # end if
+
+        col = layout.column(align=True)
+        col.label(text="Time: {:.3f} s".format(run["time"]))
+        col.label(text="Verts: {}, faces: {}".format(run["verts"], run["faces"]))
+        col.label(text="Objects: {}".format(run["instances"]))
+        col.label(text="Cache hits: {}, misses: {}".format(run["hits"], run["misses"]))
+        col.label(text="Orphaned datablocks: {}".format(run["orphans"]))
+
+        col = layout.box().column(align=True)
+        for component in run["components"]:
+            col.label(text="{}: {:.0f} ms, {} faces, x{}, cache {}".format(
+                component["name"], 1000.0 * component["time"], component["faces"], component["instances"],
+                component["cache"]))
+            output = component["output"]
+            if "faces_after" in output:
+                col.label(text="    output faces: {} -> {}".format(output["faces_before"], output["faces_after"]))
+            # end if
+            if "acmr_after" in output:
+                col.label(text="    ACMR: {:.3f} -> {:.3f}".format(output["acmr_before"], output["acmr_after"]))
+            # end if
+        # end for
+
+        report = Profiling.last_report
+        if report is not None:
+            col = layout.column(align=True)
+            col.label(text="Python memory: {:+.1f} KiB, peak {:.1f} KiB".format(report["python"] / 1024.0,
+                                                                              report["peak"] / 1024.0))
+            col.label(text="Meshes: {:+}, objects: {:+}, verts: {:+}".format(
+                report["growth"]["meshes"], report["growth"]["objects"], report["growth"]["verts"]))
+            col.label(text="Leaked datablocks: {}".format(len(report["leaked"])))
+        # end if
+
+        col = layout.column(align=True)
+        col.label(text="History:")
+        for entry in Statistics.history:
+            col.label(text="{}: {:.3f} s, {} faces, {} objects".format(entry["label"], entry["time"], entry["faces"],
+                                                                       entry["instances"]))
+        # end for
+        layout.operator("pbg.clear_statistics", text="Clear")
+    # end draw
+# end PBGToolbarStatisticsPanel
+
+
+class PBGToolbarCachePanel(Panel):
+    bl_label = "Cache Settings"
+    bl_category = "PBG"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "TOOLS"
+    bl_context = "objectmode"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context):
+        layout = self.layout
+        properties = context.scene.PBGPropertyGroup
+
+        col = layout.column(align=True)
+        col.prop(properties, "cache_enable")
+        col.prop(properties, "cache_directory")
+        col.prop(properties, "cache_size")
+    # end draw
+# end PBGToolbarCachePanel
+
+
+class PBGToolbarOutputPanel(Panel):
+    bl_label = "Output Settings"
+    bl_category = "PBG"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "TOOLS"
+    bl_context = "objectmode"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context):
+        layout = self.layout
+        properties = context.scene.PBGPropertyGroup
+
+        col = layout.column(align=True)
+        col.prop(properties, "output_merge_coplanar")
+        col.prop(properties, "output_triangulate")
+        col.prop(properties, "output_cache_size")
+    # end draw
+# end PBGToolbarOutputPanel
+
+
+class PBGToolbarFingerprintPanel(Panel):
+    bl_label = "Fingerprints"
+    bl_category = "PBG"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "TOOLS"
+    bl_context = "objectmode"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context):
+        layout = self.layout
+
+        row = layout.row(align=True)
+        row.operator("pbg.check_fingerprints", text="Check")
+        row.operator("pbg.check_fingerprints", text="Record").record = True
+    # end draw
+# end PBGToolbarFingerprintPanel
+
+
+class PBGToolbarSamplerPanel(Panel):
+    bl_label = "Sampler"
+    bl_category = "PBG"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "TOOLS"
+    bl_context = "objectmode"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context):
+        layout = self.layout
+        properties = context.scene.PBGPropertyGroup
+
+        col = layout.column(align=True)
+        col.prop(properties, "sampler_spec")
+        col.prop(properties, "sampler_count")
+        col.prop(properties, "sampler_seed")
+        col.prop(properties, "sampler_worker_count")
+        col.prop(properties, "sampler_output")
+        col.prop(properties, "sampler_use_grid")
+        col.prop(properties, "sampler_grid_spacing")
+        layout.operator("pbg.sample_designs", text="Sample")
+    # end draw
+# end PBGToolbarSamplerPanel
+
+
+class PBGToolbarBatchPanel(Panel):
+    bl_label = "Batch"
+    bl_category = "PBG"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "TOOLS"
+    bl_context = "objectmode"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context):
+        layout = self.layout
+        properties = context.scene.PBGPropertyGroup
+
+        col = layout.column(align=True)
+        col.prop(properties, "batch_manifest")
+        col.prop(properties, "batch_results")
+        col.prop(properties, "batch_output")
+        col.prop(properties, "batch_worker_count")
+        layout.operator("pbg.run_batch", text="Run")
+    # end draw
+# end PBGToolbarBatchPanel
@@ -0,0 +1,445 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  Procedural building generator
+#  Copyright (C) 2019 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import re
+import numpy
+from . import Generator
+from . import Fingerprint
+from . import Utils
+
+# name of the root prim, holding all exported buildings
+USD_ROOT = "Buildings"
+# name of the root prim holding the materials
+USD_MATERIALS = "Materials"
+# characters which are not allowed in prim names
+USD_INVALID = re.compile(r"[^A-Za-z0-9_]")
+
+
+def prim_name(name: str, taken: set) -> str:
+    """
+        Turns the given name into a valid prim name, unique among the given names
+    Args:
+        name: blender name
+        taken: set(str) - names already used by the siblings of the prim, the result is added to it
+    Returns:
+        prim name
+    """
+    base = USD_INVALID.sub("_", name)
+    if base == "" or base[0].isdigit():
+        base = "_" + base
+    # end if
+    result = base
+    i = 1
+    while result in taken:
+        result = base + "_" + str(i)
+        i += 1
+    # end while
+    taken.add(result)
+    return result
+# end prim_name
+
+
+def component_name(obj: bpy.types.Object, prefix: str) -> str:
+    """
+        Finds the name of the component the object belongs to, without the building prefix and the number blender
+        appends to duplicates
+    Args:
+        obj: bpy.types.Object
+        prefix: prefix of the object names of the building
+    Returns:
+        component name
+    """
+    name = obj.name[len(prefix):] if obj.name.startswith(prefix) else obj.name
+    return Fingerprint.NAME_SUFFIX.sub("", name)
+# end component_name
+
+
+def format_tuples(values, size: int) -> str:
+    """
+        Formats a flat sequence of floats as an usda array of tuples
+    Args:
+        values: flat sequence of floats
+        size: number of items in each tuple
+    Returns:
+        str, usda array
+    """
+    values = numpy.asarray(values, dtype=numpy.float64).reshape((-1, size))
+    item = "(" + ", ".join(["%.6f"] * size) + ")"
+    return "[" + ", ".join(item % tuple(row) for row in values.tolist()) + "]"
+# end format_tuples
+
+
+def format_ints(values) -> str:
+    """
+        Formats a sequence of ints as an usda array
+    Args:
+        values: sequence of ints
+    Returns:
+        str, usda array
+    """
+    return "[" + ", ".join(str(value) for value in values) + "]"
+# end format_ints
+
+
+def format_matrix(matrix) -> str:
+    """
+        Formats a blender matrix as an usda matrix4d
+    Note:
+        USD uses row vectors, the translation is in the last row, so the matrix is transposed.
+    Args:
+        matrix: mathutils.Matrix, 4x4
+    Returns:
+        str, usda matrix4d value
+    """
+    return "(" + ", ".join("(" + ", ".join("%.6f" % matrix[row][column] for row in range(0, 4)) + ")"
+                           for column in range(0, 4)) + ")"
+# end format_matrix
+
+
+class UsdWriter:
+    """
+    Writes buildings into a plain text usda file, prim by prim.
+
+    Note:
+        Prims are written as soon as they are started, so the writer keeps only the current nesting depth, the
+        materials and the building types the buildings use. Those are written once by close, at the end of the
+        file, the buildings refer to them by path.
+
+    Attributes:
+        file (file): the usda file, open for writing until close.
+        depth (int): nesting depth of the current prim, used for indentation.
+        materials (dict): blender material name to the name of its prim under USD_MATERIALS.
+        type_prims (dict): building type group to the path of its class prim.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "w")
+        self.depth = 0
+        self.materials = dict()
+        self.type_prims = dict()
+        self.file.write("#usda 1.0\n(\n    defaultPrim = \"" + USD_ROOT + "\"\n    metersPerUnit = 1\n"
+                        "    upAxis = \"Z\"\n)\n\n")
+    # end __init__
+
+    def line(self, text: str):
+        self.file.write("    " * self.depth + text + "\n")
+    # end line
+
+    def begin(self, text: str, metadata: list=None):
+        """
+            Starts a prim
+        Args:
+            text: specifier, type and name, for example def Xform "name"
+            metadata: list(str) - metadata lines of the prim, None for no metadata
+        """
+        self.line(text)
+        if metadata is not None:
+            self.line("(")
+            for item in metadata:
+                self.line("    " + item)
+            # end for
+            self.line(")")
+        # end if
+        self.line("{")
+        self.depth += 1
+    # end begin
+
+    def end(self):
+        self.depth -= 1
+        self.line("}")
+    # end end
+
+    def material_path(self, material: bpy.types.Material) -> str:
+        """
+            Finds the prim of the given material, adding it to the materials written by close
+        Args:
+            material: bpy.types.Material
+        Returns:
+            path of the material prim
+        """
+        if material.name not in self.materials:
+            name = prim_name(material.name, set(self.materials.values()))
+            self.materials[material.name] = name
+        # end if
+        return "/" + USD_MATERIALS + "/" + self.materials[material.name]
+    # end material_path
+
+    def write_mesh(self, name: str, m: bpy.types.Mesh, matrix=None):
+        """
+            Writes the given mesh as a Mesh prim, with a GeomSubset bound to each used material
+        Args:
+            name: prim name
+            m: bpy.types.Mesh
+            matrix: mathutils.Matrix, transform of the prim, None to keep it at the origin of its parent
+        """
+        arrays = Utils.mesh_to_arrays(m)
+        co = numpy.frombuffer(arrays.co, dtype=numpy.float32).reshape((-1, 3))
+        loop_starts = numpy.frombuffer(arrays.loop_starts, dtype=numpy.int32)
+        loop_totals = numpy.frombuffer(arrays.loop_totals, dtype=numpy.int32)
+        # loop indices of each face, in face order, usually the loops are already in this order
+        face_offsets = numpy.cumsum(loop_totals) - loop_totals
+        loops = numpy.repeat(loop_starts - face_offsets, loop_totals) + numpy.arange(int(loop_totals.sum()))
+        loop_verts = numpy.frombuffer(arrays.loop_verts, dtype=numpy.int32)[loops]
+
+        self.begin("def Mesh \"" + name + "\"", ["prepend apiSchemas = [\"MaterialBindingAPI\"]"])
+        if matrix is not None:
+            self.line("matrix4d xformOp:transform = " + format_matrix(matrix))
+            self.line("uniform token[] xformOpOrder = [\"xformOp:transform\"]")
+        # end if
+        if len(co) > 0:
+            self.line("float3[] extent = " + format_tuples(numpy.concatenate((co.min(axis=0), co.max(axis=0))), 3))
+        # end if
+        self.line("int[] faceVertexCounts = " + format_ints(loop_totals.tolist()))
+        self.line("int[] faceVertexIndices = " + format_ints(loop_verts.tolist()))
+        self.line("point3f[] points = " + format_tuples(co, 3))
+        if len(arrays.uvs) > 0:
+            uvs = numpy.frombuffer(arrays.uvs, dtype=numpy.float32).reshape((-1, 2))[loops]
+            self.line("texCoord2f[] primvars:st = " + format_tuples(uvs, 2) + " (")
+            self.line("    interpolation = \"faceVarying\"")
+            self.line(")")
+        # end if
+        self.line("uniform token subdivisionScheme = \"none\"")
+
+        material_indices = numpy.frombuffer(arrays.material_indices, dtype=numpy.int32)
+        materials = [material for material in m.materials if material is not None]
+        if len(materials) == 1:
+            self.line("rel material:binding = <" + self.material_path(materials[0]) + ">")
+        elif len(materials) > 1:
+            taken = set()
+            for index, material in enumerate(m.materials):
+                faces = numpy.nonzero(material_indices == index)[0]
+                if material is None or len(faces) == 0:
+                    continue
+                # end if
+                self.begin("def GeomSubset \"" + prim_name(material.name, taken) + "\"",
+                           ["prepend apiSchemas = [\"MaterialBindingAPI\"]"])
+                self.line("uniform token elementType = \"face\"")
+                self.line("uniform token familyName = \"materialBind\"")
+                self.line("int[] indices = " + format_ints(faces.tolist()))
+                self.line("rel material:binding = <" + self.material_path(material) + ">")
+                self.end()
+            # end for
+        # end if
+        self.end()
+    # end write_mesh
+
+    def write_instancer(self, name: str, path: str, m: bpy.types.Mesh, objects: list):
+        """
+            Writes a PointInstancer placing a single prototype, the given mesh, at the transforms of the given objects
+        Args:
+            name: prim name
+            path: path of the PointInstancer prim
+            m: bpy.types.Mesh, mesh of the objects
+            objects: list(bpy.types.Object) - linked duplicates of a component
+        """
+        positions = list()
+        orientations = list()
+        scales = list()
+        for obj in objects:
+            location, rotation, scale = obj.matrix_basis.decompose()
+            positions.extend(location)
+            orientations.extend(rotation)
+            scales.extend(scale)
+        # end for
+        self.begin("def PointInstancer \"" + name + "\"")
+        self.line("rel prototypes = [<" + path + "/Prototype>]")
+        self.line("int[] protoIndices = " + format_ints([0] * len(objects)))
+        self.line("point3f[] positions = " + format_tuples(positions, 3))
+        # mathutils quaternions are w, x, y, z, the same order as usda quaternion values
+        self.line("quath[] orientations = " + format_tuples(orientations, 4))
+        self.line("float3[] scales = " + format_tuples(scales, 3))
+        # the prototype is only shown through the instancer
+        self.write_mesh("Prototype", m)
+        self.end()
+    # end write_instancer
+
+    def write_objects(self, path: str, objects: list, prefix: str):
+        """
+            Writes the children of a building prim: one Mesh prim for each unique component and one PointInstancer
+            for each component placed as linked duplicates
+        Args:
+            path: path of the building prim
+            objects: list(bpy.types.Object) - objects of the building
+            prefix: prefix of the object names, removed from the prim names
+        """
+        taken = set()
+        meshes = list()
+        users = dict()
+        for obj in objects:
+            if obj.type != "MESH":
+                continue
+            # end if
+            if obj.data not in users:
+                meshes.append(obj.data)
+                users[obj.data] = list()
+            # end if
+            users[obj.data].append(obj)
+        # end for
+        for m in meshes:
+            # hidden objects are the sources of linked duplicates, placed by apply_positions
+            placed = [obj for obj in users[m] if not obj.hide]
+            if len(placed) == 0:
+                continue
+            # end if
+            name = prim_name(component_name(placed[0], prefix), taken)
+            if len(users[m]) > 1:
+                self.write_instancer(name, path + "/" + name, m, placed)
+            else:
+                self.write_mesh(name, m, placed[0].matrix_basis)
+            # end if
+        # end for
+        for obj in objects:
+            if obj.dupli_type == "GROUP" and obj.dupli_group is not None:
+                # instanced buildings reference their building type, which is written only once
+                self.begin("def Xform \"" + prim_name(component_name(obj, prefix), taken) + "\"",
+                           ["instanceable = true", "prepend references = <" + self.type_path(obj.dupli_group) + ">"])
+                self.line("matrix4d xformOp:transform = " + format_matrix(obj.matrix_basis))
+                self.line("uniform token[] xformOpOrder = [\"xformOp:transform\"]")
+                self.end()
+            # end if
+        # end for
+    # end write_objects
+
+    def type_path(self, type_group) -> str:
+        """
+            Finds the prim of the given building type, it is written as a class prim by close
+        Args:
+            type_group: group of the building type, see Generator.instance_building
+        Returns:
+            path of the building type prim
+        """
+        if type_group not in self.type_prims:
+            self.type_prims[type_group] = "/" + prim_name(type_group.name, set(self.type_prims.values()))
+        # end if
+        return self.type_prims[type_group]
+    # end type_path
+
+    def write_building(self, group, taken: set):
+        """
+            Writes the building as a child prim of the root prim
+        Args:
+            group: group of the building
+            taken: set(str) - names of the buildings already written
+        """
+        name = prim_name(group.name, taken)
+        self.begin("def Xform \"" + name + "\"")
+        root = Generator.building_root(group)
+        if root is not None and root.dupli_type != "GROUP":
+            # the other objects are parented to the root, their transforms are relative to it
+            self.line("matrix4d xformOp:transform = " + format_matrix(root.matrix_world))
+            self.line("uniform token[] xformOpOrder = [\"xformOp:transform\"]")
+        # end if
+        self.write_objects("/" + USD_ROOT + "/" + name, list(group.objects), group.name + ".")
+        self.end()
+    # end write_building
+
+    def close(self):
+        """
+            Writes the building types and materials used by the buildings, and closes the file
+        """
+        for type_group, path in list(self.type_prims.items()):
+            # class prims are not shown, only their instances are
+            self.begin("class Xform \"" + path[1:] + "\"")
+            self.write_objects(path, list(type_group.objects), type_group.name + ".")
+            self.end()
+        # end for
+        self.begin("def Scope \"" + USD_MATERIALS + "\"")
+        for material_name in sorted(self.materials.keys()):
+            material = bpy.data.materials[material_name]
+            self.begin("def Material \"" + self.materials[material_name] + "\"")
+            self.line("color3f inputs:diffuseColor = (%.6f, %.6f, %.6f)" % tuple(material.diffuse_color))
+            self.end()
+        # end for
+        self.end()
+        self.file.close()
+    # end close
+# end UsdWriter
+
+
+def export_buildings(path: str, buildings: list):
+    """
+        Writes the given buildings into an usda file, one Xform prim for each building
+    Args:
+        path: path of the usda file
+        buildings: list of building groups
+    """
+    writer = UsdWriter(path)
+    try:
+        writer.begin("def Xform \"" + USD_ROOT + "\"")
+        taken = set()
+        for group in buildings:
+            writer.write_building(group, taken)
+        # end for
+        writer.end()
+    finally:
+        writer.close()
+    # end try
+# end export_buildings
+
+
+class ExportUsd(bpy.types.Operator):
+    # TODO: docstring
+
+    bl_idname = "pbg.export_usd"
+    bl_label = "Export USD"
+    bl_options = {"REGISTER"}
+
+    filepath = bpy.props.StringProperty(
+        name="File path",
+        description="USD ascii file where to write the buildings",
+        default="",
+        subtype="FILE_PATH"
+    )
+
+    filter_glob = bpy.props.StringProperty(
+        default="*.usda",
+        options={"HIDDEN"}
+    )
+
+    selected_only = bpy.props.BoolProperty(
+        name="Selected only",
+        description="Export only the buildings of the selected objects, instead of all buildings in the scene",
+        default=False
+    )
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {"RUNNING_MODAL"}
+    # end invoke
+
+    def execute(self, context):
+        objects = context.selected_objects if self.selected_only else context.scene.objects
+        buildings = list()
+        for obj in objects:
+            group = Generator.building_of(obj)
+            if group is not None and group not in buildings:
+                buildings.append(group)
+            # end if
+        # end for
+        if len(buildings) == 0:
+            self.report({"WARNING"}, "No buildings found")
+            return {"CANCELLED"}
+        # end if
+        export_buildings(bpy.path.ensure_ext(self.filepath, ".usda"), buildings)
+        self.report({"INFO"}, str(len(buildings)) + " buildings exported")
+        return {"FINISHED"}
+    # end execute
+# end ExportUsd
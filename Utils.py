@@ -21,9 +21,40 @@
 import mathutils
 import bmesh
 import math
+import array
+import numpy
 import bpy
 
 
+class MeshArrays:
+    """
+    Flat array representation of a mesh.
+
+    Note:
+        All attributes are array.array instances (or any buffer with the same item format), laid out the same way
+        as the matching foreach_get/foreach_set attributes of bpy.types.Mesh.
+
+    Attributes:
+        co (array of float): vertex coordinates, 3 items per vertex.
+        edges (array of int): edge vertex indices, 2 items per edge.
+        loop_starts (array of int): index of the first loop of each polygon.
+        loop_totals (array of int): number of loops of each polygon.
+        loop_verts (array of int): vertex index of each loop.
+        material_indices (array of int): material index of each polygon.
+        uvs (array of float): uv coordinates, 2 items per loop. Empty if the mesh has no uv layer.
+    """
+    def __init__(self, co, edges, loop_starts, loop_totals, loop_verts, material_indices, uvs):
+        self.co = co
+        self.edges = edges
+        self.loop_starts = loop_starts
+        self.loop_totals = loop_totals
+        self.loop_verts = loop_verts
+        self.material_indices = material_indices
+        self.uvs = uvs
+    # end __init__
+# end MeshArrays
+
+
 def vec_from_verts(vert_start, vert_end):
     """
     Generates a vector from given two points
@@ -42,30 +73,147 @@ def vec_from_verts(vert_start, vert_end):
 # end vec_from_verts
 
 
-def vert_check_intersect(vert, range_start, range_end) -> bool:
+def section_chains(co, edges) -> list:
     """
-    Checks whether a giver vert is located in a rectangle given by two other verts
-    Checks in the x-y plane only.
-    Order of verts is not important
+    Splits the edges of a section into chains, and orients each chain so the material is on its left side
+    Sections are drawn in the Y-Z plane with the outside towards +y, so a chain going up along the outside has the
+    outside on its right. The side is found from the signed area of the chain, closed by a straight line from its
+    last to its first vert. Chains without an area (straight lines) keep the direction they are stored in.
     Args:
-        vert: vert to check
-        range_start: first vert that defines the rectangle
-        range_end: second vert that defines the rectangle
+        co: numpy array of vertex coordinates, shape (vert_count, 3)
+        edges: numpy array of edge vertex indices, shape (edge_count, 2)
     Returns:
-        bool indicating if the vert intersects
+        list(tuple(int, int)) - oriented edges of all chains
     """
-    if (((range_start[0] <= vert[0] <= range_end[0]) or (range_end[0] <= vert[0] <= range_start[0])) and
-            ((range_start[1] <= vert[1] <= range_end[1]) or (range_end[1] <= vert[1] <= range_start[1]))):
-        return True
-    else:
-        return False
-    # end if
-# end vert_check_range
+    neighbours = dict()
+    for edge in edges.tolist():
+        neighbours.setdefault(edge[0], list()).append(edge[1])
+        neighbours.setdefault(edge[1], list()).append(edge[0])
+    # end for
+
+    # start at chain ends first, then at any vert left, which are the ones on closed chains
+    visited = set()
+    oriented = list()
+    starts = [vert for vert in neighbours if len(neighbours[vert]) != 2] + list(neighbours)
+    for start in starts:
+        if start in visited:
+            continue
+        # end if
+        chain = [start]
+        visited.add(start)
+        current = start
+        while True:
+            unvisited = [vert for vert in neighbours[current] if vert not in visited]
+            if len(unvisited) == 0:
+                # close the loop if the chain ended next to its start
+                if len(chain) > 2 and start in neighbours[current]:
+                    chain.append(start)
+                # end if
+                break
+            # end if
+            current = unvisited[0]
+            visited.add(current)
+            chain.append(current)
+        # end while
+        if len(chain) < 2:
+            continue
+        # end if
+
+        # signed area in y-z plane
+        area = 0.0
+        for i in range(0, len(chain)):
+            co_start = co[chain[i]]
+            co_end = co[chain[(i + 1) % len(chain)]]
+            area += co_start[1] * co_end[2] - co_end[1] * co_start[2]
+        # end for
+        if area < 0:
+            chain.reverse()
+        # end if
+        oriented.extend(zip(chain[:-1], chain[1:]))
+    # end for
+    return oriented
+# end section_chains
+
+
+def bmesh_section(bm: bmesh.types.BMesh) -> tuple:
+    """
+        Reads the verts and edges of a section held in a bmesh, as used by section_chains
+    Args:
+        bm: bmesh.types.BMesh, containing only the section
+    Returns:
+        tuple(numpy array, numpy array) - vertex coordinates, shape (vert_count, 3), and edge vertex indices, shape
+            (edge_count, 2)
+    """
+    bm.verts.index_update()
+    co = numpy.array([vert.co[:] for vert in bm.verts], dtype=numpy.float64).reshape((-1, 3))
+    edges = numpy.array([[edge.verts[0].index, edge.verts[1].index] for edge in bm.edges],
+                        dtype=numpy.int32).reshape((-1, 2))
+    return co, edges
+# end bmesh_section
+
+
+def orient_faces(bm: bmesh.types.BMesh, faces: list, direction):
+    """
+        Reverses the given faces whose normal points away from the direction they should face
+    Args:
+        bm: bmesh.types.BMesh, containing the faces
+        faces: list(bmesh.types.BMFace)
+        direction: function called with a face, returns the vector its normal should point along
+    """
+    reverse = list()
+    for face in faces:
+        face.normal_update()
+        if face.normal.dot(mathutils.Vector(direction(face))) < 0:
+            reverse.append(face)
+        # end if
+    # end for
+    bmesh.ops.reverse_faces(bm, faces=reverse)
+# end orient_faces
+
+
+def orient_swept_faces(bm: bmesh.types.BMesh, faces: list, section: tuple, to_section, from_section,
+                       precision: int=4):
+    """
+        Winds faces swept from a section (extruded or spun), so their normals point to the outside of the section,
+        the same way extrude_along_edges does, see section_chains
+    Args:
+        bm: bmesh.types.BMesh, containing the faces
+        faces: list(bmesh.types.BMFace) - faces built from the section edges
+        section: result of bmesh_section, the section before it was swept, drawn in the Y-Z plane
+        to_section: function called with a vert position of the faces, returns its (y, z) position in the section
+        from_section: function called with a face and a (y, z) direction in the section, returns the direction
+            in the space of the face
+        precision: number of decimals section positions are compared with
+    """
+    co, edges = section
+    directions = dict()
+    for vert_a, vert_b in section_chains(co, edges):
+        key_a = (round(co[vert_a][1], precision), round(co[vert_a][2], precision))
+        key_b = (round(co[vert_b][1], precision), round(co[vert_b][2], precision))
+        directions[frozenset((key_a, key_b))] = (co[vert_b][1] - co[vert_a][1], co[vert_b][2] - co[vert_a][2])
+    # end for
+
+    def outside(face):
+        # the outside is on the right of the oriented section edge the face was swept from
+        keys = frozenset((round(y, precision), round(z, precision)) for y, z in
+                         (to_section(vert.co) for vert in face.verts))
+        direction = directions.get(keys, None)
+        if direction is None:
+            return 0.0, 0.0, 0.0
+        # end if
+        return from_section(face, (direction[1], -direction[0]))
+    # end outside
+
+    orient_faces(bm, faces, outside)
+# end orient_swept_faces
 
 
 def extrude_along_edges(section_mesh: bpy.types.Mesh, footprint: list, is_loop: bool) -> bpy.types.Mesh:
     """
     Takes a given mesh, and extrudes it along a given list of verts
+    The section is copied to each vert of the footprint, rotated to the bisector of its two edges and scaled so the
+    section keeps its width along the edges. Faces are built directly between neighbouring copies, wound so their
+    normals point to the outside of the section, see section_chains.
     Args:
         section_mesh: mesh to be extruded along
         footprint: list of verts (must be ordered) along which the mesh will be extruded
@@ -73,21 +221,21 @@ def extrude_along_edges(section_mesh: bpy.types.Mesh, footprint: list, is_loop:
     Returns:
         The extruded mesh.
     """
-    # load the section mesh into bmesh
-    bm = bmesh.new()
-    bm.from_mesh(section_mesh)
+    section_co = array.array("f", [0.0]) * (3 * len(section_mesh.vertices))
+    section_mesh.vertices.foreach_get("co", section_co)
+    section_co = numpy.frombuffer(section_co, dtype=numpy.float32).reshape((-1, 3))
+    section_edges = array.array("i", [0]) * (2 * len(section_mesh.edges))
+    section_mesh.edges.foreach_get("vertices", section_edges)
+    section_edges = numpy.frombuffer(section_edges, dtype=numpy.int32).reshape((-1, 2))
+    section_vert_count = len(section_co)
 
     # set initial values
-    angle_previous = 0
-    scale_previous = 1
     vec_0 = mathutils.Vector((0.0, 1.0, 0.0))
     layout_vert_count = len(footprint)
+    angles = list()
+    scales = list()
 
-    # this will get overridden during the first iteration, and it's not used in the first iteration
-    geom_initial = bm.verts[:] + bm.edges[:]
-    geom_last = bm.verts[:] + bm.edges[:]
-    i = 0
-    while i < layout_vert_count:
+    for i in range(0, layout_vert_count):
         # calculate the vectors needed to determine the normal vector, used for scaling and rotating the section loop
         if i == 0:
             if is_loop:
@@ -128,58 +276,410 @@ def extrude_along_edges(section_mesh: bpy.types.Mesh, footprint: list, is_loop:
         if -math.pi < vec_next.xy.angle_signed(vec_prev.xy) < 0:
             angle_desired += math.pi
         # end if
-        angle_to_transform = angle_previous - angle_desired
+        angles.append(angle_desired)
 
         # calculate the scale to use in transformation
-        scale_desired = math.fabs(1/(math.cos(math.radians(90) - 0.5 * vec_next.xy.angle_signed(vec_prev.xy))))
-        scale_to_transform = scale_desired / scale_previous
+        scales.append(math.fabs(1/(math.cos(math.radians(90) - 0.5 * vec_next.xy.angle_signed(vec_prev.xy)))))
+    # end for
 
-        # if it's the first iteration, move the mesh from the center to the first vert position
-        # for all other iterations, extrude the mesh to the current vert position
-        if i == 0:
-            mat_loc = mathutils.Matrix.Translation((0.0, 0.0, 0.0))
-            verts_to_transform = bm.verts
-            bmesh.ops.translate(bm, vec=footprint[i], verts=verts_to_transform, space=mat_loc)
+    # place a copy of the section on each footprint vert, rotated by -angle on Z, scaled on X and Y
+    positions = numpy.array(footprint, dtype=numpy.float64)
+    cos = numpy.cos(-numpy.array(angles))
+    sin = numpy.sin(-numpy.array(angles))
+    scales = numpy.array(scales)
+    co = numpy.empty((layout_vert_count, section_vert_count, 3))
+    co[:, :, 0] = (scales * cos)[:, None] * section_co[None, :, 0] - (scales * sin)[:, None] * section_co[None, :, 1]
+    co[:, :, 1] = (scales * sin)[:, None] * section_co[None, :, 0] + (scales * cos)[:, None] * section_co[None, :, 1]
+    co[:, :, 2] = section_co[None, :, 2]
+    co += positions[:, None, :]
+
+    # a face built from an oriented section edge (a, b) as (a, b, b_next, a_next) faces outwards if the footprint
+    # continues along the local +x axis of the section, otherwise it has to be reversed
+    oriented = numpy.array(section_chains(section_co, section_edges), dtype=numpy.int32).reshape((-1, 2))
+    ring_count = layout_vert_count if is_loop else layout_vert_count - 1
+    ring_starts = numpy.arange(ring_count, dtype=numpy.int32)
+    ring_ends = (ring_starts + 1) % layout_vert_count
+    axis_x = numpy.stack((cos, sin), axis=1)
+    direction = positions[ring_ends, :2] - positions[ring_starts, :2]
+    is_forward = numpy.sum(direction * (axis_x[ring_starts] + axis_x[ring_ends]), axis=1) >= 0
+    vert_a = ring_starts[:, None] * section_vert_count + oriented[None, :, 0]
+    vert_b = ring_starts[:, None] * section_vert_count + oriented[None, :, 1]
+    vert_a_next = ring_ends[:, None] * section_vert_count + oriented[None, :, 0]
+    vert_b_next = ring_ends[:, None] * section_vert_count + oriented[None, :, 1]
+    quads = numpy.where(is_forward[:, None, None],
+                        numpy.stack((vert_a, vert_b, vert_b_next, vert_a_next), axis=2),
+                        numpy.stack((vert_a, vert_a_next, vert_b_next, vert_b), axis=2)).reshape((-1, 4))
+
+    # section edges on each copy, edges between copies are added by mesh_from_arrays
+    edges = (numpy.arange(layout_vert_count, dtype=numpy.int32)[:, None, None] * section_vert_count +
+             section_edges[None, :, :])
+    face_count = len(quads)
+    arrays = MeshArrays(
+        co.astype(numpy.float32).ravel(),
+        edges.astype(numpy.int32).ravel(),
+        numpy.arange(0, 4 * face_count, 4, dtype=numpy.int32),
+        numpy.full(face_count, 4, dtype=numpy.int32),
+        quads.astype(numpy.int32).ravel(),
+        numpy.zeros(face_count, dtype=numpy.int32),
+        numpy.empty(0, dtype=numpy.float32)
+    )
+    return mesh_from_arrays("Mesh", arrays)
+# end extrude_along_edges
+
+
+def mesh_to_arrays(mesh: bpy.types.Mesh) -> MeshArrays:
+    """
+    Reads the geometry of the given mesh into flat arrays
+    Args:
+        mesh: mesh to read
+    Returns:
+        MeshArrays instance holding the mesh geometry
+    """
+    co = array.array("f", [0.0]) * (3 * len(mesh.vertices))
+    mesh.vertices.foreach_get("co", co)
+    edges = array.array("i", [0]) * (2 * len(mesh.edges))
+    mesh.edges.foreach_get("vertices", edges)
+    loop_starts = array.array("i", [0]) * len(mesh.polygons)
+    mesh.polygons.foreach_get("loop_start", loop_starts)
+    loop_totals = array.array("i", [0]) * len(mesh.polygons)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    material_indices = array.array("i", [0]) * len(mesh.polygons)
+    mesh.polygons.foreach_get("material_index", material_indices)
+    loop_verts = array.array("i", [0]) * len(mesh.loops)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+    if mesh.uv_layers.active is not None:
+        uvs = array.array("f", [0.0]) * (2 * len(mesh.loops))
+        mesh.uv_layers.active.data.foreach_get("uv", uvs)
+    else:
+        uvs = array.array("f")
+    # end if
+    return MeshArrays(co, edges, loop_starts, loop_totals, loop_verts, material_indices, uvs)
+# end mesh_to_arrays
+
+
+def mesh_from_arrays(name: str, arrays: MeshArrays) -> bpy.types.Mesh:
+    """
+    Creates a new mesh from the given flat arrays
+    Args:
+        name: name of the new mesh
+        arrays: MeshArrays instance, as returned by mesh_to_arrays
+    Returns:
+        The new mesh
+    """
+    m = bpy.data.meshes.new(name)
+    m.vertices.add(len(arrays.co) // 3)
+    m.vertices.foreach_set("co", arrays.co)
+    m.edges.add(len(arrays.edges) // 2)
+    m.edges.foreach_set("vertices", arrays.edges)
+    m.loops.add(len(arrays.loop_verts))
+    m.loops.foreach_set("vertex_index", arrays.loop_verts)
+    m.polygons.add(len(arrays.loop_totals))
+    m.polygons.foreach_set("loop_start", arrays.loop_starts)
+    m.polygons.foreach_set("loop_total", arrays.loop_totals)
+    m.polygons.foreach_set("material_index", arrays.material_indices)
+    if len(arrays.uvs) > 0:
+        m.uv_textures.new()  # currently blender needs both layers.
+        m.uv_layers.active.data.foreach_set("uv", arrays.uvs)
+    # end if
+    m.update(calc_edges=True)
+    return m
+# end mesh_from_arrays
+
+
+def weld_map(co: list, dist: float, seam=None) -> list:
+    """
+    Finds coincident verts using a spatial hash grid, in linear time
+    Args:
+        co: list of vertex coordinates, indexable by vertex index
+        dist: max distance between two verts which are merged, must be greater than 0
+        seam: iterable of vertex indices which might have duplicates, None to check all verts
+    Returns:
+        list(int) - index remap, for each vert the index of the vert it is merged into, or its own index.
+    """
+    remap = list(range(len(co)))
+    if seam is None:
+        seam = range(len(co))
+    # end if
+    grid = dict()
+    inv_dist = 1.0 / dist
+    dist_sq = dist * dist
+    offsets = [(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)]
+    for i in seam:
+        c = co[i]
+        cell = (math.floor(c[0] * inv_dist), math.floor(c[1] * inv_dist), math.floor(c[2] * inv_dist))
+        target = -1
+        for offset in offsets:
+            for j in grid.get((cell[0] + offset[0], cell[1] + offset[1], cell[2] + offset[2]), ()):
+                o = co[j]
+                if (c[0] - o[0])**2 + (c[1] - o[1])**2 + (c[2] - o[2])**2 <= dist_sq:
+                    target = j
+                    break
+                # end if
+            # end for
+            if target >= 0:
+                break
+            # end if
+        # end for
+        if target >= 0:
+            remap[i] = target
         else:
-            mat_loc = mathutils.Matrix.Translation((-footprint[i - 1][0], -footprint[i - 1][1],
-                                                    -footprint[i - 1][2]))
-            vec_extrude = vec_from_verts(footprint[i-1], footprint[i])
-            edges_to_extrude = [ele for ele in geom_last if isinstance(ele, bmesh.types.BMEdge)]
-            ret_extrude = bmesh.ops.extrude_edge_only(bm, edges=edges_to_extrude, use_select_history=True)
-            verts_to_transform = [ele for ele in ret_extrude["geom"] if isinstance(ele, bmesh.types.BMVert)]
-            bmesh.ops.translate(bm, verts=verts_to_transform, vec=vec_extrude, space=mat_loc)
-            geom_last = ret_extrude["geom"]
+            grid.setdefault(cell, list()).append(i)
         # end if
+    # end for
+    return remap
+# end weld_map
 
-        # set up location/space matrix and rotation matrix
-        mat_loc = mathutils.Matrix.Translation((-footprint[i][0], -footprint[i][1], -footprint[i][2]))
-        mat_rot = mathutils.Matrix.Rotation(angle_to_transform, 3, "Z")
 
-        # apply rotation, set the result of the operation as the last geometry to be used in next iteration
-        bmesh.ops.rotate(bm, cent=(0, 0, 0), matrix=mat_rot, verts=verts_to_transform, space=mat_loc)
+def weld_seam(bm: bmesh.types.BMesh, verts, dist: float=0.0001):
+    """
+    Merges coincident verts among the given seam verts of the bmesh
+    Args:
+        bm: bmesh containing the verts
+        verts: iterable of bmesh.types.BMVert, verts where the construction can create duplicates
+        dist: max distance between two verts which are merged
+    """
+    verts = list(verts)
+    remap = weld_map([vert.co for vert in verts], dist)
+    targetmap = dict()
+    for i, j in enumerate(remap):
+        if i != j:
+            targetmap[verts[i]] = verts[j]
+        # end if
+    # end for
+    if len(targetmap) > 0:
+        bmesh.ops.weld_verts(bm, targetmap=targetmap)
+    # end if
+# end weld_seam
 
-        # apply scale and rotation by chaining bmesh operations.
-        bmesh.ops.scale(bm, vec=(scale_to_transform, scale_to_transform, 1), space=mat_loc,
-                        verts=verts_to_transform)
 
-        # if this is the last iteration, bridge the loop between first and last section loop
-        if (i == layout_vert_count - 1) and is_loop:
-            edges_initial = [ele for ele in geom_initial if isinstance(ele, bmesh.types.BMEdge)]
-            edges_last = [ele for ele in geom_last if isinstance(ele, bmesh.types.BMEdge)]
-            bmesh.ops.bridge_loops(bm, edges=edges_initial+edges_last)
+def verts_open_ends(bm: bmesh.types.BMesh) -> list:
+    """
+    Returns the verts at the ends of the edge chains in the bmesh, which are the only verts where two joined
+    profiles can overlap
+    Args:
+        bm: bmesh containing profile edges
+    Returns:
+        list(bmesh.types.BMVert)
+    """
+    return [vert for vert in bm.verts if len(vert.link_edges) < 2]
+# end verts_open_ends
+
 
-        # set the previous scale and angle variables to be used in the next iteration
-        angle_previous = angle_desired
-        scale_previous = scale_desired
+def verts_at_z(bm: bmesh.types.BMesh, z_values: list, dist: float=0.0001) -> list:
+    """
+    Returns the verts of the bmesh, which lie on one of the given heights
+    Args:
+        bm: bmesh
+        z_values: list of heights
+        dist: tolerance
+    Returns:
+        list(bmesh.types.BMVert)
+    """
+    return [vert for vert in bm.verts if any(abs(vert.co[2] - z) <= dist for z in z_values)]
+# end verts_at_z
 
-        # increment counter
-        i += 1
-    # end while
 
-    # create the mesh and return it
-    m = bpy.data.meshes.new("Mesh")
-    bmesh.ops.recalc_face_normals(bm, faces=bm.faces)
-    bm.to_mesh(m)
-    bm.free()
-    return m
-# end generate_horizontal_separator
+def verts_at_x(bm: bmesh.types.BMesh, x_values: list, dist: float=0.0001) -> list:
+    """
+    Returns the verts of the bmesh, which lie on one of the given x coordinates
+    Args:
+        bm: bmesh
+        x_values: list of x coordinates
+        dist: tolerance
+    Returns:
+        list(bmesh.types.BMVert)
+    """
+    return [vert for vert in bm.verts if any(abs(vert.co[0] - x) <= dist for x in x_values)]
+# end verts_at_x
+
+
+def replicate_arrays(arrays: MeshArrays, count: int, offset: tuple) -> MeshArrays:
+    """
+    Replicates the geometry count times, each copy is translated by offset from the previous one
+    Args:
+        arrays: MeshArrays instance to replicate
+        count: number of copies, first copy is not translated
+        offset: tuple(x,y,z) - translation between two copies
+    Returns:
+        MeshArrays instance containing all copies
+    """
+    vert_count = len(arrays.co) // 3
+    loop_count = len(arrays.loop_verts)
+    copies = numpy.arange(count, dtype=numpy.int32)
+    co = numpy.frombuffer(arrays.co, dtype=numpy.float32).reshape((1, vert_count, 3))
+    translation = copies.reshape((count, 1, 1)) * numpy.array(offset, dtype=numpy.float32).reshape((1, 1, 3))
+    co = (co + translation).ravel()
+    edges = (numpy.frombuffer(arrays.edges, dtype=numpy.int32).reshape((1, -1)) +
+             (copies * vert_count).reshape((count, 1))).ravel()
+    loop_verts = (numpy.frombuffer(arrays.loop_verts, dtype=numpy.int32).reshape((1, -1)) +
+                  (copies * vert_count).reshape((count, 1))).ravel()
+    loop_starts = (numpy.frombuffer(arrays.loop_starts, dtype=numpy.int32).reshape((1, -1)) +
+                   (copies * loop_count).reshape((count, 1))).ravel()
+    loop_totals = numpy.tile(numpy.frombuffer(arrays.loop_totals, dtype=numpy.int32), count)
+    material_indices = numpy.tile(numpy.frombuffer(arrays.material_indices, dtype=numpy.int32), count)
+    uvs = numpy.tile(numpy.frombuffer(arrays.uvs, dtype=numpy.float32), count)
+    return MeshArrays(co, edges, loop_starts, loop_totals, loop_verts, material_indices, uvs)
+# end replicate_arrays
+
+
+def place_arrays(arrays: MeshArrays, positions: list) -> MeshArrays:
+    """
+    Places a copy of the geometry onto each of the given positions, like apply_positions does with linked duplicates
+    Args:
+        arrays: MeshArrays instance to place, origin should be in (0, 0, 0)
+        positions: list(tuple(tuple(x,y,z), rot)) - positions and rotations on the Z axis of the copies
+    Returns:
+        MeshArrays instance containing all copies
+    """
+    count = len(positions)
+    vert_count = len(arrays.co) // 3
+    loop_count = len(arrays.loop_verts)
+    copies = numpy.arange(count, dtype=numpy.int32)
+    co = numpy.frombuffer(arrays.co, dtype=numpy.float32).reshape((1, vert_count, 3)).astype(numpy.float64)
+    location = numpy.array([position[0] for position in positions], dtype=numpy.float64).reshape((count, 1, 3))
+    rot = numpy.array([position[1] for position in positions], dtype=numpy.float64).reshape((count, 1))
+    cos = numpy.cos(rot)
+    sin = numpy.sin(rot)
+    co = numpy.stack((cos * co[:, :, 0] - sin * co[:, :, 1], sin * co[:, :, 0] + cos * co[:, :, 1],
+                      numpy.repeat(co[:, :, 2], count, axis=0)), axis=2) + location
+    co = co.astype(numpy.float32).ravel()
+    edges = (numpy.frombuffer(arrays.edges, dtype=numpy.int32).reshape((1, -1)) +
+             (copies * vert_count).reshape((count, 1))).ravel()
+    loop_verts = (numpy.frombuffer(arrays.loop_verts, dtype=numpy.int32).reshape((1, -1)) +
+                  (copies * vert_count).reshape((count, 1))).ravel()
+    loop_starts = (numpy.frombuffer(arrays.loop_starts, dtype=numpy.int32).reshape((1, -1)) +
+                   (copies * loop_count).reshape((count, 1))).ravel()
+    loop_totals = numpy.tile(numpy.frombuffer(arrays.loop_totals, dtype=numpy.int32), count)
+    material_indices = numpy.tile(numpy.frombuffer(arrays.material_indices, dtype=numpy.int32), count)
+    uvs = numpy.tile(numpy.frombuffer(arrays.uvs, dtype=numpy.float32), count)
+    return MeshArrays(co, edges, loop_starts, loop_totals, loop_verts, material_indices, uvs)
+# end place_arrays
+
+
+def join_arrays(arrays_list: list) -> MeshArrays:
+    """
+    Joins the geometry of all given MeshArrays instances into a single one
+    Args:
+        arrays_list: list(MeshArrays)
+    Returns:
+        MeshArrays instance containing all geometry
+    """
+    co = list()
+    edges = list()
+    loop_starts = list()
+    loop_totals = list()
+    loop_verts = list()
+    material_indices = list()
+    uvs = list()
+    vert_count = 0
+    loop_count = 0
+    has_uvs = all(len(arrays.uvs) > 0 for arrays in arrays_list)
+    for arrays in arrays_list:
+        co.append(numpy.frombuffer(arrays.co, dtype=numpy.float32))
+        edges.append(numpy.frombuffer(arrays.edges, dtype=numpy.int32) + vert_count)
+        loop_starts.append(numpy.frombuffer(arrays.loop_starts, dtype=numpy.int32) + loop_count)
+        loop_totals.append(numpy.frombuffer(arrays.loop_totals, dtype=numpy.int32))
+        loop_verts.append(numpy.frombuffer(arrays.loop_verts, dtype=numpy.int32) + vert_count)
+        material_indices.append(numpy.frombuffer(arrays.material_indices, dtype=numpy.int32))
+        if has_uvs:
+            uvs.append(numpy.frombuffer(arrays.uvs, dtype=numpy.float32))
+        # end if
+        vert_count += len(arrays.co) // 3
+        loop_count += len(arrays.loop_verts)
+    # end for
+    return MeshArrays(
+        numpy.concatenate(co + [numpy.empty(0, dtype=numpy.float32)]),
+        numpy.concatenate(edges + [numpy.empty(0, dtype=numpy.int32)]),
+        numpy.concatenate(loop_starts + [numpy.empty(0, dtype=numpy.int32)]),
+        numpy.concatenate(loop_totals + [numpy.empty(0, dtype=numpy.int32)]),
+        numpy.concatenate(loop_verts + [numpy.empty(0, dtype=numpy.int32)]),
+        numpy.concatenate(material_indices + [numpy.empty(0, dtype=numpy.int32)]),
+        numpy.concatenate(uvs + [numpy.empty(0, dtype=numpy.float32)])
+    )
+# end join_arrays
+
+
+def mirror_arrays(arrays: MeshArrays) -> MeshArrays:
+    """
+    Mirrors the geometry on the X axis (x=0 plane)
+    Loops of each polygon are reversed, so the normals of the mirrored polygons still point outwards.
+    Args:
+        arrays: MeshArrays instance to mirror
+    Returns:
+        MeshArrays instance containing the mirrored geometry
+    """
+    co = numpy.frombuffer(arrays.co, dtype=numpy.float32).reshape((-1, 3)) * numpy.array((-1.0, 1.0, 1.0),
+                                                                                          dtype=numpy.float32)
+    loop_starts = numpy.frombuffer(arrays.loop_starts, dtype=numpy.int32)
+    loop_totals = numpy.frombuffer(arrays.loop_totals, dtype=numpy.int32)
+    # for each loop, index of the loop it is swapped with, loops are ordered by polygon
+    starts = numpy.repeat(loop_starts, loop_totals)
+    totals = numpy.repeat(loop_totals, loop_totals)
+    loop_order = 2 * starts + totals - 1 - numpy.arange(len(starts), dtype=numpy.int32)
+    loop_verts = numpy.frombuffer(arrays.loop_verts, dtype=numpy.int32)[loop_order]
+    if len(arrays.uvs) > 0:
+        uvs = numpy.frombuffer(arrays.uvs, dtype=numpy.float32).reshape((-1, 2))[loop_order].ravel()
+    else:
+        uvs = numpy.empty(0, dtype=numpy.float32)
+    # end if
+    return MeshArrays(co.ravel(), arrays.edges, arrays.loop_starts, arrays.loop_totals, loop_verts,
+                      arrays.material_indices, uvs)
+# end mirror_arrays
+
+
+def weld_arrays(arrays: MeshArrays, seam, dist: float=0.0001) -> MeshArrays:
+    """
+    Merges coincident verts, removes unused verts and edges collapsed by merging
+    Args:
+        arrays: MeshArrays instance
+        seam: iterable of vertex indices which might have duplicates, None to check all verts
+        dist: max distance between two verts which are merged
+    Returns:
+        MeshArrays instance with merged verts
+    """
+    co = numpy.frombuffer(arrays.co, dtype=numpy.float32).reshape((-1, 3))
+    vert_count = len(co)
+    remap = numpy.array(weld_map(co.tolist(), dist, seam), dtype=numpy.int32)
+    keep = remap == numpy.arange(vert_count, dtype=numpy.int32)
+    new_index = (numpy.cumsum(keep) - 1).astype(numpy.int32)[remap]
+    loop_verts = new_index[numpy.frombuffer(arrays.loop_verts, dtype=numpy.int32)]
+    edges = numpy.sort(new_index[numpy.frombuffer(arrays.edges, dtype=numpy.int32)].reshape((-1, 2)), axis=1)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    edge_keys = numpy.unique(edges[:, 0].astype(numpy.int64) * vert_count + edges[:, 1])
+    edges = numpy.stack((edge_keys // vert_count, edge_keys % vert_count), axis=1).astype(numpy.int32)
+    return MeshArrays(co[keep].ravel(), edges.ravel(), arrays.loop_starts, arrays.loop_totals, loop_verts,
+                      arrays.material_indices, arrays.uvs)
+# end weld_arrays
+
+
+def mirror_join_arrays(arrays: MeshArrays, dist: float=0.0001) -> MeshArrays:
+    """
+    Joins the geometry with its mirrored copy, and welds the seam on the mirror plane
+    Args:
+        arrays: MeshArrays instance containing the -x half of a mirror symmetric mesh
+        dist: max distance between two verts which are merged
+    Returns:
+        MeshArrays instance containing the whole mesh
+    """
+    joined = join_arrays([arrays, mirror_arrays(arrays)])
+    co = numpy.frombuffer(joined.co, dtype=numpy.float32).reshape((-1, 3))
+    seam = numpy.flatnonzero(numpy.abs(co[:, 0]) <= dist).tolist()
+    return weld_arrays(joined, seam, dist)
+# end mirror_join_arrays
+
+
+def extrude_along_half(section_mesh: bpy.types.Mesh, footprint_half: list) -> bpy.types.Mesh:
+    """
+    Extrudes the given mesh along one half of a mirror symmetric loop, the other half is created by mirroring
+    Args:
+        section_mesh: mesh to be extruded along
+        footprint_half: list of verts (must be ordered), starting and ending on the mirror plane (x=0) with edges
+            perpendicular to it, result of GenLayout.gen_footprint_half
+    Returns:
+        The extruded mesh.
+    """
+    m = extrude_along_edges(section_mesh, footprint_half, False)
+    arrays = mirror_join_arrays(mesh_to_arrays(m))
+    bpy.data.meshes.remove(m)
+    return mesh_from_arrays("Mesh", arrays)
+# end extrude_along_half
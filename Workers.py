@@ -0,0 +1,70 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  Procedural building generator
+#  Copyright (C) 2019 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import sys
+import subprocess
+
+
+def shard(items: list, worker: int, worker_count: int) -> list:
+    """
+        Picks the items of a worker, every worker_count-th item, so expensive regions of the list are spread across
+        workers
+    Args:
+        items: list, all items
+        worker: index of the worker
+        worker_count: number of workers
+    Returns:
+        list, items of the worker
+    """
+    return items[worker::worker_count]
+# end shard
+
+
+def worker_args() -> list:
+    """
+        Finds the arguments given to start_worker, in a worker process
+    Returns:
+        list(str) - arguments after "--"
+    """
+    return sys.argv[sys.argv.index("--") + 1:]
+# end worker_args
+
+
+def start_worker(module: str, args: list, log_path: str) -> tuple:
+    """
+        Starts a worker process, a background blender instance which enables this addon and calls worker_main of
+        the given module
+    Note:
+        The addon has to be installed, the worker runs a fresh blender instance.
+    Args:
+        module: name of the module of this addon, e.g. "Batch"
+        args: list(str) - arguments of the worker, see worker_args
+        log_path: path of the file receiving the worker output, appended to
+    Returns:
+        tuple(subprocess.Popen, file) - the process and its log file, to close once the process ends
+    """
+    expr = ("import sys, importlib, addon_utils; addon_utils.enable(" + repr(__package__) + "); "
+            "importlib.import_module(" + repr(__package__ + "." + module) + ").worker_main()")
+    log = open(log_path, "a")
+    process = subprocess.Popen([bpy.app.binary_path, "--background", "--factory-startup", "--python-expr", expr,
+                                "--"] + args, stdout=log, stderr=subprocess.STDOUT)
+    return process, log
+# end start_worker
@@ -21,6 +21,12 @@
 import bpy
 from . import UI
 from . import Generator
+from . import Fingerprint
+from . import Sampler
+from . import Statistics
+from . import UsdExport
+from . import Batch
+from . import Stages
 
 
 bl_info = {
@@ -51,8 +57,26 @@ def register():
     bpy.utils.register_class(UI.PBGToolbarStairsPanel)
     bpy.utils.register_class(UI.PBGToolbarRoofPanel)
     bpy.utils.register_class(UI.PBGToolbarDoorPanel)
+    bpy.utils.register_class(UI.PBGToolbarUVPanel)
     bpy.utils.register_class(UI.PBGToolbarGeneratePanel)
+    bpy.utils.register_class(UI.PBGToolbarStatisticsPanel)
+    bpy.utils.register_class(UI.PBGToolbarCachePanel)
+    bpy.utils.register_class(UI.PBGToolbarOutputPanel)
+    bpy.utils.register_class(UI.PBGToolbarFingerprintPanel)
+    bpy.utils.register_class(UI.PBGToolbarSamplerPanel)
+    bpy.utils.register_class(UI.PBGToolbarBatchPanel)
     bpy.utils.register_class(Generator.Generator)
+    bpy.utils.register_class(Generator.UndoGenerate)
+    bpy.utils.register_class(Generator.LoadBuilding)
+    bpy.utils.register_class(Generator.ExportStreamed)
+    bpy.utils.register_class(UsdExport.ExportUsd)
+    bpy.utils.register_class(Generator.RealizeBuildings)
+    bpy.utils.register_class(Fingerprint.CheckFingerprints)
+    bpy.utils.register_class(Sampler.SampleDesigns)
+    bpy.utils.register_class(Batch.RunBatch)
+    bpy.utils.register_class(Statistics.ClearStatistics)
+    bpy.app.handlers.load_pre.append(Generator.clear_undo_stacks)
+    bpy.app.handlers.undo_pre.append(Generator.clear_undo_stacks)
 
 
 def unregister():
@@ -68,5 +92,25 @@ def unregister():
     bpy.utils.unregister_class(UI.PBGToolbarStairsPanel)
     bpy.utils.unregister_class(UI.PBGToolbarRoofPanel)
     bpy.utils.unregister_class(UI.PBGToolbarDoorPanel)
+    bpy.utils.unregister_class(UI.PBGToolbarUVPanel)
     bpy.utils.unregister_class(UI.PBGToolbarGeneratePanel)
+    bpy.utils.unregister_class(UI.PBGToolbarStatisticsPanel)
+    bpy.utils.unregister_class(UI.PBGToolbarCachePanel)
+    bpy.utils.unregister_class(UI.PBGToolbarOutputPanel)
+    bpy.utils.unregister_class(UI.PBGToolbarFingerprintPanel)
+    bpy.utils.unregister_class(UI.PBGToolbarSamplerPanel)
+    bpy.utils.unregister_class(UI.PBGToolbarBatchPanel)
     bpy.utils.unregister_class(Generator.Generator)
+    bpy.utils.unregister_class(Generator.UndoGenerate)
+    bpy.utils.unregister_class(Generator.LoadBuilding)
+    bpy.utils.unregister_class(Generator.ExportStreamed)
+    bpy.utils.unregister_class(UsdExport.ExportUsd)
+    bpy.utils.unregister_class(Generator.RealizeBuildings)
+    bpy.utils.unregister_class(Fingerprint.CheckFingerprints)
+    bpy.utils.unregister_class(Sampler.SampleDesigns)
+    bpy.utils.unregister_class(Batch.RunBatch)
+    bpy.utils.unregister_class(Statistics.ClearStatistics)
+    bpy.app.handlers.load_pre.remove(Generator.clear_undo_stacks)
+    bpy.app.handlers.undo_pre.remove(Generator.clear_undo_stacks)
+    Generator.clear_undo_stacks(None)
+    Stages.shutdown_executor()